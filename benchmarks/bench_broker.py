@@ -0,0 +1,85 @@
+"""
+Benchmark: fan-out throughput of the WeightBroker to many local subscribers.
+
+`--events` weight events are published as fast as possible (as `WeightBroker.publish` does from
+the controller callbacks) to `--subscribers` TCP subscribers read by one selectors thread.
+Reported: events/s published, deliveries/s (events x subscribers) until every subscriber received
+every event, and the same with one extra stalled subscriber (never reads), whose buffer drops
+its oldest events instead of slowing the others.
+
+Usage
+-----
+    $ python -m benchmarks.bench_broker --subscribers 100 --events 50000
+"""
+import argparse
+import selectors
+import socket
+import threading
+import time
+
+from marel_marine_scale_controller.broker import WeightBroker
+
+HOST = '127.0.0.1'
+
+
+def read_all(socks, expected, done):
+    """Read the subscribers sockets until each received `expected` lines."""
+    selector = selectors.DefaultSelector()
+    counts = {}
+    for sock in socks:
+        sock.setblocking(False)
+        selector.register(sock, selectors.EVENT_READ)
+        counts[sock] = 0
+    remaining = len(socks)
+    while remaining:
+        for key, _ in selector.select(timeout=10):
+            data = key.fileobj.recv(1 << 16)
+            counts[key.fileobj] += data.count(b'\n')
+            if counts[key.fileobj] >= expected:
+                selector.unregister(key.fileobj)
+                remaining -= 1
+    selector.close()
+    done.set()
+
+
+def measure(subscribers, events, stalled, max_buffer):
+    broker = WeightBroker((HOST, 0), max_buffer=max_buffer)
+    broker.start()
+    socks = [socket.create_connection(broker.address) for _ in range(subscribers)]
+    stalled_socks = [socket.create_connection(broker.address) for _ in range(stalled)]
+    while len(broker.subscribers) < subscribers + stalled:
+        time.sleep(.01)
+
+    done = threading.Event()
+    reader = threading.Thread(target=read_all, args=(socks, events, done), daemon=True)
+    reader.start()
+
+    start = time.perf_counter()
+    for n in range(events):
+        broker.publish({'scale': 'bench', 'event': 'weight', 'value': n * 1e-3, 'units': 'kg', 'time': 0.0})
+    published = time.perf_counter() - start
+    done.wait()
+    delivered = time.perf_counter() - start
+    dropped = broker.dropped
+
+    for sock in socks + stalled_socks:
+        sock.close()
+    broker.stop()
+    return events / published, events * subscribers / delivered, dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--subscribers', type=int, default=100, help='Number of subscribers.')
+    parser.add_argument('--events', type=int, default=50000, help='Number of events published.')
+    parser.add_argument('--max-buffer', type=int, default=1 << 16, help='Buffer size (bytes) per subscriber.')
+    args = parser.parse_args()
+
+    print(f"{'case':<28} {'published/s':>12} {'deliveries/s':>14} {'dropped':>8}")
+    for label, stalled in ((f'{args.subscribers} subscribers', 0), ('+ 1 stalled subscriber', 1)):
+        published, delivered, dropped = measure(args.subscribers, args.events, stalled, args.max_buffer)
+        print(f"{label:<28} {published:12.0f} {delivered:14.0f} {dropped:8d}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark: responsiveness of the Dashboard with many simulated scales sending changing weights.
+
+Each simulated scale (test scale server) sends a random `w` weight every `--interval` s. The
+dashboard redraws the changed rows once per frame. Reported:
+    updates/s: row changes made by the hub callbacks.
+    redraw: mean time (ms) to redraw the changed rows of a frame.
+    frame period: p50 / p99 / max (ms) of the time between frames, the nominal period being
+        `FRAME_INTERVAL`. A period close to nominal means the window stays responsive.
+
+A display is required (Tk).
+
+Usage
+-----
+    $ python -m benchmarks.bench_dashboard --scales 50 --duration 10
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+import tkinter as tk
+
+from marel_marine_scale_controller.dashboard import FRAME_INTERVAL, Dashboard
+from test.testing_server import HOST, Server
+
+
+class RandomWeightServer(Server):
+    """Test scale server sending a random weight in each message."""
+    @staticmethod
+    def generate_message():
+        return f"%w,{random.uniform(0, 50):.3f}kg#\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scales', type=int, default=50, help='Number of simulated scales.')
+    parser.add_argument('--interval', type=float, default=.05, help='Seconds between the messages of a scale.')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds of measurement.')
+    args = parser.parse_args()
+
+    servers = [RandomWeightServer(HOST, 0, interval=args.interval) for _ in range(args.scales)]
+    for server in servers:
+        server.start_comm_port()
+
+    try:
+        dashboard = Dashboard()
+    except tk.TclError as err:
+        print(f'Tk is not available: {err}')
+        for server in servers:
+            server.close_all()
+        return 1
+
+    for n, server in enumerate(servers):
+        dashboard.add_scale(HOST, server.port, name=f'scale {n}')
+
+    periods = []
+    last = [time.perf_counter()]
+
+    def tick():
+        now = time.perf_counter()
+        periods.append((now - last[0]) * 1e3)
+        last[0] = now
+        dashboard.root.after(FRAME_INTERVAL, tick)
+
+    def measure():
+        periods.clear()
+        dashboard.redraws, dashboard.redraw_time = 0, 0.0
+        updates = dashboard.state.updates
+        dashboard.root.after(int(args.duration * 1000), lambda: finish(updates))
+
+    def finish(updates):
+        results['updates'] = dashboard.state.updates - updates
+        dashboard.on_close()
+
+    results = {}
+    dashboard.root.after(2000, measure)  # Leaves time for the scales to connect.
+    dashboard.root.after(FRAME_INTERVAL, tick)
+    dashboard.run()
+    for server in servers:
+        server.close_all()
+
+    quantiles = statistics.quantiles(periods, n=100)
+    print(f"{args.scales} scales, {results['updates'] / args.duration:.0f} updates/s")
+    print(f"redraw: {1e3 * dashboard.redraw_time / max(dashboard.redraws, 1):.2f} ms ({dashboard.redraws} frames)")
+    print(f"frame period (nominal {FRAME_INTERVAL} ms): p50 {quantiles[49]:.1f} ms, p99 {quantiles[98]:.1f} ms, "
+          f"max {max(periods):.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""
+Benchmark suite: end-to-end latency and saturation of a MarelController driven by the test scale server.
+
+Latency:
+    The simulated scale sends `w` messages at `--rate` Hz and `%p` messages at random times.
+    The weight of a `%p` message is its send time (ms since the benchmark start), thus the latency
+    is measured from the scale send to the `to_keyboard` call (keyboard stubbed).
+Saturation:
+    The rate of `w` messages is increased until the controller processes less than 95 % of them.
+
+Results are written as JSON (stdout or `--output`) for trend tracking.
+
+Usage
+-----
+    $ python -m benchmarks.bench_end_to_end --output e2e.json
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+from marel_marine_scale_controller import VERSION
+from marel_marine_scale_controller.marel_controller import MarelController
+from test.testing_server import HOST, Server
+
+T0 = time.perf_counter()
+
+
+def now_ms():
+    return (time.perf_counter() - T0) * 1e3
+
+
+class StubController(MarelController):
+    """MarelController recording the latency of each keyboard entry instead of typing it."""
+    def __init__(self, host, port):
+        super().__init__(host, port=port)
+        self.latencies = []
+        self.processed = 0
+
+    def process_message(self, message):
+        super().process_message(message)
+        self.processed += 1
+
+    def to_keyboard(self, value):
+        self.latencies.append(now_ms() - value)
+
+
+def start_controller(server, event_driven):
+    controller = StubController(HOST, server.port)
+    controller.event_driven = event_driven
+    controller.start_listening()
+    while len(server.conns) != 1:  # Waits for the connections of the previous controllers to be dropped.
+        time.sleep(.01)
+    return controller, list(server.conns)[-1]
+
+
+def summarize(latencies):
+    quantiles = statistics.quantiles(latencies, n=100, method='inclusive')
+    return {
+        'count': len(latencies),
+        'p50_ms': quantiles[49],
+        'p90_ms': quantiles[89],
+        'p99_ms': quantiles[98],
+        'max_ms': max(latencies),
+    }
+
+
+def measure_latency(server, event_driven, prints, rate):
+    server.interval, server.batch = 1 / rate, 1
+    controller, name = start_controller(server, event_driven)
+    for _ in range(prints):
+        time.sleep(random.uniform(.01, .05))
+        server.send_to(name, f"%p,{now_ms():.4f}kg#\n")
+    time.sleep(.5)
+    controller.stop_listening()
+    result = summarize(controller.latencies)
+    result['lost'] = prints - len(controller.latencies)
+    return result
+
+
+def measure_saturation(server, event_driven, duration, max_rate):
+    controller, _ = start_controller(server, event_driven)
+    server.interval = .001
+    steps = []
+    saturation = None
+    batch = 1
+    while batch * 1000 <= max_rate:
+        server.batch = batch
+        time.sleep(.2)
+        sent, processed, start = server.sent, controller.processed, time.perf_counter()
+        time.sleep(duration)
+        elapsed = time.perf_counter() - start
+        offered = (server.sent - sent) / elapsed
+        achieved = (controller.processed - processed) / elapsed
+        steps.append({'offered_msg_s': offered, 'processed_msg_s': achieved})
+        if achieved < .95 * offered:
+            break
+        saturation = achieved
+        batch *= 2
+    server.batch = 1
+    controller.stop_listening()
+    return {'saturation_msg_s': saturation, 'steps': steps}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rate', type=float, default=20, help='Rate (Hz) of the `w` messages for the latency.')
+    parser.add_argument('--prints', type=int, default=200, help='Number of `%%p` messages per mode.')
+    parser.add_argument('--duration', type=float, default=1, help='Seconds per saturation step.')
+    parser.add_argument('--max-rate', type=float, default=1e6, help='Maximum offered rate (msg/s).')
+    parser.add_argument('--output', help='JSON output file. Default: stdout.')
+    args = parser.parse_args()
+
+    server = Server(HOST, 0)
+    server.start_comm_port()
+
+    results = {
+        'benchmark': 'end_to_end',
+        'time': time.time(),
+        'version': VERSION,
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'parameters': vars(args),
+        'modes': {},
+    }
+    for mode, event_driven in (('sleep_loop', False), ('event_driven', True)):
+        results['modes'][mode] = {
+            'latency': measure_latency(server, event_driven, args.prints, args.rate),
+            'saturation': measure_saturation(server, event_driven, args.duration, args.max_rate),
+        }
+    server.close_all()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
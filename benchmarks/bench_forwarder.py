@@ -0,0 +1,55 @@
+"""
+Benchmark: PrintForwarder throughput by batch size against the local stand-in HTTP service.
+
+`--events` events are submitted as fast as possible, then the forwarder is flushed. The submit
+cost is the time spent by the caller (the listening thread in the controller).
+
+Usage
+-----
+    $ python -m benchmarks.bench_forwarder --events 20000
+"""
+import argparse
+import time
+
+from marel_marine_scale_controller.forwarder import PrintForwarder
+from test.testing_http_server import HttpSink
+
+
+def run(sink, events, batch_size):
+    forwarder = PrintForwarder(sink.url, batch_size=batch_size, batch_interval=.01)
+    forwarder.start()
+    requests, connections = sink.requests, sink.connections
+    event = {'host': 'localhost', 'time': time.time(), 'value': 1.234, 'units': 'kg'}
+
+    start = time.perf_counter()
+    for _ in range(events):
+        forwarder.submit(event)
+    submitted = time.perf_counter()
+    forwarder.flush()
+    elapsed = time.perf_counter() - start
+    forwarder.stop()
+    return {
+        'events_s': events / elapsed,
+        'submit_ns': 1e9 * (submitted - start) / events,
+        'requests': sink.requests - requests,
+        'connections': sink.connections - connections,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--events', type=int, default=20_000)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10, 100, 1000])
+    args = parser.parse_args()
+
+    sink = HttpSink().start()
+    print(f"{'batch':>6} {'events/s':>10} {'submit ns':>10} {'requests':>9} {'connections':>12}")
+    for batch_size in args.batch_sizes:
+        result = run(sink, args.events, batch_size)
+        print(f"{batch_size:6d} {result['events_s']:10.0f} {result['submit_ns']:10.0f} "
+              f"{result['requests']:9d} {result['connections']:12d}")
+    sink.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark: frames/s and memory allocated by the FrameDecoder vs the former
+`data_buffer += received; data_buffer.split(split_char)` framing.
+
+The streams are synthetic `%w,<weight>kg#\\n` messages cut in random fragments. A maximum
+fragment of 0 sends one whole message per chunk: the usual traffic of a scale (one message
+per recv at the weight update rate).
+
+CPython does not expose a count of allocations, thus the peak of memory allocated
+while framing (tracemalloc) is reported. The legacy framing copies the whole buffer on
+each chunk while the decoder writes in place and only allocates the decoded frames.
+
+On fragments much shorter than a message (a few bytes), the decoder is slower than the legacy
+framing when fed directly: it costs two Python calls per chunk while the legacy framing is only
+C calls. The gap mostly vanishes once the recv syscall is included and such fragments do not
+occur with a scale, which sends whole messages (the 0 fragment case, where the decoder is faster).
+
+Usage
+-----
+    $ python -m benchmarks.bench_frame_decoder --frames 100000
+"""
+import argparse
+import random
+import socket
+import time
+import tracemalloc
+
+from marel_marine_scale_controller.client import MAREL_MSG_ENCODING, FrameDecoder
+
+
+def make_chunks(frames, max_fragment, seed=0):
+    rng = random.Random(seed)
+    messages = [f"%w,{rng.uniform(0, 50):.4f}kg#\n".encode() for _ in range(frames)]
+    if max_fragment == 0:
+        return messages
+    stream = b"".join(messages)
+    chunks, i = [], 0
+    while i < len(stream):
+        size = rng.randint(1, max_fragment)
+        chunks.append(stream[i:i + size])
+        i += size
+    return chunks
+
+
+def legacy_framing(chunks):
+    count = 0
+    data_buffer = b''
+    for received in chunks:
+        data_buffer += received
+        messages = data_buffer.split(b"\n")
+        if len(messages) > 1:
+            data_buffer = messages.pop()
+            count += len([message.decode(MAREL_MSG_ENCODING) for message in messages])
+    return count
+
+
+def legacy_socket_framing(chunks):
+    """Same as `legacy_framing`, but bytes go through a socket and `recv`."""
+    count = 0
+    data_buffer = b''
+    sender, receiver = socket.socketpair()
+    for chunk in chunks:
+        sender.sendall(chunk)
+        data_buffer += receiver.recv(4096)
+        messages = data_buffer.split(b"\n")
+        if len(messages) > 1:
+            data_buffer = messages.pop()
+            count += len([message.decode(MAREL_MSG_ENCODING) for message in messages])
+    sender.close()
+    receiver.close()
+    return count
+
+
+def decoder_framing(chunks):
+    count = 0
+    decoder = FrameDecoder()
+    for received in chunks:
+        decoder.feed(received)
+        count += len(decoder.frames())
+    return count
+
+
+def decoder_socket_framing(chunks):
+    """Same as `decoder_framing`, but bytes go through a socket and `recv_into`."""
+    count = 0
+    decoder = FrameDecoder()
+    sender, receiver = socket.socketpair()
+    for received in chunks:
+        sender.sendall(received)
+        decoder.recv_into(receiver)
+        count += len(decoder.frames())
+    sender.close()
+    receiver.close()
+    return count
+
+
+def measure(function, chunks):
+    """Return the frames/s and the peak memory (bytes) allocated while running `function`."""
+    start = time.perf_counter()
+    frames = function(chunks)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    function(chunks)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return frames / elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--frames', type=int, default=100_000)
+    parser.add_argument('--fragments', type=int, nargs='+', default=[0, 4, 16, 64, 1024, 4096],
+                        help='Maximum fragment sizes (bytes) of the synthetic streams. 0: one message per chunk.')
+    args = parser.parse_args()
+
+    print(f"{'max fragment':>12} {'framing':>16} {'frames/s':>12} {'peak KiB':>10}")
+    for max_fragment in args.fragments:
+        chunks = make_chunks(args.frames, max_fragment)
+        for name, function in (('legacy split', legacy_framing),
+                               ('decoder', decoder_framing),
+                               ('legacy+socket', legacy_socket_framing),
+                               ('decoder+socket', decoder_socket_framing)):
+            rate, peak = measure(function, chunks)
+            print(f"{max_fragment:>12} {name:>16} {rate:12.0f} {peak / 1024:10.1f}")
+
+
+if __name__ == '__main__':
+    main()
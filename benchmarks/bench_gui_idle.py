@@ -0,0 +1,126 @@
+"""
+Benchmark: CPU used by the GUI left open, event-driven refresh vs the former 100 ms full-window polling.
+
+The former GUI reconfigured every widget and re-formatted the weight every 100 ms (`PollingGUI`
+below reproduces it). The event-driven GUI drains the controller events and only reconfigures
+the widgets whose state changed, thus a steady weight (the usual all-day idle scale) costs
+almost nothing.
+
+Scenarios:
+    stopped: the window is open, not listening.
+    listening: listening to the test scale server which sends a steady `w` weight every `--interval` s.
+
+The CPU time is the process time (GUI thread and listening thread) over the wall time.
+A display is required (Tk).
+
+Usage
+-----
+    $ python -m benchmarks.bench_gui_idle --duration 60
+"""
+import argparse
+import sys
+import tempfile
+import time
+import tkinter as tk
+from pathlib import Path
+
+from marel_marine_scale_controller.gui import GUI
+from marel_marine_scale_controller.marel_controller import MarelController
+from test.testing_server import HOST, Server
+
+
+class PollingGUI(GUI):
+    """GUI refreshed as before: every widget is reconfigured every 100 ms from the controller state."""
+    def set_controller(self, controller):
+        self.controller = controller
+
+    def poll_events(self):
+        pass
+
+    def set_status(self, status):
+        pass
+
+    def refresh_window(self):
+        controller = self.controller
+        if controller and (controller.client.is_connecting or controller.is_listening):
+            self.host_entry.config(state='disable')
+            self.start_button.config(state='disable')
+            self.stop_button.config(state='normal')
+        else:
+            self.host_entry.config(state='normal')
+            self.start_button.config(state='normal')
+            self.stop_button.config(state='disable')
+
+        if controller:
+            self.units.config(state='normal')
+            self.auto_enter_button.config(state='normal')
+            if controller.is_listening and controller.client.is_connected and controller.weight is not None:
+                weight = controller.get_weight(controller.units)
+                self.weight_value.set(f"{weight:.04f} {controller.units} ")
+            else:
+                self.weight_value.set("-  ")
+        else:
+            self.weight_value.set("-  ")
+            self.units.config(state='disable')
+            self.auto_enter_button.config(state='disable')
+
+        if controller and controller.client.is_connecting:
+            self.led_canvas.itemconfig(self.led, fill="yellow")
+        elif controller and controller.is_listening and controller.client.is_connected:
+            self.led_canvas.itemconfig(self.led, fill="green")
+        else:
+            self.led_canvas.itemconfig(self.led, fill="red")
+
+        self.root.after(100, self.refresh_window)
+
+
+def measure(gui_class, config_path, server, duration):
+    gui = gui_class(host=HOST, config_path=config_path)
+    if server is not None:
+        controller = MarelController(HOST, port=server.port)
+        controller.mute()
+        gui.set_controller(controller)
+        gui.start_listening()
+        deadline = time.monotonic() + 5
+        while not controller.is_listening and time.monotonic() < deadline:
+            gui.root.update()
+            time.sleep(.01)
+
+    gui.root.after(int(duration * 1000), gui.root.quit)
+    cpu, wall = time.process_time(), time.perf_counter()
+    gui.run()
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+
+    if gui.controller is not None:
+        gui.controller.stop_listening()
+    gui.root.destroy()
+    return 100 * cpu / wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--duration', type=float, default=30, help='Seconds per measurement.')
+    parser.add_argument('--interval', type=float, default=.05, help='Seconds between the scale `w` messages.')
+    args = parser.parse_args()
+
+    config_path = str(Path(tempfile.mkdtemp()).joinpath('gui_config.json'))
+    server = Server(HOST, 0, interval=args.interval)
+    server.start_comm_port()
+
+    print(f"{'scenario':<12} {'polling (% CPU)':>16} {'event-driven (% CPU)':>21}")
+    try:
+        for scenario in ('stopped', 'listening'):
+            scale = server if scenario == 'listening' else None
+            polling = measure(PollingGUI, config_path, scale, args.duration)
+            event_driven = measure(GUI, config_path, scale, args.duration)
+            print(f"{scenario:<12} {polling:16.2f} {event_driven:21.2f}")
+    except tk.TclError as err:
+        print(f'Tk is not available: {err}')
+        return 1
+    finally:
+        server.close_all()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+Benchmark: CPU time and wake-ups per scale, ScaleHub vs one listening thread per MarelController.
+
+The simulated scales (test.testing_server.Server) run in a child process so that their CPU time
+is not accounted for.
+
+Usage
+-----
+    $ python -m benchmarks.bench_hub --counts 1 5 10 20 40 --duration 5
+"""
+import argparse
+import multiprocessing
+import threading
+import time
+
+from marel_marine_scale_controller.hub import ScaleHub
+from marel_marine_scale_controller.marel_controller import MarelController
+from test.testing_server import HOST, Server
+
+
+def run_scales(count, interval, pipe):
+    servers = []
+    for _ in range(count):
+        server = Server(HOST, 0, interval=interval)
+        server.start_comm_port()
+        servers.append(server)
+    pipe.send([server.port for server in servers])
+    pipe.recv()  # Wait for the benchmark to be done.
+
+
+def measure_hub(ports, duration):
+    hub = ScaleHub()
+    for port in ports:
+        hub.add_scale(HOST, port)
+    hub.start()
+    time.sleep(1)  # Connections
+
+    wakeups, frames = hub.wakeups, hub.frames
+    cpu, start = time.process_time(), time.perf_counter()
+    time.sleep(duration)
+    cpu, elapsed = time.process_time() - cpu, time.perf_counter() - start
+    wakeups, frames = hub.wakeups - wakeups, hub.frames - frames
+    hub.stop()
+    return dict(cpu=cpu, elapsed=elapsed, wakeups=wakeups, frames=frames, threads=1)
+
+
+def measure_threads(ports, duration):
+    controllers = []
+    for port in ports:
+        controller = MarelController(HOST, port=port)
+        controller.mute()
+        controller.start_listening()
+        controllers.append(controller)
+    time.sleep(1)
+
+    threads = threading.active_count() - 1
+    cpu, start = time.process_time(), time.perf_counter()
+    time.sleep(duration)
+    cpu, elapsed = time.process_time() - cpu, time.perf_counter() - start
+    for controller in controllers:
+        controller.stop_listening()
+    # Each listening thread wakes up at least once per `RECEIVE_SLEEP` or message.
+    return dict(cpu=cpu, elapsed=elapsed, wakeups=None, frames=None, threads=threads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--counts', type=int, nargs='+', default=[1, 5, 10, 20, 40])
+    parser.add_argument('--duration', type=float, default=5, help='Seconds per measurement.')
+    parser.add_argument('--interval', type=float, default=.05, help='Seconds between scale messages (20 Hz).')
+    args = parser.parse_args()
+
+    print(f"{'mode':>8} {'scales':>6} {'threads':>7} {'cpu ms/scale/s':>15} {'wakeups/scale/s':>16} {'frames/scale/s':>15}")
+    for count in args.counts:
+        parent, child = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=run_scales, args=(count, args.interval, child), daemon=True)
+        process.start()
+        ports = parent.recv()
+
+        for mode, measure in (('hub', measure_hub), ('threads', measure_threads)):
+            r = measure(ports, args.duration)
+            scale_seconds = count * r['elapsed']
+            wakeups = f"{r['wakeups'] / scale_seconds:16.1f}" if r['wakeups'] is not None else f"{'-':>16}"
+            frames = f"{r['frames'] / scale_seconds:15.1f}" if r['frames'] is not None else f"{'-':>15}"
+            print(f"{mode:>8} {count:>6} {r['threads']:>7} {1e3 * r['cpu'] / scale_seconds:15.3f} {wakeups} {frames}")
+
+        parent.send('done')
+        process.join(timeout=5)
+
+
+if __name__ == '__main__':
+    main()
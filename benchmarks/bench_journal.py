@@ -0,0 +1,96 @@
+"""
+Benchmark: throughput and durability latency of the PrintJournal sync policies.
+
+Sequential: each event is appended and waited for before the next one (a single output worker).
+Burst: a producer appends the events as fast as possible while a consumer waits for each event
+and acknowledges it (as the output worker does), thus concurrent events share the group commits.
+
+The latency is the time from `append` to the return of `wait` (event durable).
+
+Usage
+-----
+    $ python -m benchmarks.bench_journal --events 2000 --dir /path/on/target/disk
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from marel_marine_scale_controller.journal import PrintJournal
+
+STRATEGIES = (
+    ('none', 'none', 0),
+    ('always', 'always', 0),
+    ('group', 'group', 0),
+    ('group +1ms', 'group', 0.001),
+    ('group +5ms', 'group', 0.005),
+)
+
+
+def sequential(journal, events):
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(events):
+        t0 = time.perf_counter()
+        seq = journal.append('1.234', 'kg')
+        journal.wait(seq)
+        latencies.append(time.perf_counter() - t0)
+        journal.acknowledge(seq)
+    return events / (time.perf_counter() - start), latencies
+
+
+def burst(journal, events):
+    first = journal.last_seq + 1
+    sent = []  # Append times, in sequence order (single producer).
+
+    def produce():
+        for _ in range(events):
+            sent.append(time.perf_counter())
+            journal.append('1.234', 'kg')
+
+    producer = threading.Thread(target=produce)
+    latencies = []
+    start = time.perf_counter()
+    producer.start()
+    for i in range(events):
+        journal.wait(first + i)
+        latencies.append(time.perf_counter() - sent[i])
+        journal.acknowledge(first + i)
+    producer.join()
+    return events / (time.perf_counter() - start), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--dir', help='Directory of the journals (the fsync cost depends on the disk). Default: temp dir.')
+    args = parser.parse_args()
+
+    print(f"{'policy':>12} {'workload':>11} {'events/s':>10} {'p50 (ms)':>9} {'p99 (ms)':>9} {'fsyncs':>7}")
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        for name, sync, interval in STRATEGIES:
+            for workload in (sequential, burst):
+                path = os.path.join(directory, f'{sync}_{interval}_{workload.__name__}.journal')
+                fsyncs = [0]
+                fsync = os.fsync
+
+                def counting_fsync(fd):
+                    fsyncs[0] += 1
+                    fsync(fd)
+
+                os.fsync = counting_fsync
+                try:
+                    with PrintJournal(path, sync=sync, commit_interval=interval) as journal:
+                        rate, latencies = workload(journal, args.events)
+                finally:
+                    os.fsync = fsync
+                quantiles = statistics.quantiles(latencies, n=100)
+                print(f"{name:>12} {workload.__name__:>11} {rate:10.0f} {1e3 * quantiles[49]:9.3f} "
+                      f"{1e3 * quantiles[98]:9.3f} {fsyncs[0]:7d}")
+    print("'none' is not durable on power loss; 'always' and 'group' are durable once `wait` returns.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark: overhead of the hot-path metrics, disabled and enabled.
+
+Messages go through a socket pair, `MarelClient.receive` and `MarelController.process_message`
+(keyboard muted). The cost of the `enabled` checks alone is measured to show the disabled overhead.
+
+Usage
+-----
+    $ python -m benchmarks.bench_metrics --messages 200000
+"""
+import argparse
+import socket
+import threading
+import time
+import timeit
+
+from marel_marine_scale_controller.marel_controller import MarelController
+from marel_marine_scale_controller.metrics import Metrics
+
+CHECKS_PER_MESSAGE = 2  # `enabled` checks per message in receive (recv + decode) and process_message (parse).
+
+
+def run(messages, enabled, chunk=50):
+    controller = MarelController('localhost')
+    controller.mute()
+    controller.stats.enabled = enabled
+    controller.client.socket, remote = socket.socketpair()
+    controller.client.is_connected = True
+
+    payload = b"%w,1.234kg#\n" * chunk
+
+    def send():
+        for _ in range(messages // chunk):
+            remote.sendall(payload)
+
+    sender = threading.Thread(target=send, daemon=True)
+    processed = 0
+    start = time.perf_counter()
+    sender.start()
+    while processed < messages:
+        for message in controller.client.receive():
+            controller.process_message(message)
+            processed += 1
+    elapsed = time.perf_counter() - start
+    remote.close()
+    controller.client.close()
+    return 1e9 * elapsed / messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--messages', type=int, default=200_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    metrics = Metrics(enabled=False)
+    check = min(timeit.repeat('if metrics.enabled: pass', globals=locals(), number=1_000_000, repeat=5)) * 1e3
+
+    disabled = min(run(args.messages, False) for _ in range(args.repeat))
+    enabled = min(run(args.messages, True) for _ in range(args.repeat))
+
+    print(f"{'metrics':>10} {'ns/message':>11}")
+    print(f"{'disabled':>10} {disabled:11.0f}")
+    print(f"{'enabled':>10} {enabled:11.0f}")
+    print(f"Disabled overhead: {check:.1f} ns per check, ~{CHECKS_PER_MESSAGE * check:.0f} ns/message "
+          f"({100 * CHECKS_PER_MESSAGE * check / disabled:.2f} % of the disabled cost).")
+
+
+if __name__ == '__main__':
+    main()
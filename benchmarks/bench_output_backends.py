@@ -0,0 +1,57 @@
+"""
+Benchmark: time to complete a keyboard entry (value + enter) for each output backend.
+
+WARNING: the pyautogui and clipboard backends type in the focused window. Focus an empty
+text editor before the countdown ends.
+
+Usage
+-----
+    $ python -m benchmarks.bench_output_backends --entries 20
+"""
+import argparse
+import statistics
+import time
+
+from marel_marine_scale_controller.output import ClipboardBackend, MemoryBackend, PyAutoGuiBackend
+
+
+def measure(backend, entries, enter):
+    durations = []
+    for i in range(entries):
+        start = time.perf_counter()
+        backend.write(f"{i / 1000:.4f}", enter)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--entries', type=int, default=20)
+    parser.add_argument('--no-enter', action='store_true', help='Do not press enter (auto_enter off).')
+    parser.add_argument('--countdown', type=int, default=5, help='Seconds to focus a text editor.')
+    args = parser.parse_args()
+
+    backends = {
+        'pyautogui (default pauses)': PyAutoGuiBackend(),
+        'pyautogui pause=0.02': PyAutoGuiBackend(pause=0.02),
+        'pyautogui pause=0': PyAutoGuiBackend(pause=0),
+        'clipboard': ClipboardBackend(),
+        'memory': MemoryBackend(),
+    }
+
+    for i in range(args.countdown, 0, -1):
+        print(f'Typing in {i} s ...')
+        time.sleep(1)
+
+    print(f"{'backend':>28} {'mean ms':>9} {'p50 ms':>9} {'max ms':>9}")
+    for name, backend in backends.items():
+        try:
+            durations = [1e3 * d for d in measure(backend, args.entries, not args.no_enter)]
+        except Exception as err:
+            print(f"{name:>28} unavailable: {err}")
+            continue
+        print(f"{name:>28} {statistics.fmean(durations):9.3f} {statistics.median(durations):9.3f} {max(durations):9.3f}")
+
+
+if __name__ == '__main__':
+    main()
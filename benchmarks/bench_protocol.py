@@ -0,0 +1,60 @@
+"""
+Benchmark: messages/s of the `protocol` parser vs the former regex path of `MarelController.process_message`.
+
+Usage
+-----
+    $ python -m benchmarks.bench_protocol --messages 200000
+"""
+import argparse
+import random
+import re
+import timeit
+
+from marel_marine_scale_controller.protocol import Reading, parse_message, parse_messages
+
+
+def legacy_parse(messages):
+    """Former parsing: `re.match` with the pattern string looked up in the `re` cache for each message."""
+    readings = []
+    for message in messages:
+        match = re.match(r"%(\S),(-?\d+.?\d*)(\S+)#", message)
+        if match:
+            readings.append((match.group(1), float(match.group(2)), match.group(3)))
+    return readings
+
+
+def protocol_parse(messages):
+    readings = []
+    for message in messages:
+        if (reading := parse_message(message)) is not None:
+            readings.append(reading)
+    return readings
+
+
+def protocol_batch_parse(messages):
+    return parse_messages(messages).readings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--messages', type=int, default=200_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    messages = [
+        f"%{rng.choice('wwwwwwwwwp')},{rng.uniform(0, 50):.4f}{rng.choice(['kg', 'g', 'lb', 'oz'])}#"
+        for _ in range(args.messages)
+    ]
+    assert [Reading(*r) for r in legacy_parse(messages)] == protocol_batch_parse(messages)
+
+    print(f"{'parser':>16} {'messages/s':>12}")
+    for name, function in (('legacy re.match', legacy_parse),
+                           ('parse_message', protocol_parse),
+                           ('parse_messages', protocol_batch_parse)):
+        elapsed = min(timeit.repeat(lambda: function(messages), number=1, repeat=args.repeat))
+        print(f"{name:>16} {args.messages / elapsed:12.0f}")
+
+
+if __name__ == '__main__':
+    main()
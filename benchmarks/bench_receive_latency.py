@@ -0,0 +1,72 @@
+"""
+Benchmark: latency from a `%p` message sent by the scale to the `to_keyboard` call.
+
+Compares the default listening loop (sleeps `RECEIVE_SLEEP` after each batch) with the
+`event_driven` receive mode. The keyboard is stubbed.
+
+Usage
+-----
+    $ python -m benchmarks.bench_receive_latency --prints 200
+"""
+import argparse
+import random
+import statistics
+import time
+
+from marel_marine_scale_controller.marel_controller import MarelController
+from test.testing_server import HOST, Server
+
+
+class StubController(MarelController):
+    """MarelController recording the time of each keyboard entry instead of typing it."""
+    def __init__(self, host, port):
+        super().__init__(host, port=port)
+        self.entries = {}
+
+    def to_keyboard(self, value):
+        self.entries[int(value)] = time.perf_counter()
+
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100, method='inclusive')[q - 1]
+
+
+def measure(server, event_driven, prints):
+    controller = StubController(HOST, server.port)
+    controller.event_driven = event_driven
+    controller.start_listening()
+    time.sleep(.5)
+    name = list(server.conns)[-1]  # Latest connection.
+
+    sent = {}
+    for i in range(prints):
+        time.sleep(random.uniform(.02, .1))
+        sent[i] = time.perf_counter()
+        server.send_to(name, f"%p,{i}.0kg#\n")
+    time.sleep(.5)
+    controller.stop_listening()
+
+    latencies = [1e3 * (controller.entries[i] - sent[i]) for i in sent if i in controller.entries]
+    return latencies, prints - len(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--prints', type=int, default=200, help='Number of print messages per mode.')
+    parser.add_argument('--interval', type=float, default=.05, help='Seconds between `w` messages.')
+    args = parser.parse_args()
+
+    server = Server(HOST, 0, interval=args.interval)
+    server.start_comm_port()
+
+    print(f"{'mode':>14} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'lost':>5}")
+    for mode, event_driven in (('sleep loop', False), ('event driven', True)):
+        latencies, lost = measure(server, event_driven, args.prints)
+        print(f"{mode:>14} {percentile(latencies, 50):8.3f} {percentile(latencies, 99):8.3f} "
+              f"{max(latencies):8.3f} {lost:>5}")
+
+    server.close_all()
+
+
+if __name__ == '__main__':
+    main()
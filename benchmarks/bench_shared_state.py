@@ -0,0 +1,91 @@
+"""
+Benchmark: read rate of the shared memory weight table while a writer process publishes.
+
+A writer process publishes weights in every slot of a SharedWeightTable at `--rate` Hz per slot
+(0: as fast as possible). The benchmark process reads a slot in a loop for `--duration` seconds.
+Reported: reads/s, and the reads/s of the latest weight through a local socket request for
+comparison (`socket.socketpair`, one small request and response per read).
+
+Usage
+-----
+    $ python -m benchmarks.bench_shared_state --slots 50 --rate 20
+"""
+import argparse
+import multiprocessing
+import socket
+import struct
+import time
+from multiprocessing import shared_memory
+
+from marel_marine_scale_controller.shared_state import SharedWeightReader, SharedWeightTable
+
+
+def write_loop(name, slots, rate, stop):
+    writer = object.__new__(SharedWeightTable)  # Writes in the block created by the benchmark process.
+    writer.shm, writer.slots, writer.names, writer._seqs = shared_memory.SharedMemory(name), slots, {}, [0] * slots
+    period = 1 / rate if rate else 0
+    n = 0
+    while not stop.is_set():
+        n += 1
+        for index in range(slots):
+            writer.publish(index, n * 1e-3, 'kg')
+        if period:
+            time.sleep(period)
+    writer.shm.close()
+
+
+def measure_shared(reader, duration):
+    reads = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        for _ in range(1000):
+            reader.read(0)
+        reads += 1000
+    return reads / duration
+
+
+def measure_socket(duration):
+    client, server = socket.socketpair()
+    response = struct.pack('<dQ', 1.0, 1)
+    reads = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        client.send(b'?')
+        server.recv(1)
+        server.send(response)
+        client.recv(16)
+        reads += 1
+    client.close()
+    server.close()
+    return reads / duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--slots', type=int, default=50, help='Number of scales (slots) written.')
+    parser.add_argument('--rate', type=float, default=20, help='Writes per second per slot. 0: no limit.')
+    parser.add_argument('--duration', type=float, default=2, help='Seconds per measurement.')
+    args = parser.parse_args()
+
+    table = SharedWeightTable(slots=args.slots)
+    for index in range(args.slots):
+        table.register(f'scale {index}')
+    context = multiprocessing.get_context('spawn')
+    stop = context.Event()
+    writer = context.Process(target=write_loop, args=(table.name, args.slots, args.rate, stop))
+    writer.start()
+    reader = SharedWeightReader(table.name)
+    while reader.read(0) is None:
+        time.sleep(.01)
+
+    shared = measure_shared(reader, args.duration)
+    stop.set()
+    writer.join()
+    reader.close()
+    table.close()
+    print(f'shared memory: {shared:12.0f} reads/s')
+    print(f'socket:        {measure_socket(args.duration):12.0f} reads/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -2,4 +2,5 @@ VERSION = "1.0.0"
 
 LUA_SCRIPT_PATH = "static/marel_app_v2.lua"
 CONFIG_PATH = "config/gui_config.json"
-LOGO_PATH = "static/logo.ico"
\ No newline at end of file
+LOGO_PATH = "static/logo.ico"
+LUA_CACHE_PATH = "config/lua_cache.json"
\ No newline at end of file
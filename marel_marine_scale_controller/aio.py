@@ -0,0 +1,322 @@
+"""
+This module contains the AsyncMarelController, an asyncio API to read a Marel Scale.
+
+The messages are framed by the `client.FrameDecoder` and parsed by `protocol.parse_message`, as
+with the MarelClient and MarelController, but the connection is an asyncio stream: no thread is
+used and no polling is needed. Readings and prints are pushed to subscribers.
+
+Each subscriber has its own bounded queue (Subscription). When a subscriber is too slow and its
+queue is full, its oldest item is dropped (and counted): a slow consumer never blocks the reading
+of the scale nor the other subscribers.
+
+The AsyncMarelController does not emulate the keyboard. Use the MarelController for that.
+
+Examples
+--------
+>>> async def main():
+...     async with AsyncMarelController('192.168.0.202') as controller:
+...         async for reading in controller.readings():
+...             print(reading)
+...             if reading.value > 10:
+...                 break
+...         weight = await controller.next_print(timeout=60)
+>>> asyncio.run(main())
+"""
+import asyncio
+import collections
+import logging
+import time
+from typing import *
+
+from marel_marine_scale_controller.client import FrameDecoder
+from marel_marine_scale_controller.health import LinkHealth
+from marel_marine_scale_controller.marel_controller import COMM_PORT, Weight
+from marel_marine_scale_controller.protocol import ProtocolError, Reading, parse_message
+from marel_marine_scale_controller.reconnect import Backoff, configure_socket
+
+READINGS = 'readings'
+PRINTS = 'prints'
+
+T = TypeVar('T')
+
+
+class Subscription(Generic[T]):
+    """
+    Bounded queue of the items published to one subscriber. Async iterable.
+
+    When the queue is full, the oldest item is dropped. The iteration ends once the subscription
+    is closed (by the subscriber or by the controller) and the queue is empty.
+
+    Attributes
+    ----------
+    maxsize :
+        Maximum number of queued items.
+    dropped :
+        Number of items dropped because the queue was full.
+    is_closed :
+        True once closed.
+    """
+    def __init__(self, maxsize: int = 256, on_close: Callable[['Subscription'], None] = None):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.is_closed = False
+        self._queue: Deque[T] = collections.deque()
+        self._ready = asyncio.Event()
+        self._on_close = on_close
+
+    def __len__(self):
+        return len(self._queue)
+
+    def put(self, item: T):
+        """Queue an item. Never blocks: when the queue is full, the oldest item is dropped."""
+        if len(self._queue) >= self.maxsize:
+            self._queue.popleft()
+            self.dropped += 1
+        self._queue.append(item)
+        self._ready.set()
+
+    async def get(self) -> T:
+        """Wait for the next item.
+
+        Raises
+        ------
+        ConnectionError if the subscription is closed and its queue empty.
+        """
+        while not self._queue:
+            if self.is_closed:
+                raise ConnectionError('Subscription closed.')
+            self._ready.clear()
+            await self._ready.wait()
+        return self._queue.popleft()
+
+    def close(self):
+        """Stop receiving items. The queued items can still be read."""
+        if self.is_closed:
+            return
+        self.is_closed = True
+        self._ready.set()
+        if self._on_close is not None:
+            self._on_close(self)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> T:
+        try:
+            return await self.get()
+        except ConnectionError:
+            raise StopAsyncIteration
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+
+class AsyncMarelController:
+    """
+    Asyncio controller for Marel Marine Scale (M2200) using the `./static/marel_app_v2.lua` app.
+
+    Use it as an async context manager (`async with`) or call `self.connect` and `self.close`.
+
+    Attributes
+    ----------
+    host :
+        IP address of the host. (Scale)
+    comm_port :
+        Communication port used. Lua App Default: 52212
+    timeout :
+        Maximum silence (seconds) of the scale before the connection is considered lost.
+    maxsize :
+        Default maximum size of the subscriptions queues.
+    auto_reconnect :
+        If True, the connection is reestablished (waiting `self.backoff` delays) when lost.
+    backoff :
+        Backoff of the reconnection attempts.
+    weight :
+        Latest weight stored in a Weight(value, units) dataclass.
+    protocol_errors :
+        Number of invalid messages received.
+    link :
+        LinkHealth updated by every message received.
+    is_connected :
+        True while connected to the scale.
+    """
+    def __init__(self, host: str, port: int = COMM_PORT, timeout: float = 5.0, maxsize: int = 256,
+                 auto_reconnect: bool = True):
+        self.host = host
+        self.comm_port = port
+        self.timeout = timeout
+        self.maxsize = maxsize
+        self.auto_reconnect = auto_reconnect
+        self.backoff = Backoff(initial=0.1, cap=2.0)
+        self.weight: Weight = None
+        self.protocol_errors = 0
+        self.link = LinkHealth()
+        self.is_connected = False
+
+        self._decoder = FrameDecoder()
+        self._subscriptions: Dict[str, Set[Subscription]] = {READINGS: set(), PRINTS: set()}
+        self._reader: asyncio.StreamReader = None
+        self._writer: asyncio.StreamWriter = None
+        self._task: asyncio.Task = None
+        self._closing = False
+
+    async def __aenter__(self) -> 'AsyncMarelController':
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def connect(self):
+        """Connect to `self.host:self.comm_port` and start reading the scale.
+
+        Raises
+        ------
+        OSError (or TimeoutError) if the connection failed.
+        """
+        self._closing = False
+        await self._open()
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop reading, disconnect and close every subscription (their iterations end)."""
+        self._closing = True
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._close_connection()
+        for subscriptions in self._subscriptions.values():
+            for subscription in list(subscriptions):
+                subscription.close()
+
+    def subscribe(self, kind: str = READINGS, maxsize: int = None) -> Subscription:
+        """Return a new Subscription to the `kind` items.
+
+        Parameters
+        ----------
+        kind :
+            READINGS: every weight Reading (`w` and `p` messages). PRINTS: the Weight of the `p` messages.
+        maxsize :
+            Maximum size of the queue. Defaults to `self.maxsize`.
+
+        Returns
+        -------
+        The Subscription, already closed if the controller is closed.
+        """
+        subscription = Subscription(maxsize or self.maxsize, on_close=self._subscriptions[kind].discard)
+        if self._closing:
+            subscription.close()
+        else:
+            self._subscriptions[kind].add(subscription)
+        return subscription
+
+    async def readings(self, maxsize: int = None) -> AsyncIterator[Reading]:
+        """Iterate over the weight readings received from the first iteration on. Ends when the controller is closed."""
+        async with self.subscribe(READINGS, maxsize) as subscription:
+            async for reading in subscription:
+                yield reading
+
+    async def next_print(self, timeout: float = None) -> Weight:
+        """Wait for the next print (`p` message) and return its weight.
+
+        Raises
+        ------
+        TimeoutError if no print is received within `timeout` seconds.
+        ConnectionError if the controller is closed meanwhile.
+        """
+        async with self.subscribe(PRINTS, maxsize=1) as subscription:
+            return await asyncio.wait_for(subscription.get(), timeout)
+
+    def get_weight(self, units='kg'):
+        """Return the latest weight value in units of `units`"""
+        if self.weight is not None:
+            return self.weight.get_weight(units)
+        return None
+
+    def process_message(self, message: str):
+        """Parse a message and publish its reading.
+
+        Keep alive messages are heartbeats (see `self.link`). Invalid messages are logged and counted
+        in `self.protocol_errors`.
+        """
+        now = time.monotonic()
+        try:
+            reading = parse_message(message)
+        except ProtocolError as err:
+            logging.warning('MAREL: %s', err)
+            self.link.seen(now)
+            self.protocol_errors += 1
+            return
+
+        self.link.seen(now, heartbeat=reading is None)
+        if reading is None:
+            return
+
+        weight = self.weight = Weight(reading.value, reading.units)
+        for subscription in self._subscriptions[READINGS]:
+            subscription.put(reading)
+        if reading.prefix == 'p':
+            for subscription in self._subscriptions[PRINTS]:
+                subscription.put(weight)
+
+    async def _open(self):
+        self._decoder.clear()
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.comm_port), self.timeout
+        )
+        configure_socket(self._writer.get_extra_info('socket'))
+        self.is_connected = True
+        self.backoff.reset()
+        logging.info(f'Connected to {self.host}:{self.comm_port}')
+
+    async def _close_connection(self):
+        self.is_connected = False
+        writer, self._writer, self._reader = self._writer, None, None
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await self._read()
+            except (OSError, asyncio.TimeoutError, EOFError) as err:
+                logging.info(f'Connection lost ({err!r}).')
+            await self._close_connection()
+
+            while self.auto_reconnect and not self._closing:
+                delay = self.backoff.next_delay()
+                logging.info(f'Reconnecting to {self.host}:{self.comm_port} in {delay:.2f} s.')
+                await asyncio.sleep(delay)
+                try:
+                    await self._open()
+                    break
+                except (OSError, asyncio.TimeoutError) as err:
+                    logging.info(f'Reconnection failed ({err!r}).')
+
+            if not self.is_connected:
+                break
+
+        for subscriptions in self._subscriptions.values():  # The iterations end.
+            for subscription in list(subscriptions):
+                subscription.close()
+
+    async def _read(self):
+        decoder = self._decoder
+        while True:
+            data = await asyncio.wait_for(self._reader.read(len(decoder.buffer)), self.timeout)
+            if not data:
+                raise EOFError('Connection closed by the scale.')
+            decoder.feed(data)
+            for message in decoder.frames():
+                self.process_message(message)
@@ -0,0 +1,347 @@
+"""
+This module contains the WeightBroker, used to re-publish the readings of scales to many local programs.
+
+The scale only accepts one client (see `MarelClient.test_new_connection`). The broker keeps that
+connection (a MarelController, or the controllers of a ScaleHub) and publishes every event as a
+JSON line to the subscribers connected to a local TCP or Unix socket:
+    {"scale": "192.168.0.202:52212", "event": "weight", "value": 1.234, "units": "kg", "time": 1700000000.123}
+Events:
+    weight: every weight received (`w` and `p` messages).
+    print: every print (`p` messages and auto-captures, see `MarelController.print_callbacks`).
+    status: controller status change (`"status"` key instead of the weight).
+
+Each event is encoded once and shared by the subscribers. Every subscriber has its own buffer,
+emptied by a single `selectors` event loop as the subscriber reads: the controller callbacks only
+queue the event and never block. When the buffer of a slow subscriber exceeds `max_buffer` bytes,
+its oldest (unsent) events are dropped, thus a slow reader never slows the scale link nor the others.
+
+Usage
+-----
+    Headless broker, subscribers connect to the TCP port 52213 (or to a Unix socket)::
+        $ python -m marel_marine_scale_controller.broker 192.168.0.202 --listen 127.0.0.1:52213
+        $ python -m marel_marine_scale_controller.broker 192.168.0.202 --listen /tmp/marel.sock
+
+Attributes
+----------
+BROKER_PORT :
+    Default TCP port of the broker.
+
+Examples
+--------
+>>> broker = WeightBroker(('127.0.0.1', BROKER_PORT))
+>>> broker.attach(controller)
+>>> broker.start()
+"""
+import argparse
+import collections
+import json
+import logging
+import os
+import selectors
+import socket
+import sys
+import threading
+import time
+from typing import *
+
+from marel_marine_scale_controller.marel_controller import MarelController, Weight
+from marel_marine_scale_controller.reconnect import Backoff
+
+BROKER_PORT = 52213
+
+Address = Union[str, Tuple[str, int]]
+
+
+class Subscriber:
+    """
+    Connection of a subscriber and its buffer of events to send.
+
+    Attributes
+    ----------
+    sock :
+        Non-blocking socket of the subscriber.
+    pending :
+        Encoded events (lines) to send. The first one may be partially sent (see `self.offset`).
+    offset :
+        Number of bytes of `pending[0]` already sent.
+    size :
+        Number of bytes in `pending`.
+    dropped :
+        Number of events dropped because the buffer was full.
+    """
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.pending: Deque[bytes] = collections.deque()
+        self.offset = 0
+        self.size = 0
+        self.dropped = 0
+
+    def queue(self, line: bytes, max_buffer: int):
+        """Add `line` to the buffer, dropping the oldest unsent lines if it exceeds `max_buffer` bytes."""
+        self.pending.append(line)
+        self.size += len(line)
+        while self.size > max_buffer and len(self.pending) > 1:
+            index = 1 if self.offset else 0  # A partially sent line must be completed.
+            if index >= len(self.pending) - 1:
+                break
+            self.size -= len(self.pending[index])
+            del self.pending[index]
+            self.dropped += 1
+
+    def flush(self) -> bool:
+        """Send as much of the buffer as the socket accepts.
+
+        Returns
+        -------
+        True if the buffer is empty.
+
+        Raises
+        ------
+        OSError if the subscriber is disconnected.
+        """
+        pending = self.pending
+        while pending:
+            line = pending[0]
+            try:
+                sent = self.sock.send(memoryview(line)[self.offset:])
+            except BlockingIOError:
+                return False
+            self.offset += sent
+            self.size -= sent
+            if self.offset < len(line):
+                return False
+            pending.popleft()
+            self.offset = 0
+        return True
+
+
+class WeightBroker:
+    """
+    Publishes the events of MarelControllers to the subscribers of a local socket as JSON lines.
+
+    Attributes
+    ----------
+    address :
+        `(host, port)` of the TCP socket, or path of the Unix socket.
+    max_buffer :
+        Maximum size (bytes) of the buffer of each subscriber.
+    subscribers :
+        Connected Subscribers.
+    published :
+        Number of events published.
+    is_running :
+        Is set to True while the event loop is running.
+    thread :
+        Thread used to call `self.run()`.
+    """
+    def __init__(self, address: Address = ('127.0.0.1', BROKER_PORT), max_buffer: int = 1 << 20):
+        self.address = address
+        self.max_buffer = max_buffer
+        self.subscribers: List[Subscriber] = []
+        self.published = 0
+        self.is_running = False
+        self.thread: threading.Thread = None
+
+        self._events: Deque[bytes] = collections.deque()
+        self._lock = threading.Lock()
+        self._wake_pending = False
+        self._selector = selectors.DefaultSelector()
+        self._wake_reader, self._wake_writer = socket.socketpair()
+        self._wake_reader.setblocking(False)
+        self._wake_writer.setblocking(False)
+        self._selector.register(self._wake_reader, selectors.EVENT_READ, None)
+
+        if isinstance(address, str):
+            if os.path.exists(address):
+                os.unlink(address)  # Left by a previous broker.
+            self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(address)
+        if not isinstance(address, str):
+            self.address = self._server.getsockname()  # Resolves port 0 to the port picked by the OS.
+        self._server.listen()
+        self._server.setblocking(False)
+        self._selector.register(self._server, selectors.EVENT_READ, self._server)
+
+    @property
+    def dropped(self) -> int:
+        """Number of events dropped for the connected subscribers."""
+        return sum(subscriber.dropped for subscriber in self.subscribers)
+
+    def attach(self, controller: MarelController, name: str = None):
+        """Publish the weights, prints and status changes of `controller` (named `host:port` by default)."""
+        name = name or f'{controller.host}:{controller.comm_port}'
+        controller.weight_callbacks.append(lambda _, weight: self._weight_received(name, 'weight', weight))
+        controller.print_callbacks.append(lambda _, weight: self._weight_received(name, 'print', weight))
+        controller.state_callbacks.append(lambda _, status: self.publish({'scale': name, 'event': 'status', 'status': status}))
+
+    def publish(self, event: dict):
+        """Queue `event` for every subscriber. Thread-safe, never blocks."""
+        self.publish_line((json.dumps(event) + '\n').encode())
+
+    def publish_line(self, line: bytes):
+        """Queue an encoded JSON line for every subscriber. Thread-safe, never blocks."""
+        self._events.append(line)
+        with self._lock:
+            if self._wake_pending:  # The event loop will dispatch the event.
+                return
+            self._wake_pending = True
+        try:
+            self._wake_writer.send(b'\0')
+        except OSError:
+            pass
+
+    def start(self):
+        """Start the event loop from another thread."""
+        self.is_running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the event loop and disconnect the subscribers. A broker cannot be restarted."""
+        logging.info('WeightBroker Stopped')
+        self.is_running = False
+        try:
+            self._wake_writer.send(b'\0')
+        except OSError:
+            pass
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+
+    def run(self):
+        """Run the event loop while `self.is_running` is True, thus it should be called from another thread."""
+        logging.info(f'Start WeightBroker on {self.address}')
+        self.is_running = True
+        while self.is_running:
+            for key, mask in self._selector.select():
+                if key.data is None:
+                    self._drain_wake()
+                elif key.data is self._server:
+                    self._accept()
+                elif mask & selectors.EVENT_READ:
+                    self._read(key.data)
+                else:
+                    self._flush(key.data)
+            self._dispatch()
+
+        for subscriber in list(self.subscribers):
+            self._remove(subscriber)
+        self._selector.close()
+        self._server.close()
+        if isinstance(self.address, str):
+            os.unlink(self.address)
+        self._wake_reader.close()
+        self._wake_writer.close()
+
+    def _weight_received(self, name: str, event: str, weight: Weight):
+        self.publish({'scale': name, 'event': event, 'value': weight.value, 'units': weight.units, 'time': time.time()})
+
+    def _dispatch(self):
+        events = self._events
+        while events:
+            line = events.popleft()
+            self.published += 1
+            for subscriber in self.subscribers:
+                was_empty = not subscriber.pending
+                subscriber.queue(line, self.max_buffer)
+                if was_empty:
+                    self._flush(subscriber)
+
+    def _flush(self, subscriber: Subscriber):
+        try:
+            done = subscriber.flush()
+        except OSError:
+            self._remove(subscriber)
+            return
+        events = selectors.EVENT_READ if done else selectors.EVENT_READ | selectors.EVENT_WRITE
+        if self._selector.get_key(subscriber.sock).events != events:
+            self._selector.modify(subscriber.sock, events, subscriber)
+
+    def _accept(self):
+        try:
+            sock, _ = self._server.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        subscriber = Subscriber(sock)
+        self.subscribers.append(subscriber)
+        self._selector.register(sock, selectors.EVENT_READ, subscriber)
+        logging.info(f'WeightBroker: new subscriber ({len(self.subscribers)} connected)')
+
+    def _read(self, subscriber: Subscriber):
+        """Subscribers are not expected to send data: it is discarded. An empty read means disconnected."""
+        try:
+            if subscriber.sock.recv(4096):
+                return
+        except BlockingIOError:
+            return
+        except OSError:
+            pass
+        self._remove(subscriber)
+
+    def _remove(self, subscriber: Subscriber):
+        try:
+            self._selector.unregister(subscriber.sock)
+        except (KeyError, ValueError):
+            pass
+        subscriber.sock.close()
+        self.subscribers.remove(subscriber)
+        logging.info(f'WeightBroker: subscriber disconnected ({len(self.subscribers)} connected)')
+
+    def _drain_wake(self):
+        try:
+            while self._wake_reader.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        with self._lock:  # Events published from now on wake the loop up again.
+            self._wake_pending = False
+
+
+def parse_listen_address(address: str) -> Address:
+    """Return the Unix socket path (contains a `/`) or the `(host, port)` of `host:port`."""
+    if '/' in address:
+        return address
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='Publish the readings of a scale to local subscribers.')
+    parser.add_argument('host', help='Scale address.')
+    parser.add_argument('--port', type=int, default=52212, help='Communication port of the scale.')
+    parser.add_argument('--listen', default=f'127.0.0.1:{BROKER_PORT}', help='host:port or Unix socket path.')
+    parser.add_argument('--max-buffer', type=int, default=1 << 20, help='Buffer size (bytes) per subscriber.')
+    parser.add_argument('--keyboard', action='store_true', help='Also emulate the keyboard on prints.')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    controller = MarelController(args.host, port=args.port)
+    if not args.keyboard:
+        controller.mute()
+    broker = WeightBroker(parse_listen_address(args.listen), max_buffer=args.max_buffer)
+    broker.attach(controller)
+    broker.start()
+
+    backoff = Backoff(initial=1.0, cap=10.0)
+    try:
+        while True:
+            if not controller.is_listening:
+                controller.start_listening()
+                if not controller.is_listening:
+                    time.sleep(backoff.next_delay())
+                    continue
+                backoff.reset()
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        controller.stop_listening()
+        broker.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -11,12 +11,145 @@ MAREL_MSG_ENCODING :
 
 """
 import logging
+import os
 import socket
 import time
 
+from marel_marine_scale_controller.metrics import Metrics
+from marel_marine_scale_controller.reconnect import Backoff, ReconnectSupervisor, configure_socket
+
 MAREL_MSG_ENCODING = 'utf-8'
 
 
+class FrameDecoder:
+    """
+    Incremental frame decoder backed by a preallocated bytearray.
+
+    Bytes are received directly in the buffer (`socket.recv_into`) and only the newly
+    arrived bytes are scanned for the delimiter. The complete frames of a chunk are decoded
+    together (one copy of their bytes) and split in C.
+
+    The delimiter must be encoded as a single character sequence by `encoding` (e.g. ASCII).
+
+    Bytes which are not valid for `encoding` are replaced (U+FFFD), thus a corrupted frame is
+    returned (and rejected by the protocol parser) without affecting the following frames.
+
+    Attributes
+    ----------
+    delimiter :
+        Frames delimiter. Must be a byte string.
+    encoding :
+        Encoding used to decode the frames.
+    buffer :
+        Bytes storage. Grows (doubles) only if a single frame does not fit in it.
+    start :
+        Index of the first byte of the incomplete frame.
+    end :
+        Index after the last received byte.
+    """
+    def __init__(self, delimiter: bytes = b"\n", encoding: str = MAREL_MSG_ENCODING, size: int = 2048):
+        self.delimiter = delimiter
+        self.encoding = encoding
+        self._text_delimiter = delimiter.decode(encoding)
+        self._last_byte = delimiter[0] if len(delimiter) == 1 else None
+        self.buffer = bytearray(size)
+        self._view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
+        self._scan = 0  # Index from which the delimiter is searched.
+
+    def __len__(self):
+        return self.end - self.start
+
+    @property
+    def pending(self) -> bytes:
+        """Copy of the bytes of the incomplete frame."""
+        return bytes(self._view[self.start:self.end])
+
+    def set_delimiter(self, delimiter: bytes):
+        """Change the frames delimiter. The buffered bytes are scanned again."""
+        if delimiter != self.delimiter:
+            self.delimiter = delimiter
+            self._text_delimiter = delimiter.decode(self.encoding)
+            self._last_byte = delimiter[0] if len(delimiter) == 1 else None
+            self._scan = self.start
+
+    def recv_into(self, sock: socket.socket, size: int = None) -> int:
+        """Receive up to `size` bytes from `sock` directly into the buffer.
+
+        If `size` is None, receives up to the free space of the buffer (the incomplete frame is
+        moved to the beginning of the buffer first if less than a quarter of it is free).
+
+        Returns
+        -------
+        Number of bytes received. (0 if the connection was closed)
+        """
+        if size is None:
+            size = len(self.buffer) - self.end
+            if size < len(self.buffer) // 4:
+                self._reserve(len(self.buffer) // 4)
+                size = len(self.buffer) - self.end
+        elif self.end + size > len(self.buffer):
+            self._reserve(size)
+        count = sock.recv_into(self._view[self.end:], size)
+        self.end += count
+        return count
+
+    def feed(self, data: bytes):
+        """Copy `data` into the buffer."""
+        end = self.end + len(data)
+        if end > len(self.buffer):
+            self._reserve(len(data))
+            end = self.end + len(data)
+        self.buffer[self.end:end] = data
+        self.end = end
+
+    def frames(self) -> list:
+        """Return the complete frames (decoded and without delimiter) found in the new bytes."""
+        start, end = self.start, self.end
+        if end > start and self.buffer[end - 1] == self._last_byte:
+            # Fast path (usual scale traffic): the received bytes end with a complete frame.
+            self.start = self.end = self._scan = 0
+            return self.buffer[start:end - 1].decode(self.encoding, 'replace').split(self._text_delimiter)
+
+        last = self.buffer.rfind(self.delimiter, self._scan, end)
+        if last < 0:
+            scan = end - len(self.delimiter) + 1
+            self._scan = scan if scan > start else start
+            return []
+
+        # The start is moved before decoding: an invalid frame can't be decoded again.
+        self.start = self._scan = last + len(self.delimiter)
+        # The complete frames are decoded at once and split in C.
+        return self.buffer[start:last].decode(self.encoding, 'replace').split(self._text_delimiter)
+
+    def drain(self) -> str:
+        """Return all the buffered bytes (decoded) and clear the buffer."""
+        data = str(self._view[self.start:self.end], self.encoding, 'replace')
+        self.clear()
+        return data
+
+    def clear(self):
+        """Discard the buffered bytes."""
+        self.start = self.end = self._scan = 0
+
+    def _reserve(self, size: int):
+        """Make room for `size` bytes after `self.end`."""
+        if self.end + size <= len(self.buffer):
+            return
+
+        count = self.end - self.start
+        if self.start > 0:  # Move the incomplete frame to the beginning of the buffer.
+            self.buffer[:count] = bytes(self._view[self.start:self.end])
+            self._scan -= self.start
+            self.start, self.end = 0, count
+
+        if count + size > len(self.buffer):
+            self._view.release()  # A bytearray can't be resized while a memoryview is exported.
+            self.buffer.extend(bytes(max(len(self.buffer), count + size - len(self.buffer))))
+            self._view = memoryview(self.buffer)
+
+
 class MarelClient:
     """
     Ethernet Client for Marel Controller.
@@ -40,10 +173,17 @@ class MarelClient:
         Flag that is True when the client is attempting to connect.
     auto_reconnect :
         If True, the client attempts to reconnect with a new socket when the connection is lost.
+    backoff :
+        Backoff of the delays between the connection attempts.
     reconnect_delay :
-        Time in second between each reconnection attempts.
-    data_buffer :
-        Binary buffer of the received data.
+        Maximum time in second between reconnection attempts. (`self.backoff.cap`)
+    supervisor :
+        ReconnectSupervisor reconnecting the client when the connection is lost in `self.receive`.
+        Its `recoveries` are the times to recover.
+    decoder :
+        FrameDecoder buffering the received data.
+    stats :
+        Metrics of the client (recv and decode stages, connection counters). Disabled by default.
     """
     def __init__(self):
         self.host = None
@@ -53,8 +193,23 @@ class MarelClient:
         self.is_connected = False
         self.is_connecting = False
         self.auto_reconnect = True
-        self.reconnect_delay = 2  # seconds
-        self.data_buffer = None
+        self.backoff = Backoff(initial=0.1, cap=2.0)
+        self.supervisor = ReconnectSupervisor(self)
+        self.decoder = FrameDecoder()
+        self.stats = Metrics()
+
+    @property
+    def reconnect_delay(self) -> float:
+        return self.backoff.cap
+
+    @reconnect_delay.setter
+    def reconnect_delay(self, value: float):
+        self.backoff.cap = value
+
+    @property
+    def data_buffer(self) -> bytes:
+        """Received bytes not yet returned as a message."""
+        return self.decoder.pending
 
     def connect(self, host: str, port: int, single_try=True, test_connection=False, timeout=1):
         """Connect socket to `host:post`.
@@ -78,24 +233,15 @@ class MarelClient:
             Timeout value (seconds) for the connection attempts.
 
         """
-        self.data_buffer = b''
         self.host = host
         self.port = port
         self.auto_reconnect = True
+        self.backoff.reset()
 
         self.is_connecting = True
         while self.auto_reconnect:
-            logging.info(f'Trying to connect ... {host}:{port}')
             try:
-                self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                self.socket.settimeout(timeout)
-                self.socket.connect((self.host, self.port))
-
-                if test_connection is True:
-                    self.test_new_connection()
-
-                self.socket.settimeout(self.timeout)
-                self.is_connected = True
+                self.connect_once(timeout, test_connection)
                 break
             except OSError as err:
                 # INFO:root:Connection failed. OSError [Errno 113] No route to host GOT THIS ON WIFI
@@ -103,8 +249,9 @@ class MarelClient:
                 if err.errno == 133:
                     logging.info('Host not found, exiting.')
                 elif (not single_try) and self.auto_reconnect:
-                    logging.info(f"Retrying in {self.reconnect_delay} seconds...")
-                    time.sleep(self.reconnect_delay)
+                    delay = self.backoff.next_delay()
+                    logging.info(f"Retrying in {delay:.2f} seconds...")
+                    time.sleep(delay)
                     continue
 
                 time.sleep(1)  # Small delay after a failed single connection attempt. Help with the GUI>
@@ -113,6 +260,86 @@ class MarelClient:
         self.is_connecting = False
         self.auto_reconnect = True
 
+    def connect_once(self, timeout: float = 1, test_connection: bool = False):
+        """Make one connection attempt to `self.host:self.port`.
+
+        The socket options are set by `reconnect.configure_socket` (TCP_NODELAY and keepalive).
+
+        Parameters
+        ----------
+        timeout :
+            Timeout value (seconds) of the attempt.
+        test_connection :
+            If True, the connection is tested. See `self.test_new_connection`.
+
+        Raises
+        ------
+        OSError if the attempt failed. The socket is closed.
+        """
+        logging.info(f'Trying to connect ... {self.host}:{self.port}')
+        self.decoder.clear()
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            configure_socket(self.socket)
+            self.socket.settimeout(timeout)
+            self.socket.connect((self.host, self.port))
+
+            if test_connection is True:
+                self.test_new_connection()
+        except OSError:
+            self.socket.close()
+            raise
+
+        self.socket.settimeout(self.timeout)
+        self.is_connected = True
+
+    def connect_nowait(self, host: str, port: int) -> socket.socket:
+        """Start a non-blocking connection to `host:port`.
+
+        Sets `self.is_connecting` to True. The returned socket becomes writable once the connection
+        attempt is over, at which point `self.finish_connect` must be called.
+
+        Parameters
+        ----------
+        host :
+            IP Address of the host. Sets the self.host value.
+        port :
+            Port Number to connect to. Sets the self.port value.
+
+        Returns
+        -------
+        The connecting socket.
+        """
+        self.decoder.clear()
+        self.host = host
+        self.port = port
+
+        logging.info(f'Trying to connect ... {host}:{port}')
+        self.is_connecting = True
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        configure_socket(self.socket)
+        self.socket.setblocking(False)
+        self.socket.connect_ex((self.host, self.port))
+        return self.socket
+
+    def finish_connect(self) -> bool:
+        """Complete a connection started with `self.connect_nowait`.
+
+        Returns
+        -------
+        True if the socket is connected. On failure, the socket is closed.
+        """
+        self.is_connecting = False
+        err = self.socket.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if err != 0:
+            logging.info(f"Connection failed. OSError {os.strerror(err)}")
+            self.close()
+            return False
+
+        self.socket.settimeout(self.timeout)
+        self.is_connected = True
+        return True
+
     def send(self, message: str):
         """Send message via `self.socket`.
 
@@ -141,7 +368,9 @@ class MarelClient:
         Timeout Error is internally raised if no bytes are received.
 
         If a Timeout error is raised an `self.allow_timeout` is False, the socket will be closed
-        setting `self.is_connected` to False. If `self.auto_reconnect` is True, `self.connect` is called.
+        setting `self.is_connected` to False. If `self.auto_reconnect` is True, `self.supervisor`
+        reconnects the client from its own thread: while it does, this method waits for the
+        reconnection (at most `self.timeout` seconds per call) and returns an empty list.
 
         Parameters
         ----------
@@ -158,14 +387,26 @@ class MarelClient:
         -------
         List of decoded messages or empty list.
         """
+        if not self.is_connected and self.supervisor.is_recovering:
+            if not self.supervisor.wait_connected(self.timeout):
+                return []
+
+        if len(self.decoder):  # Complete messages may already be buffered (e.g. by `test_new_connection`).
+            messages = self.decode_received(split=split, split_char=split_char)
+            if messages:
+                return messages
+
         while True:
             try:
-                received = self.socket.recv(4096)
+                received = self._recv()
 
-                if received == b"":  # The Scale is not supposed to send Empty string. Does so on bad connection.
+                if received == 0:  # The Scale is not supposed to send Empty string. Does so on bad connection.
                     raise TimeoutError
 
             except OSError as err:
+                if err.errno is None and self.stats.enabled:
+                    self.stats.timeouts += 1
+
                 if err.errno is None and allow_timeout:
                     return []
 
@@ -173,33 +414,114 @@ class MarelClient:
                 logging.info('Connection lost.')
                 self.close()
 
-                if self.auto_reconnect:
-                    logging.info(f"Trying to reconnect in {self.reconnect_delay} seconds...")
-                    time.sleep(self.reconnect_delay)
-                    self.connect(self.host, self.port)
+                if self.auto_reconnect and self.host is not None:
+                    self.supervisor.connection_lost()
 
                 return []
 
-            self.data_buffer += received
+            messages = self.decode_received(split=split, split_char=split_char)
+            if messages:
+                return messages
+
+    def receive_available(self, split_char: bytes = b"\n") -> list:
+        """Receive the data available on `self.socket` with a single recv call.
+
+        Meant to be called when the socket is known to be readable (e.g. from a `selectors` loop),
+        thus it never blocks waiting for a complete message.
+
+        Unlike `self.receive`, the client does not try to reconnect when the connection is lost:
+        the socket is closed and reconnecting is left to the caller.
+
+        Parameters
+        ----------
+        split_char :
+            Character for splitting. Must be a byte string.
+
+        Returns
+        -------
+        List of decoded messages or empty list.
+        """
+        try:
+            if self._recv() == 0:
+                raise TimeoutError
+        except OSError as err:
+            logging.debug(f"MAREL: OSError on receive: {err}")
+            logging.info('Connection lost.')
+            self.close()
+            return []
+
+        return self.decode_received(split=True, split_char=split_char)
+
+    def buffer_received(self, received: bytes, split=True, split_char: bytes = b"\n") -> list:
+        """Add `received` to the buffer of `self.decoder` and return the complete messages.
 
-            if split is True:
-                messages = self.data_buffer.split(split_char)
-                if len(messages) > 1:
-                    self.data_buffer = messages.pop()
-                    return [message.decode(MAREL_MSG_ENCODING) for message in messages]
-            else:
-                message = [self.data_buffer.decode(MAREL_MSG_ENCODING)]
-                self.data_buffer = b''
-                return message
+        Parameters
+        ----------
+        received :
+            Bytes received from the socket.
+        split :
+            See `self.decode_received`.
+        split_char :
+            See `self.decode_received`.
+
+        Returns
+        -------
+        List of decoded messages or empty list.
+        """
+        self.decoder.feed(received)
+        return self.decode_received(split=split, split_char=split_char)
+
+    def decode_received(self, split=True, split_char: bytes = b"\n") -> list:
+        """Return the complete messages buffered by `self.decoder`.
+
+        Parameters
+        ----------
+        split :
+            If True, messages are split on `split_char` and the incomplete last message
+            is kept in the buffer. Else, the whole buffer is returned as one message.
+        split_char :
+            Character for splitting. Must be a byte string.
+
+        Returns
+        -------
+        List of decoded messages or empty list.
+        """
+        if self.stats.enabled:
+            start = time.perf_counter()
+            messages = self._decode(split, split_char)
+            self.stats.observe('decode', time.perf_counter() - start)
+            self.stats.frames_in += len(messages)
+            return messages
+        return self._decode(split, split_char)
+
+    def _decode(self, split: bool, split_char: bytes) -> list:
+        if split is True:
+            self.decoder.set_delimiter(split_char)
+            return self.decoder.frames()
+
+        return [self.decoder.drain()]
+
+    def _recv(self) -> int:
+        """Receive from `self.socket` into `self.decoder`, recording the recv stage metrics if enabled."""
+        if not self.stats.enabled:
+            return self.decoder.recv_into(self.socket)
+
+        start = time.perf_counter()
+        count = self.decoder.recv_into(self.socket)
+        self.stats.observe('recv', time.perf_counter() - start)
+        self.stats.bytes_in += count
+        return count
 
     def disconnect(self):
         """Force disconnection of the socket.
 
-        `self.auto_reconnect` is set to False to prevent auto-reconnection and `self.close` is called.
+        `self.auto_reconnect` is set to False to prevent auto-reconnection (`self.supervisor` is stopped)
+        and `self.close` is called.
 
         """
         logging.info('Disconnecting Client')
         self.auto_reconnect = False
+        self.supervisor.stop()
         self.close()
 
     def test_new_connection(self):
@@ -208,10 +530,10 @@ class MarelClient:
         The client will briefly connect to the scale even if the scale is already connected
         to another device, thus is unavailable.
 
-        This function calls self.socket.recv(4096).
+        This function calls self.socket.recv_into(...). The received data is kept in the buffer.
         If no data is received, an OSError is raised.
         """
-        if not self.socket.recv(4096):
+        if not self.decoder.recv_into(self.socket):
             raise OSError
 
     def close(self):
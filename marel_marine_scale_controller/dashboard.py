@@ -0,0 +1,256 @@
+"""
+This module contains the Dashboard, a window showing the live weight, link LED and last print of many scales.
+
+The scales are driven by a single ScaleHub event loop. The hub callbacks only update the shared
+DashboardState (under a lock) and mark the changed rows: they never touch Tk. The Tk thread redraws
+once per frame (`FRAME_INTERVAL` ms): it collects a snapshot of the rows changed since the previous
+frame and only updates their Treeview items. A burst of messages from many scales thus costs one
+redraw per frame, and scales with a steady weight cost none.
+
+Usage
+-----
+    $ python -m marel_marine_scale_controller.dashboard 192.168.0.202 192.168.0.203:52212 --units g
+
+Attributes
+----------
+FRAME_INTERVAL :
+    Delay in milliseconds between two redraws.
+HEALTH_CHECK_INTERVAL :
+    Delay in seconds between two checks of the scales link health (`MarelController.link`).
+COLUMNS :
+    Columns of the dashboard table.
+
+Examples
+--------
+>>> dashboard = Dashboard()
+>>> dashboard.add_scale('192.168.0.202')
+>>> dashboard.add_scale('192.168.0.203')
+>>> dashboard.run()
+"""
+import argparse
+import dataclasses
+import logging
+import sys
+import threading
+import time
+import tkinter as tk
+from dataclasses import dataclass
+from tkinter import ttk
+from typing import *
+
+from marel_marine_scale_controller import VERSION
+from marel_marine_scale_controller.gui import WEIGHT_DECIMALS, format_weight
+from marel_marine_scale_controller.hub import ScaleHub
+from marel_marine_scale_controller.marel_controller import (
+    COMM_PORT, CONNECTING, LISTENING, STOPPED, MarelController, Weight
+)
+
+FRAME_INTERVAL = 50
+HEALTH_CHECK_INTERVAL = 0.5
+
+STALE = 'stale'
+LED = '●'
+LED_COLORS = {STOPPED: 'red', CONNECTING: 'goldenrod', STALE: 'darkorange', LISTENING: 'green'}
+COLUMNS = ('scale', 'link', 'weight', 'last print', 'printed at')
+
+
+@dataclass
+class ScaleRow:
+    """State of a scale displayed by the dashboard."""
+    name: str
+    status: str = STOPPED
+    healthy: bool = False
+    weight: Weight = None
+    last_print: Weight = None
+    print_time: float = None  # `time.time()`
+
+    @property
+    def link(self) -> str:
+        """Status of the LED: the link is STALE while listening to a silent scale."""
+        if self.status == LISTENING and not self.healthy:
+            return STALE
+        return self.status
+
+
+class DashboardState:
+    """
+    Latest state of every scale, shared by the hub thread (writer) and the Tk thread (reader).
+
+    Attributes
+    ----------
+    rows :
+        ScaleRow by scale name. Must only be read through `self.collect`.
+    updates :
+        Number of changes made by `self.update`.
+    """
+    def __init__(self):
+        self.rows: Dict[str, ScaleRow] = {}
+        self.updates = 0
+        self._dirty: Dict[str, None] = {}  # Names of the rows changed since the last `collect` (ordered).
+        self._lock = threading.Lock()
+
+    def add(self, name: str):
+        """Add an empty row."""
+        with self._lock:
+            self.rows[name] = ScaleRow(name)
+            self._dirty[name] = None
+
+    def update(self, name: str, **changes):
+        """Change fields of the row `name`. The row is only marked as changed if a value differs."""
+        with self._lock:
+            row = self.rows[name]
+            if all(getattr(row, field) == value for field, value in changes.items()):
+                return
+            for field, value in changes.items():
+                setattr(row, field, value)
+            self._dirty[name] = None
+            self.updates += 1
+
+    def touch(self):
+        """Mark every row as changed (e.g. to redraw the weights in other units)."""
+        with self._lock:
+            self._dirty = dict.fromkeys(self.rows)
+
+    def collect(self) -> List[ScaleRow]:
+        """Return a snapshot (copies) of the rows changed since the previous call."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            return [dataclasses.replace(self.rows[name]) for name in dirty]
+
+    def watch(self, name: str, controller: MarelController):
+        """Update the row `name` from the callbacks of `controller`."""
+        controller.weight_callbacks.append(lambda _, weight: self.update(name, weight=weight))
+        controller.print_callbacks.append(lambda _, weight: self.update(name, last_print=weight, print_time=time.time()))
+        controller.state_callbacks.append(lambda _, status: self.update(name, status=status))
+
+    def check_health(self, scales: Dict[str, MarelController], now: float = None):
+        """Update the `healthy` field of the rows from the link health of the `scales` controllers."""
+        now = time.monotonic() if now is None else now
+        for name, controller in scales.items():
+            self.update(name, healthy=controller.link.is_healthy(now))
+
+
+class Dashboard:
+    """
+    Tk window showing every scale of a ScaleHub in a table.
+
+    Attributes
+    ----------
+    hub :
+        ScaleHub driving the scales.
+    state :
+        DashboardState updated by the hub callbacks.
+    units :
+        Units of the displayed weights.
+    redraws :
+        Number of frames where at least one row was redrawn.
+    redraw_time :
+        Total time (seconds) spent redrawing the rows.
+    """
+    def __init__(self, hub: ScaleHub = None, units: str = 'kg'):
+        self.hub = hub or ScaleHub()
+        self.state = DashboardState()
+        self.units = units
+        self.redraws = 0
+        self.redraw_time = 0.0
+        self._next_health_check = 0.0
+
+        self.root = tk.Tk()
+        self.root.title("Marel Dashboard")
+
+        toolbar = tk.Frame(self.root)
+        tk.Label(toolbar, text='units:').pack(side='left', padx=2)
+        self.units_var = tk.StringVar(toolbar, value=units)
+        tk.OptionMenu(toolbar, self.units_var, *WEIGHT_DECIMALS, command=self.set_units).pack(side='left', padx=2)
+        tk.Label(toolbar, text=f'Version: {VERSION}', font=('jetbrains mono', 8, 'italic')).pack(side='right', padx=2)
+        toolbar.pack(fill='x', pady=2)
+
+        table = tk.Frame(self.root)
+        self.tree = ttk.Treeview(table, columns=COLUMNS, show='headings', height=20)
+        for column in COLUMNS:
+            self.tree.heading(column, text=column.capitalize())
+            self.tree.column(column, anchor='center' if column == 'link' else 'e', width=50 if column == 'link' else 130)
+        for link, color in LED_COLORS.items():
+            self.tree.tag_configure(link, foreground=color)
+        scrollbar = ttk.Scrollbar(table, orient='vertical', command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side='left', fill='both', expand=True)
+        scrollbar.pack(side='right', fill='y')
+        table.pack(fill='both', expand=True, padx=2, pady=2)
+
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def add_scale(self, host: str, port: int = COMM_PORT, name: str = None) -> MarelController:
+        """Add a scale to the hub and to the table. (Called from the Tk thread.)
+
+        Returns
+        -------
+        The MarelController of the scale.
+        """
+        name = name or f'{host}:{port}'
+        controller = self.hub.add_scale(host, port, name=name)
+        self.state.add(name)
+        self.state.watch(name, controller)
+        self.tree.insert('', 'end', iid=name, values=self.row_values(ScaleRow(name)), tags=(STOPPED,))
+        return controller
+
+    def run(self):
+        """Start the hub and run the window."""
+        self.hub.start()
+        self.root.after(FRAME_INTERVAL, self.redraw)
+        self.root.mainloop()
+
+    def set_units(self, units: str):
+        self.units = units
+        self.state.touch()
+
+    def row_values(self, row: ScaleRow) -> Tuple[str, ...]:
+        """Return the values displayed in the table for `row`."""
+        weight = row.weight if row.status == LISTENING else None
+        printed = format_weight(row.last_print, self.units) if row.last_print is not None else ''
+        printed_at = time.strftime('%H:%M:%S', time.localtime(row.print_time)) if row.print_time is not None else ''
+        return row.name, LED, format_weight(weight, self.units), printed, printed_at
+
+    def redraw(self):
+        """Redraw the rows changed since the previous frame. Reschedules itself every `FRAME_INTERVAL` ms."""
+        now = time.monotonic()
+        if now >= self._next_health_check:
+            self.state.check_health(self.hub.scales, now)
+            self._next_health_check = now + HEALTH_CHECK_INTERVAL
+
+        rows = self.state.collect()
+        if rows:
+            start = time.perf_counter()
+            for row in rows:
+                self.tree.item(row.name, values=self.row_values(row), tags=(row.link,))
+            self.redraw_time += time.perf_counter() - start
+            self.redraws += 1
+        self.root.after(FRAME_INTERVAL, self.redraw)
+
+    def on_close(self):
+        self.hub.stop()
+        self.root.destroy()
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    """Return the host and port of `host[:port]` (default port: COMM_PORT)."""
+    host, _, port = address.partition(':')
+    return host, int(port) if port else COMM_PORT
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='Show the live weight of many scales.')
+    parser.add_argument('addresses', nargs='+', help='Scales addresses: host[:port].')
+    parser.add_argument('--units', default='kg', choices=list(WEIGHT_DECIMALS), help='Units of the displayed weights.')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    dashboard = Dashboard(units=args.units)
+    for address in args.addresses:
+        dashboard.add_scale(*parse_address(address))
+    dashboard.run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
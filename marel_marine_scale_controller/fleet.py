@@ -0,0 +1,131 @@
+"""
+This module contains `deploy_fleet`, used to deploy the Lua App to many scales concurrently.
+
+Each host is updated with `MarelController.update_lua_code` from a bounded pool of worker threads.
+Per host results use the same codes as `update_lua_code`:
+    -1: scale not reached, 0: verification failed, 1: deployed (or already deployed when skipping).
+
+Usage
+-----
+    $ python -m marel_marine_scale_controller.fleet 192.168.0.202 192.168.0.203 --workers 8
+
+Examples
+--------
+>>> report = deploy_fleet(['192.168.0.202', '192.168.0.203'], 'static/marel_app_v2.lua')
+>>> print(report.summary())
+"""
+import argparse
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import *
+
+from marel_marine_scale_controller import LUA_CACHE_PATH, LUA_SCRIPT_PATH
+from marel_marine_scale_controller.lua_deploy import LuaDigestCache, LuaUpdateReport
+from marel_marine_scale_controller.marel_controller import MarelController
+
+RESULT_LABELS = {-1: 'unreachable', 0: 'failed', 1: 'ok'}
+
+
+@dataclass
+class FleetReport:
+    """Results of `deploy_fleet` by host and total duration (seconds)."""
+    results: Dict[str, LuaUpdateReport] = field(default_factory=dict)
+    duration: float = 0.0
+
+    def hosts(self, result: int) -> List[str]:
+        """Return the hosts with the `result` code."""
+        return [host for host, report in self.results.items() if report.result == result]
+
+    @property
+    def succeeded(self) -> bool:
+        return all(report.result == 1 for report in self.results.values())
+
+    def summary(self) -> str:
+        lines = [f"{'host':<20} {'result':<12} {'skipped':<8} {'duration (s)':>12}"]
+        for host, report in self.results.items():
+            lines.append(f"{host:<20} {RESULT_LABELS[report.result]:<12} {str(report.skipped):<8} {report.duration:12.2f}")
+        counts = ', '.join(f'{len(self.hosts(code))} {label}' for code, label in RESULT_LABELS.items())
+        lines.append(f'{len(self.results)} hosts in {self.duration:.2f} s: {counts}.')
+        return '\n'.join(lines)
+
+
+def deploy_host(host: str, filename: str, socket_timeout: float = 2.0, skip_if_current: bool = False,
+                lua_cache: LuaDigestCache = None) -> LuaUpdateReport:
+    """Update the Lua App of one scale. Exceptions are logged and reported as -1."""
+    start = time.monotonic()
+    controller = MarelController(host)
+    controller.client.timeout = socket_timeout
+    if lua_cache is not None:
+        controller.lua_cache = lua_cache
+    try:
+        controller.update_lua_code(filename, skip_if_current=skip_if_current)
+        return controller.last_lua_update
+    except Exception as err:
+        logging.error(f'Lua deployment on {host} failed: {err}')
+        return LuaUpdateReport(-1, False, time.monotonic() - start)
+
+
+def deploy_fleet(hosts: Iterable[str], filename: str, max_workers: int = 8, socket_timeout: float = 2.0,
+                 skip_if_current: bool = False, lua_cache: LuaDigestCache = None) -> FleetReport:
+    """Deploy the Lua App `filename` to every host concurrently.
+
+    Parameters
+    ----------
+    hosts :
+        Scales addresses. Duplicates are deployed once.
+    filename :
+        Lua code file.
+    max_workers :
+        Maximum number of concurrent deployments.
+    socket_timeout :
+        Socket timeout (seconds) of each host: maximum silence of the scale while verifying.
+        It is not a deadline for the whole deployment of a host.
+    skip_if_current :
+        Skip the scales already running the Lua code. See `MarelController.update_lua_code`.
+    lua_cache :
+        LuaDigestCache shared by the deployments (in memory if None).
+
+    Returns
+    -------
+    FleetReport, with the hosts in the given order.
+
+    Raises
+    ------
+    OSError if `filename` cannot be read (checked before any deployment).
+    """
+    with open(filename, 'r') as lua_app:
+        lua_app.read()
+
+    hosts = list(dict.fromkeys(hosts))
+    lua_cache = lua_cache or LuaDigestCache()
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='lua-deploy') as executor:
+        futures = {host: executor.submit(deploy_host, host, filename, socket_timeout, skip_if_current, lua_cache) for host in hosts}
+        results = {host: future.result() for host, future in futures.items()}
+    return FleetReport(results, time.monotonic() - start)
+
+
+def main(argv: List[str] = None):
+    package = Path(__file__).parent
+    parser = argparse.ArgumentParser(description='Deploy the Lua App to many scales concurrently.')
+    parser.add_argument('hosts', nargs='+', help='Scales addresses.')
+    parser.add_argument('--file', default=str(package.joinpath(LUA_SCRIPT_PATH)), help='Lua code file.')
+    parser.add_argument('--workers', type=int, default=8, help='Maximum number of concurrent deployments.')
+    parser.add_argument('--socket-timeout', type=float, default=2.0, help='Socket timeout (seconds) per host.')
+    parser.add_argument('--skip-if-current', action='store_true', help='Skip the scales already running the Lua code.')
+    parser.add_argument('--cache', default=str(package.joinpath(LUA_CACHE_PATH)), help='Lua digest cache file.')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    report = deploy_fleet(args.hosts, args.file, args.workers, args.socket_timeout, args.skip_if_current,
+                          LuaDigestCache(args.cache))
+    print(report.summary())
+    return 0 if report.succeeded else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
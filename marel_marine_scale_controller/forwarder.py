@@ -0,0 +1,308 @@
+"""
+This module contains the PrintForwarder: a sink pushing the print events to a remote HTTP service.
+
+Events are queued by the listening thread (never blocks) and posted by a dedicated thread as a
+JSON array, in batches:
+    - as soon as `batch_size` events are pending,
+    - or `batch_interval` seconds after the first pending event.
+
+A single persistent HTTP/1.1 connection (keep-alive) is reused for every batch. While the remote is
+down (connection error, 5xx, 408 or 429 answer), failed batches are spooled (appended to `spool_path`,
+JSON lines, or in memory) and retried with an exponential delay. Spooled events are sent before the
+new ones, thus the order is preserved. The spool file is only rewritten when it is drained.
+
+A batch rejected by the remote (other 4xx answers) would be rejected again: it is not retried but
+appended to `dead_letter_path` (JSON lines).
+
+Event posted:
+    {"host": "<scale host>", "time": <time.time()>, "value": <float>, "units": "<units>"}
+
+Examples
+--------
+>>> forwarder = PrintForwarder('http://db.local:8080/prints', spool_path='prints.spool')
+>>> controller.print_callbacks.append(forwarder)
+>>> forwarder.stop()
+"""
+import collections
+import http.client
+import json
+import logging
+import os
+import threading
+import time
+from typing import *
+from urllib.parse import urlsplit
+
+RETRYABLE_STATUSES = (408, 429)  # 4xx statuses retried as 5xx.
+
+SENT, RETRY, REJECTED = 'sent', 'retry', 'rejected'  # Outcomes of a post.
+
+
+class PrintForwarder:
+    """
+    Batched forwarding of the print events to an HTTP endpoint.
+
+    The forwarder is a print callback: `controller.print_callbacks.append(forwarder)`.
+
+    Attributes
+    ----------
+    url :
+        Endpoint (`http://` or `https://`) receiving the batches as POST requests.
+    batch_size :
+        Maximum number of events per request.
+    batch_interval :
+        Maximum time (seconds) an event waits for its batch to fill.
+    maxsize :
+        Maximum number of queued events. When full, the oldest event is dropped.
+        Also bounds the memory spool (`spool_path` None).
+    spool_path :
+        File of the events not yet accepted by the remote. If None, they are kept in memory.
+    dead_letter_path :
+        File of the events rejected by the remote. If None, they are only logged.
+    timeout :
+        Socket timeout (seconds) of the HTTP connection.
+    retry_delay :
+        Initial delay (seconds) before retrying a failed batch. Doubled on each failure up to `max_retry_delay`.
+    sent :
+        Number of events accepted by the remote.
+    dropped :
+        Number of events dropped because the queue (or the memory spool) was full.
+    failures :
+        Number of failed requests.
+    rejected :
+        Number of events rejected by the remote (4xx answer).
+    spooled :
+        Number of events in the spool (not yet accepted by the remote). A spool file left by a previous
+        session is sent first.
+    """
+    def __init__(self, url: str, batch_size: int = 100, batch_interval: float = 1.0, maxsize: int = 100_000,
+                 spool_path: str = None, timeout: float = 5.0, retry_delay: float = 1.0, max_retry_delay: float = 30.0,
+                 dead_letter_path: str = None):
+        url = urlsplit(url)
+        if url.scheme not in ('http', 'https'):
+            raise ValueError(f'Invalid url scheme {url.scheme!r}. Expected http or https.')
+        self.url = url.geturl()
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.maxsize = maxsize
+        self.spool_path = spool_path
+        self.dead_letter_path = dead_letter_path
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.sent = 0
+        self.dropped = 0
+        self.failures = 0
+        self.rejected = 0
+
+        self._scheme, self._netloc = url.scheme, url.netloc
+        self._path = (url.path or '/') + (f'?{url.query}' if url.query else '')
+        self._connection: http.client.HTTPConnection = None
+        self._queue = collections.deque()
+        self._memory_spool: Deque[str] = collections.deque()
+        self.spooled = 0
+        self._write_spool(self._read_spool())  # Removes a partially written last line (crash).
+        self._busy = False
+        self._flushing = False
+        self._delay = retry_delay
+        self._next_retry = 0.0
+        self._running = False
+        self._condition = threading.Condition()
+        self._thread: threading.Thread = None
+
+    def __call__(self, controller, weight):
+        self.submit({'host': controller.host, 'time': time.time(), 'value': weight.value, 'units': weight.units})
+
+    def __len__(self):
+        return len(self._queue)
+
+    def start(self):
+        """Start the forwarding thread. (Called by the first `submit`.)"""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = None):
+        """Post the queued events (a last attempt, failed ones are spooled) and stop the thread."""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def submit(self, event: dict):
+        """Queue an event. Never blocks: when the queue is full, the oldest event is dropped."""
+        if not self._running:
+            self.start()
+        with self._condition:
+            if len(self._queue) >= self.maxsize:
+                logging.warning(f'Forwarder queue full, dropping event {self._queue.popleft()}.')
+                self.dropped += 1
+            self._queue.append(event)
+            if len(self._queue) == 1 or len(self._queue) >= self.batch_size:  # Starts the batch timer or sends the batch.
+                self._condition.notify_all()
+
+    def flush(self, timeout: float = None) -> bool:
+        """Post the queued events now (without waiting for the batch interval) and wait until done.
+
+        Returns
+        -------
+        False on timeout. Events may still be spooled (remote down).
+        """
+        with self._condition:
+            self._flushing = True
+            self._condition.notify_all()
+            try:
+                return self._condition.wait_for(lambda: not self._queue and not self._busy, timeout)
+            finally:
+                self._flushing = False
+
+    def _next_batch(self) -> List[dict]:
+        """Wait for a full batch, the batch interval or a retry time and pop the batch."""
+        with self._condition:
+            if not self._queue:
+                retry = max(0.0, self._next_retry - time.monotonic()) if self.spooled else None
+                self._condition.wait_for(lambda: self._queue or not self._running, retry)
+            if self._queue:
+                first = time.monotonic()  # The batch timer starts when the thread sees the first event.
+                self._condition.wait_for(
+                    lambda: len(self._queue) >= self.batch_size or self._flushing or not self._running,
+                    max(0.0, first + self.batch_interval - time.monotonic()),
+                )
+            self._busy = True
+            return [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+
+    def _run(self):
+        while self._running or self._queue:
+            batch = self._next_batch()
+            try:
+                lines = [json.dumps(event) for event in batch]
+                if self.spooled:
+                    self._append_spool(lines)
+                    if not self._running or time.monotonic() >= self._next_retry:
+                        self._drain_spool()
+                elif lines:
+                    outcome = self._post(lines)
+                    if outcome == RETRY:
+                        self._append_spool(lines)
+                    elif outcome == REJECTED:
+                        self._dead_letter(lines)
+            except Exception as err:
+                logging.error(f'Error on forwarding of {len(batch)} events: {err}')
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+    def _drain_spool(self):
+        """Post the spooled events in batches until the spool is empty or a request fails."""
+        spool = self._read_spool()
+        done = 0
+        while done < len(spool):
+            batch = spool[done:done + self.batch_size]
+            outcome = self._post(batch)
+            if outcome == RETRY:
+                break
+            if outcome == REJECTED:
+                self._dead_letter(batch)
+            done += len(batch)
+        if done:
+            self._write_spool(spool[done:])
+
+    def _post(self, lines: List[str]) -> str:
+        """Post a batch (JSON encoded events). On failure, the next retry is scheduled.
+
+        Returns
+        -------
+        SENT, RETRY (remote unavailable) or REJECTED (4xx answer, the batch would be rejected again).
+        """
+        body = ('[' + ','.join(lines) + ']').encode()
+        for _ in range(2):  # A kept-alive connection may have been closed by the remote: retry once.
+            try:
+                if self._connection is None:
+                    connection_class = http.client.HTTPSConnection if self._scheme == 'https' else http.client.HTTPConnection
+                    self._connection = connection_class(self._netloc, timeout=self.timeout)
+                self._connection.request('POST', self._path, body, {'Content-Type': 'application/json'})
+                response = self._connection.getresponse()
+                response.read()
+                if response.status // 100 == 2:
+                    self.sent += len(lines)
+                    self._delay = self.retry_delay
+                    return SENT
+                logging.warning(f'Forwarder: {self.url} answered {response.status} {response.reason}')
+                if response.status // 100 == 4 and response.status not in RETRYABLE_STATUSES:
+                    self.rejected += len(lines)
+                    return REJECTED
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as err:
+                logging.debug(f'Forwarder connection lost: {err}')
+                self._connection.close()
+                self._connection = None
+            except (OSError, http.client.HTTPException) as err:
+                logging.warning(f'Forwarder: {self.url} unreachable: {err}')
+                if self._connection is not None:
+                    self._connection.close()
+                    self._connection = None
+                break
+
+        self.failures += 1
+        self._next_retry = time.monotonic() + self._delay
+        self._delay = min(2 * self._delay, self.max_retry_delay)
+        return RETRY
+
+    def _dead_letter(self, lines: List[str]):
+        logging.error(f'Forwarder: {len(lines)} events rejected by {self.url}: {lines[0]}, ...')
+        if self.dead_letter_path is not None:
+            with open(self.dead_letter_path, 'a') as f:
+                f.write('\n'.join(lines) + '\n')
+
+    def _read_spool(self) -> List[str]:
+        """Return the spooled lines. A partially written last line is ignored."""
+        if self.spool_path is None:
+            return list(self._memory_spool)
+        if not os.path.exists(self.spool_path):
+            return []
+        with open(self.spool_path, 'r') as f:
+            data = f.read()
+        return [line for line in data[:data.rfind('\n') + 1].splitlines() if line]
+
+    def _append_spool(self, lines: List[str]):
+        """Add lines at the end of the spool."""
+        if not lines:
+            return
+        if self.spool_path is None:
+            self._memory_spool.extend(lines)
+            overflow = len(self._memory_spool) - self.maxsize
+            if overflow > 0:
+                logging.warning(f'Forwarder spool full, dropping {overflow} events.')
+                for _ in range(overflow):
+                    self._memory_spool.popleft()
+                self.dropped += overflow
+            self.spooled = len(self._memory_spool)
+        else:
+            with open(self.spool_path, 'a') as f:
+                f.write('\n'.join(lines) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self.spooled += len(lines)
+
+    def _write_spool(self, lines: List[str]):
+        """Replace the spool by `lines`."""
+        if self.spool_path is None:
+            self._memory_spool = collections.deque(lines)
+        elif lines:
+            with open(self.spool_path + '.tmp', 'w') as f:
+                f.write('\n'.join(lines) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(self.spool_path + '.tmp', self.spool_path)  # Atomic: a crash leaves the old or the new spool.
+        elif os.path.exists(self.spool_path):
+            os.remove(self.spool_path)
+        self.spooled = len(lines)
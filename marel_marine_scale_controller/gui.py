@@ -13,6 +13,14 @@ Notes
 -----
 The last host ip address used is store in `./config/gui_config.json`
 
+The GUI is event driven: the controller callbacks (weights, status changes) are called from the
+listening thread and only put events in `GUI.events`. The events are drained from the Tk thread
+every `EVENT_POLL_INTERVAL` ms and only the widgets whose state changed are reconfigured.
+
+The controller commands (start, stop, units, Lua update) are never run on the Tk thread: they are
+submitted to `GUI.executor` and their completion is put in `GUI.events` as well, thus the window
+stays responsive while connecting, disconnecting or updating the Lua App.
+
 Attributes
 ----------
 PROGRAM_DIRECTORY :
@@ -23,29 +31,43 @@ CONFIG_PATH :
     Relative path to the gui configuration file.
 LOGO_PATH:
     Relative path to the gui app logo.
+LUA_CACHE_PATH:
+    Relative path to the digest cache of the Lua Script deployed on the scales.
 ABS_LUA_SCRIPT_PATH :
     Absolute path to the Lua Script.
 ABS_CONFIG_PATH :
     Absolute path to the gui configuration file.
 ABS_LOGO_PATH:
     Absolute path to the gui app logo.
+ABS_LUA_CACHE_PATH:
+    Absolute path to the digest cache of the Lua Script deployed on the scales.
+EVENT_POLL_INTERVAL :
+    Delay in milliseconds between two drains of the GUI events queue.
+WEIGHT_DECIMALS :
+    Number of decimals displayed by units.
+LED_COLORS :
+    Color of the status LED by controller status.
 
 """
+import logging
 import platform
 import json
-import threading
-import time
+import queue
 import tkinter as tk
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
+from typing import *
 
-from marel_marine_scale_controller import VERSION, LUA_SCRIPT_PATH, CONFIG_PATH, LOGO_PATH
-from marel_marine_scale_controller.marel_controller import MarelController
+from marel_marine_scale_controller import VERSION, LUA_SCRIPT_PATH, CONFIG_PATH, LOGO_PATH, LUA_CACHE_PATH
+from marel_marine_scale_controller.lua_deploy import LuaDigestCache
+from marel_marine_scale_controller.marel_controller import CONNECTING, LISTENING, STOPPED, MarelController, Weight
 
 PROGRAM_DIRECTORY = Path(__file__).parent
 
 ABS_LUA_SCRIPT_PATH = str(PROGRAM_DIRECTORY.joinpath(LUA_SCRIPT_PATH))
 ABS_CONFIG_PATH = str(PROGRAM_DIRECTORY.joinpath(CONFIG_PATH))
 ABS_LOGO_PATH = str(PROGRAM_DIRECTORY.joinpath(LOGO_PATH))
+ABS_LUA_CACHE_PATH = str(PROGRAM_DIRECTORY.joinpath(LUA_CACHE_PATH))
 
 COLOR_LIGHT_RED = '#E2C8C8'
 COLOR_LIGHT_GREEN = '#AAC893'
@@ -54,11 +76,38 @@ COLOR_ROSE = "#F7B7C2"
 COLOR_GREY = '#C0C0C0'
 COLOR_BLUE_GREY = '#AAC8C1'
 
+EVENT_POLL_INTERVAL = 50
+
+WEIGHT_DECIMALS = {'kg': 4, 'lb': 4, 'oz': 3, 'g': 1}
+LED_COLORS = {STOPPED: 'red', CONNECTING: 'yellow', LISTENING: 'green'}
+NO_WEIGHT = "-  "
+
+
+def format_weight(weight: Optional[Weight], units: str) -> str:
+    """Return the text displayed for `weight` converted to `units`."""
+    if weight is None:
+        return NO_WEIGHT
+    if units not in WEIGHT_DECIMALS:
+        raise ValueError('Invalid weight units.')
+    return f"{weight.get_weight(units):.0{WEIGHT_DECIMALS[units]}f} {units} "
+
 
 class GUI:
     """
     Gui Application for the MarelController.
 
+    Attributes
+    ----------
+    events :
+        Thread-safe queue of `(kind, value)` events put by the controller callbacks:
+        ('weight', Weight) and ('status', status), and by the commands: ('done', (Future, on_done)).
+    status :
+        Latest controller status received (STOPPED, CONNECTING or LISTENING).
+    weight :
+        Latest Weight received.
+    executor :
+        Single worker executor running the controller commands in order. See `self.submit`.
+
     Examples
     --------
     >>>  gui = GUI()
@@ -70,14 +119,21 @@ class GUI:
             host: str = None,
             lua_script_path=ABS_LUA_SCRIPT_PATH,
             config_path=ABS_CONFIG_PATH,
-            logo_path=ABS_LOGO_PATH
+            logo_path=ABS_LOGO_PATH,
+            lua_cache_path=ABS_LUA_CACHE_PATH
     ):
         self.lua_script_path = lua_script_path
         self.config_path = config_path
         self.logo_path = logo_path
+        self.lua_cache = LuaDigestCache(lua_cache_path)
 
         self.controller: MarelController = None
-        self.start_listening_thread: threading.Thread = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='gui-command')
+
+        self.events: queue.SimpleQueue = queue.SimpleQueue()
+        self.status = STOPPED
+        self.weight: Weight = None
+        self._displayed = {}  # Latest value applied to each widget.
 
         if host:
             self.host = host
@@ -186,43 +242,44 @@ class GUI:
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
         self.refresh_window()
+        self.root.after(EVENT_POLL_INTERVAL, self.poll_events)
 
     def run(self):
         """Start (run) the App"""
         self.root.mainloop()
 
+    def submit(self, command: Callable, *args, on_done: Callable[[Future], None] = None, **kwargs) -> Future:
+        """Run `command(*args, **kwargs)` from `self.executor`.
+
+        Once the command is done, `on_done(future)` is called from the Tk thread (see `self.poll_events`).
+        Exceptions of the command are logged.
+        """
+        future = self.executor.submit(command, *args, **kwargs)
+        future.add_done_callback(lambda done: self.events.put(('done', (done, on_done))))
+        return future
+
     def start_listening(self):
         """Wrapper function for the MarelController start_listening methods."""
-        self.start_button.config(state='disable')
         self.host = self.host_entry.get()
         self.save_config()
 
         if not self.controller:
-            self.controller = MarelController(self.host)
-            if self.controller.auto_enter is True:
-                self.auto_enter_button.config(relief='sunken')
-
+            self.set_controller(MarelController(self.host))
         else:
             self.controller.host = self.host
-
-        # A thread is use here to prevent the GUI from freezing.
-        self.start_listening_thread = threading.Thread(target=self.controller.start_listening, daemon=True)
-        self.start_listening_thread.start()
+        self.set_status(CONNECTING)
+        self.submit(self.controller.start_listening)
 
     def stop_listening(self):
         """Wrapper function for the MarelController stop_listening methods."""
-        self.stop_button.config(state='disable')
+        self._display('stop_button', 'disable', lambda state: self.stop_button.config(state=state))
         if self.controller:
-            self.controller.stop_listening()
-
-        while self.controller.is_listening or self.controller.client.is_connecting:  # -------------------maybe not needed
-            time.sleep(.1)
+            self.submit(self.controller.stop_listening)
 
     def set_units(self, unit):
         """Wrapper function for the MarelController set_units methods."""
         if self.controller:
-            self.controller.set_units(unit)
-            time.sleep(.1)
+            self.submit(self.controller.set_units, unit, on_done=lambda _: self.refresh_weight())
 
     def auto_enter(self):
         """Change the value of the MarelController auto_enter attribute."""
@@ -235,90 +292,117 @@ class GUI:
                 self.auto_enter_button.config(relief='sunken', text='ON')
 
     def update_lua_app(self):
-        """Call `self.run_update_lua` from another thread."""
-        # A thread is use here because the MarelController doesn't use one.
-        threading.Thread(target=self.run_update_lua, daemon=True).start()
+        """Wrapper function for the MarelController update_lua_app methods.
 
-    def run_update_lua(self):
-        """Wrapper function for the MarelController update_lua_app methods."""
+        The update is run by `self.executor`, `self.lua_updated` displays the result.
+        """
+        if not self.controller:
+            self.set_controller(MarelController(self.host_entry.get()))
         self.update_lua_button.config(state='disable')
         self.update_status.set(f"updating")
 
-        if not self.controller:
-            host = self.host_entry.get()
-            self.controller = MarelController(host)
+        self.controller.lua_cache = self.lua_cache
+        self.submit(self.controller.update_lua_code, self.lua_script_path, skip_if_current=True,
+                    on_done=self.lua_updated)
 
-        flag = self.controller.update_lua_code(self.lua_script_path)
+    def lua_updated(self, future: Future):
+        """Display the result of the Lua update `future`."""
+        self.update_lua_button.config(state='normal')
+        if future.cancelled() or future.exception() is not None:
+            self.update_status.set(f"Failed")
+            return
 
-        match flag:
+        match future.result():
             case -1:
                 self.update_status.set(f"N/A")
             case 1:
                 self.update_status.set(f"Up-to-date")
             case 0:
                 self.update_status.set(f"Failed")
-            case _:
+            case flag:
                 raise ValueError(f'Gui.update_lua_methode got a value of {flag}')
 
-        self.update_lua_button.config(state='normal')
+    def set_controller(self, controller: MarelController):
+        """Use `controller` and subscribe to its weights and status changes."""
+        self.controller = controller
+        controller.weight_callbacks.append(lambda _, weight: self.events.put(('weight', weight)))
+        controller.state_callbacks.append(lambda _, status: self.events.put(('status', status)))
+        if controller.auto_enter is True:
+            self.auto_enter_button.config(relief='sunken')
+        self.refresh_window()
+
+    def set_status(self, status: str):
+        """Set `self.status` and refresh the widgets. (Called from the Tk thread only.)"""
+        self.status = status
+        if status != LISTENING:
+            self.weight = None
+        self.refresh_window()
+
+    def poll_events(self):
+        """Drain `self.events` and refresh the widgets if any event was received.
+
+        Only the latest weight and status are kept, thus a burst of events refreshes the widgets once.
+        Reschedules itself every `EVENT_POLL_INTERVAL` ms.
+        """
+        changed = False
+        while True:
+            try:
+                kind, value = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'weight':
+                self.weight = value
+            elif kind == 'status':
+                self.status = value
+                if value != LISTENING:
+                    self.weight = None
+            elif kind == 'done':
+                self.command_done(*value)
+            changed = True
+
+        if changed:
+            self.refresh_window()
+        self.root.after(EVENT_POLL_INTERVAL, self.poll_events)
+
+    def command_done(self, future: Future, on_done: Callable[[Future], None] = None):
+        """Log the exception of a command (if any) and call `on_done(future)`."""
+        if not future.cancelled() and future.exception() is not None:
+            logging.error(f'GUI command failed: {future.exception()}')
+        if on_done is not None:
+            on_done(future)
+
+    def _display(self, key: str, value, apply: Callable):
+        """Call `apply(value)` unless `value` is already displayed by the widget `key`."""
+        if self._displayed.get(key, ...) != value:
+            self._displayed[key] = value
+            apply(value)
 
     def refresh_led(self):
-        if self.controller:
-            if self.controller.client.is_connecting:
-                self.led_canvas.itemconfig(self.led, fill="yellow")
-            elif self.controller.is_listening and self.controller.client.is_connected:
-                self.led_canvas.itemconfig(self.led, fill="green")
-            else:
-                self.led_canvas.itemconfig(self.led, fill="red")
-        else:
-            self.led_canvas.itemconfig(self.led, fill="red")
+        self._display('led', LED_COLORS[self.status], lambda color: self.led_canvas.itemconfig(self.led, fill=color))
 
     def refresh_buttons(self):
-        if self.controller and (self.controller.client.is_connecting or self.controller.is_listening):
-            self.host_entry.config(state='disable')
-            self.start_button.config(state='disable')
-            self.stop_button.config(state='normal')
-        else:
-            self.host_entry.config(state='normal')
-            self.start_button.config(state='normal')
-            self.stop_button.config(state='disable')
+        running = self.status != STOPPED
+        self._display('host_entry', 'disable' if running else 'normal', lambda state: self.host_entry.config(state=state))
+        self._display('start_button', 'disable' if running else 'normal', lambda state: self.start_button.config(state=state))
+        self._display('stop_button', 'normal' if running else 'disable', lambda state: self.stop_button.config(state=state))
+
+        controls = 'normal' if self.controller else 'disable'
+        self._display('units', controls, lambda state: self.units.config(state=state))
+        self._display('auto_enter', controls, lambda state: self.auto_enter_button.config(state=state))
 
     def refresh_weight(self):
-        if self.controller:
-            self.units.config(state='normal')
-            self.auto_enter_button.config(state='normal')
-            if self.controller.client.is_connecting:
-                self.weight_value.set("-  ")
-
-            elif self.controller.is_listening and self.controller.client.is_connected:
-                if (weight := self.controller.get_weight(self.controller.units)) is not None:
-                    if self.controller.units == 'kg':
-                        self.weight_value.set(f"{weight:.04f} {self.controller.units} ")
-                    elif self.controller.units == 'lb':
-                        self.weight_value.set(f"{weight:.04f} {self.controller.units} ")
-                    elif self.controller.units == 'oz':
-                        self.weight_value.set(f"{weight:.03f} {self.controller.units} ")
-                    elif self.controller.units == 'g':
-                        self.weight_value.set(f"{weight:.01f} {self.controller.units} ")
-                    else:
-                        raise ValueError('Invalid weight units.')
-                else:
-                    self.weight_value.set("-  ")
-            else:
-                self.weight_value.set("-  ")
-        else:
-            self.weight_value.set("-  ")
-            self.units.config(state='disable')
-            self.auto_enter_button.config(state='disable')
+        units = self.controller.units if self.controller else None
+        weight = self.weight if self.status == LISTENING else None
+        self._display('weight', format_weight(weight, units), self.weight_value.set)
 
     def refresh_window(self):
+        """Refresh the widgets whose state changed."""
         self.refresh_buttons()
         self.refresh_weight()
         self.refresh_led()
 
-        self.root.after(100, self.refresh_window)
-
     def on_close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
         if self.controller is not None:
             self.controller.stop_listening()
         self.root.destroy()
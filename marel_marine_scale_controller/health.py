@@ -0,0 +1,99 @@
+"""
+This module contains the LinkHealth class used by the MarelController to track the liveness of the scale link.
+
+The Lua App sends keep alive messages (`%#`) while idle and weight messages while weighing: every
+message received is a sign of life. Keep alive messages are counted as heartbeats.
+
+The link is unhealthy (stale) once nothing was received for `stale_after` seconds. The scale sends
+messages many times per second, thus a silent scale is detected well before the socket timeout
+(`MarelClient.timeout`) closes the connection.
+
+Examples
+--------
+>>> health = LinkHealth(stale_after=1.0)
+>>> health.seen(heartbeat=True)
+>>> health.is_healthy()
+True
+>>> health.snapshot()['interval_mean']
+"""
+import time
+from typing import *
+
+from marel_marine_scale_controller.stability import RunningStats
+
+
+class LinkHealth:
+    """
+    Liveness of the link to a scale, updated with every message received.
+
+    Attributes
+    ----------
+    stale_after :
+        Silence (seconds) after which the link is unhealthy.
+    last_seen :
+        `time.monotonic()` time of the latest message. None if nothing was received.
+    messages :
+        Number of messages received.
+    heartbeats :
+        Number of keep alive messages received.
+    intervals :
+        RunningStats of the intervals (seconds) between consecutive messages.
+        Silences longer than `stale_after` (outages) are excluded.
+    max_interval :
+        Longest interval (seconds) added to `intervals`.
+    outages :
+        Number of silences longer than `stale_after` which ended with a message.
+    """
+    def __init__(self, stale_after: float = 1.0):
+        self.stale_after = stale_after
+        self.last_seen: float = None
+        self.messages = 0
+        self.heartbeats = 0
+        self.intervals = RunningStats()
+        self.max_interval = 0.0
+        self.outages = 0
+
+    def seen(self, timestamp: float = None, heartbeat: bool = False):
+        """Record a message received at `timestamp` (`time.monotonic()`, defaults to now)."""
+        if timestamp is None:
+            timestamp = time.monotonic()
+        if self.last_seen is not None:
+            interval = timestamp - self.last_seen
+            if interval > self.stale_after:
+                self.outages += 1
+            else:
+                self.intervals.add(interval)
+                if interval > self.max_interval:
+                    self.max_interval = interval
+        self.last_seen = timestamp
+        self.messages += 1
+        if heartbeat:
+            self.heartbeats += 1
+
+    def silence(self, now: float = None) -> Optional[float]:
+        """Return the time (seconds) since the latest message. None if nothing was received."""
+        if self.last_seen is None:
+            return None
+        return (time.monotonic() if now is None else now) - self.last_seen
+
+    def is_healthy(self, now: float = None) -> bool:
+        """Return True if a message was received within the last `stale_after` seconds."""
+        silence = self.silence(now)
+        return silence is not None and silence <= self.stale_after
+
+    def reset(self):
+        """Discard every statistic."""
+        self.__init__(stale_after=self.stale_after)
+
+    def snapshot(self, now: float = None) -> dict:
+        """Return the state and statistics of the link as a dictionary."""
+        return {
+            'healthy': self.is_healthy(now),
+            'silence': self.silence(now),
+            'messages': self.messages,
+            'heartbeats': self.heartbeats,
+            'outages': self.outages,
+            'interval_mean': self.intervals.mean if self.intervals.count else None,
+            'interval_std': self.intervals.std if self.intervals.count else None,
+            'interval_max': self.max_interval if self.intervals.count else None,
+        }
@@ -0,0 +1,189 @@
+"""
+This module contains the WeightHistory class: a fixed-capacity ring buffer of weight readings.
+
+Readings are stored in three preallocated `array.array` (no Python object per reading):
+    timestamps: float64 (`time.monotonic()` seconds)
+    values: float64 (value in the units it was received)
+    units: uint8 (units code, see `protocol.UNITS_CODES`)
+
+Memory
+------
+Each reading uses 17 bytes (8 + 8 + 1), allocated once by `WeightHistory(capacity)`.
+At 20 Hz, one hour of data is 72 000 readings, thus:
+    1 hour  -> capacity 72 000    -> 1.22 MB
+    12 hour -> capacity 864 000   -> 14.7 MB
+The memory used never grows past `17 * capacity` bytes, the oldest readings are overwritten.
+
+Examples
+--------
+>>> history = WeightHistory(capacity=72_000)
+>>> history.append(1.234, 'kg')
+>>> history.mean(count=20, units='g')
+"""
+import math
+import threading
+import time
+from array import array
+from itertools import accumulate
+from typing import *
+
+from marel_marine_scale_controller.protocol import UNITS, UNITS_CODES, UNITS_CONVERSION
+
+READING_SIZE = 17  # bytes
+
+
+class WeightHistory:
+    """
+    Fixed-capacity ring buffer of weight readings with O(1) append.
+
+    Queries are made on the `count` most recent readings (all the readings if `count` is None)
+    and return values converted to `units`.
+
+    Attributes
+    ----------
+    capacity :
+        Maximum number of readings stored.
+    timestamps :
+        Ring buffer of the readings timestamps.
+    values :
+        Ring buffer of the readings values.
+    units :
+        Ring buffer of the readings units code.
+    """
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError('capacity must be greater than 0.')
+        self.capacity = capacity
+        self.timestamps = array('d', bytes(8 * capacity))
+        self.values = array('d', bytes(8 * capacity))
+        self.units = array('B', bytes(capacity))
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the ring buffers in bytes."""
+        return READING_SIZE * self.capacity
+
+    def append(self, value: float, units: str, timestamp: float = None):
+        """Add a reading, overwriting the oldest one if the history is full."""
+        if timestamp is None:
+            timestamp = time.monotonic()
+        with self._lock:
+            i = self._next
+            self.timestamps[i] = timestamp
+            self.values[i] = value
+            self.units[i] = UNITS_CODES[units]
+            self._next = (i + 1) % self.capacity
+            if self._count < self.capacity:
+                self._count += 1
+
+    def clear(self):
+        """Discard all the readings."""
+        with self._lock:
+            self._next = 0
+            self._count = 0
+
+    def window(self, count: int = None) -> Tuple[array, array, array]:
+        """Return copies of the `count` most recent (timestamps, values, units codes) in chronological order."""
+        with self._lock:
+            count = self._count if count is None else min(count, self._count)
+            start = self._next - count
+            if start >= 0:
+                return self.timestamps[start:self._next], self.values[start:self._next], self.units[start:self._next]
+            return (
+                self.timestamps[start:] + self.timestamps[:self._next],
+                self.values[start:] + self.values[:self._next],
+                self.units[start:] + self.units[:self._next]
+            )
+
+    def count_since(self, seconds: float, now: float = None) -> int:
+        """Return the number of readings made within the last `seconds`."""
+        if now is None:
+            now = time.monotonic()
+        timestamps = self.window()[0]
+        lo, hi, limit = 0, len(timestamps), now - seconds
+        while lo < hi:  # Bisect, timestamps are increasing.
+            mid = (lo + hi) // 2
+            if timestamps[mid] < limit:
+                lo = mid + 1
+            else:
+                hi = mid
+        return len(timestamps) - lo
+
+    def get_values(self, units: str = 'kg', count: int = None) -> array:
+        """Return the `count` most recent values converted to `units`.
+
+        The conversion ratio of the whole window is applied at once when all the readings
+        have the same units.
+        """
+        _, values, codes = self.window(count)
+        ratios = [UNITS_CONVERSION[u] / UNITS_CONVERSION[units] for u in UNITS]
+        if not codes:
+            return values
+
+        first = codes[0]
+        if codes.count(first) == len(codes):
+            if ratios[first] == 1:
+                return values
+            return array('d', map(ratios[first].__mul__, values))
+        return array('d', map(float.__mul__, values, map(ratios.__getitem__, codes)))
+
+    def mean(self, units: str = 'kg', count: int = None) -> Optional[float]:
+        """Mean of the `count` most recent values."""
+        values = self.get_values(units, count)
+        if not values:
+            return None
+        return math.fsum(values) / len(values)
+
+    def std(self, units: str = 'kg', count: int = None) -> Optional[float]:
+        """Population standard deviation of the `count` most recent values."""
+        values = self.get_values(units, count)
+        if not values:
+            return None
+        mean = math.fsum(values) / len(values)
+        return math.sqrt(math.fsum(map(lambda v: (v - mean) ** 2, values)) / len(values))
+
+    def min(self, units: str = 'kg', count: int = None) -> Optional[float]:
+        """Minimum of the `count` most recent values."""
+        values = self.get_values(units, count)
+        return min(values) if values else None
+
+    def max(self, units: str = 'kg', count: int = None) -> Optional[float]:
+        """Maximum of the `count` most recent values."""
+        values = self.get_values(units, count)
+        return max(values) if values else None
+
+    def rolling_mean(self, window: int, units: str = 'kg', count: int = None) -> array:
+        """Moving average, over `window` readings, of the `count` most recent values.
+
+        Computed from cumulative sums: O(n) regardless of `window`.
+        Returns `len(values) - window + 1` values.
+        """
+        values = self.get_values(units, count)
+        if window > len(values):
+            return array('d')
+        sums = array('d', accumulate(values, initial=0.0))
+        return array('d', ((sums[i + window] - sums[i]) / window for i in range(len(values) - window + 1)))
+
+    def rolling_std(self, window: int, units: str = 'kg', count: int = None) -> array:
+        """Moving population standard deviation, over `window` readings, of the `count` most recent values.
+
+        Computed from cumulative sums of the values and squared values (centered on the first
+        value to limit the loss of precision): O(n) regardless of `window`.
+        """
+        values = self.get_values(units, count)
+        if window > len(values):
+            return array('d')
+        offset = values[0]
+        sums = array('d', accumulate((v - offset for v in values), initial=0.0))
+        squares = array('d', accumulate(((v - offset) ** 2 for v in values), initial=0.0))
+        stds = array('d')
+        for i in range(len(values) - window + 1):
+            mean = (sums[i + window] - sums[i]) / window
+            stds.append(math.sqrt(max((squares[i + window] - squares[i]) / window - mean ** 2, 0.0)))
+        return stds
@@ -0,0 +1,244 @@
+"""
+This module contains the ScaleHub class that is used to drive many Marel Scales from a single thread.
+
+Instead of one `MarelController.listening_thread` per scale, the hub registers the socket of every
+scale in a single `selectors` event loop. The loop only wakes up when a socket is readable (or when
+a reconnection is due, see `MarelClient.backoff`), reads the available bytes with `MarelClient.receive_available` and passes the
+complete messages to `MarelController.process_message`.
+
+Each scale is still represented by a MarelController object which holds the per-scale state
+(weight, units, auto_enter, callbacks, ...). Its `state_callbacks` are notified by the event loop.
+
+Examples
+--------
+>>> hub = ScaleHub()
+>>> hub.add_scale('192.168.0.202', on_print=lambda controller, weight: print(controller.host, weight))
+>>> hub.add_scale('192.168.0.203')
+>>> hub.start()
+"""
+import heapq
+import logging
+import selectors
+import socket
+import threading
+import time
+from typing import *
+
+from marel_marine_scale_controller.marel_controller import COMM_PORT, MarelController, Weight
+
+WeightCallback = Callable[[MarelController, Weight], None]
+
+
+class ScaleHub:
+    """
+    Services the connections of many MarelControllers from one `selectors` based event loop.
+
+    Notes
+    -----
+    The controllers of the hub must not be started with `MarelController.start_listening`.
+
+    Attributes
+    ----------
+    scales :
+        MarelControllers of the hub by name. (Default name: `host:port`)
+    is_running :
+        Is set to True while the event loop is running.
+    thread :
+        Thread used to call `self.run()`.
+    wakeups :
+        Number of time the event loop woke up.
+    frames :
+        Number of messages processed by the hub.
+    """
+    def __init__(self):
+        self.scales: Dict[str, MarelController] = {}
+        self.is_running = False
+        self.thread: threading.Thread = None
+        self.wakeups = 0
+        self.frames = 0
+
+        self._selector = selectors.DefaultSelector()
+        self._lock = threading.Lock()
+        self._pending: List[MarelController] = []
+        self._reconnections: List[Tuple[float, int, MarelController]] = []  # heap of (due time, count, controller)
+        self._reconnection_count = 0
+        self._wake_reader, self._wake_writer = socket.socketpair()
+        self._wake_reader.setblocking(False)
+        self._selector.register(self._wake_reader, selectors.EVENT_READ, None)
+
+    def add_scale(
+            self,
+            host: str,
+            port: int = COMM_PORT,
+            name: str = None,
+            on_weight: WeightCallback = None,
+            on_print: WeightCallback = None,
+            keyboard: bool = False
+    ) -> MarelController:
+        """Add a scale to the hub.
+
+        The scale is connected by the event loop. It can be added before or after `self.start()`.
+
+        Parameters
+        ----------
+        host :
+            IP address of the scale.
+        port :
+            Communication port of the scale.
+        name :
+            Name of the scale in `self.scales`. Defaults to `host:port`.
+        on_weight :
+            Function added to the controller `weight_callbacks`.
+        on_print :
+            Function added to the controller `print_callbacks`.
+        keyboard :
+            If False (default), the controller is muted (no keyboard emulation on print messages).
+
+        Returns
+        -------
+        The MarelController of the scale.
+        """
+        name = name or f'{host}:{port}'
+        if name in self.scales:
+            raise ValueError(f'A scale named {name} is already in the hub.')
+
+        controller = MarelController(host, port=port)
+        if on_weight is not None:
+            controller.weight_callbacks.append(on_weight)
+        if on_print is not None:
+            controller.print_callbacks.append(on_print)
+        if keyboard is False:
+            controller.mute()
+
+        self.scales[name] = controller
+        with self._lock:
+            self._pending.append(controller)
+        self._wake()
+        return controller
+
+    def start(self):
+        """Start the event loop from another thread."""
+        self.is_running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the event loop and disconnect every scale.
+
+        The selector and the wake-up sockets are closed when the event loop ends: a hub cannot be restarted.
+        """
+        logging.info('ScaleHub Stopped')
+        self.is_running = False
+        self._wake()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+
+    def run(self):
+        """Run the event loop while `self.is_running` is True, thus it should be called from another thread."""
+        logging.info('Start ScaleHub')
+        self.is_running = True
+        while self.is_running:
+            self._connect_pending()
+            events = self._selector.select(self._select_timeout())
+            self.wakeups += 1
+
+            for key, mask in events:
+                controller = key.data
+                if controller is None:
+                    self._drain_wake()
+                elif controller.client.is_connecting:
+                    self._finish_connect(controller)
+                else:
+                    self._receive(controller)
+
+        for controller in self.scales.values():
+            self._unregister(controller)
+            controller.is_listening = False
+            controller.client.disconnect()
+            controller.notify_state()
+        self._selector.close()
+        self._wake_reader.close()
+        self._wake_writer.close()
+
+    def _receive(self, controller: MarelController):
+        try:
+            messages = controller.client.receive_available()
+        except Exception as err:  # One scale must not stop the event loop of the others.
+            logging.error(f'Error receiving from {controller.host}: {err}')
+            self._unregister(controller)  # Closes the client: reconnected below.
+            messages = []
+
+        for message in messages:
+            logging.debug('Received Messages: %s', message)
+            try:
+                controller.process_message(message)
+            except Exception as err:  # One scale must not stop the event loop of the others.
+                logging.error(f'Error processing message from {controller.host}: {err}')
+            self.frames += 1
+
+        if not controller.client.is_connected:
+            self._unregister(controller)
+            controller.is_listening = False
+            controller.notify_state()
+            self._schedule_reconnection(controller)
+
+    def _connect_pending(self):
+        now = time.monotonic()
+        with self._lock:
+            pending, self._pending = self._pending, []
+        while self._reconnections and self._reconnections[0][0] <= now:
+            pending.append(heapq.heappop(self._reconnections)[2])
+
+        for controller in pending:
+            try:
+                sock = controller.client.connect_nowait(controller.host, controller.comm_port)
+            except OSError as err:  # e.g. `socket.gaierror`: host name not resolved.
+                logging.error(f'ScaleHub cannot connect to {controller.host}:{controller.comm_port}: {err}')
+                controller.client.is_connecting = False
+                controller.client.close()
+                self._schedule_reconnection(controller)
+                continue
+            self._selector.register(sock, selectors.EVENT_WRITE, controller)
+            controller.notify_state()
+
+    def _finish_connect(self, controller: MarelController):
+        if controller.client.finish_connect():
+            self._selector.modify(controller.client.socket, selectors.EVENT_READ, controller)
+            controller.is_listening = True
+            controller.client.backoff.reset()
+            controller.notify_state()
+            logging.info(f'ScaleHub connected to {controller.host}:{controller.comm_port}')
+        else:
+            self._unregister(controller)
+            controller.notify_state()
+            self._schedule_reconnection(controller)
+
+    def _schedule_reconnection(self, controller: MarelController):
+        self._reconnection_count += 1
+        due = time.monotonic() + controller.client.backoff.next_delay()
+        heapq.heappush(self._reconnections, (due, self._reconnection_count, controller))
+
+    def _select_timeout(self) -> Optional[float]:
+        if self._reconnections:
+            return max(self._reconnections[0][0] - time.monotonic(), 0)
+        return None
+
+    def _unregister(self, controller: MarelController):
+        try:
+            self._selector.unregister(controller.client.socket)
+        except (KeyError, ValueError):
+            pass
+        controller.client.close()
+
+    def _wake(self):
+        try:
+            self._wake_writer.send(b'\0')
+        except OSError:
+            pass
+
+    def _drain_wake(self):
+        try:
+            while self._wake_reader.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
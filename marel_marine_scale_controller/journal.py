@@ -0,0 +1,231 @@
+"""
+This module contains the PrintJournal: an append-only journal of the print events.
+
+Each print event is journaled with a sequence number before it is sent to the output. Once
+emitted, the event is acknowledged. After a crash, `PrintJournal.recover` lists the events which
+were journaled but never acknowledged.
+
+When a journal is opened, it is compacted: the acknowledged events and a partially written last
+line are removed (the file is rewritten atomically). The latest event is kept, thus the sequence
+numbers continue.
+
+Journal lines:
+    `E <seq> <time> <units> <text>`: print event (time: `time.time()`, text: keyboard entry).
+    `A <seq>`: acknowledgement (the event was emitted).
+
+Sync policies:
+    'group' (default): a committer thread writes and fsyncs the pending lines as soon as it is
+        idle. Lines added during an fsync are committed together by the next one (group commit).
+        `wait(seq)` returns once the event is durable.
+    'always': each line is written and fsynced by `append` / `acknowledge`.
+    'none': lines are written (OS buffered) by `append` / `acknowledge`, never fsynced.
+
+Examples
+--------
+>>> journal = PrintJournal('prints.journal')
+>>> seq = journal.append('1.234', 'kg')
+>>> journal.wait(seq)
+>>> journal.acknowledge(seq)
+>>> PrintJournal.recover('prints.journal')
+[]
+"""
+import logging
+import os
+import threading
+import time
+from typing import *
+
+SYNC_POLICIES = ('group', 'always', 'none')
+
+
+class JournalEntry(NamedTuple):
+    """Print event of the journal."""
+    seq: int
+    time: float
+    units: str
+    text: str
+
+
+def read_journal(path: str) -> Tuple[Dict[int, JournalEntry], Set[int]]:
+    """Return the entries by sequence number and the acknowledged sequence numbers of a journal.
+
+    A partially written last line is ignored.
+    """
+    entries, acknowledged = {}, set()
+    if not os.path.exists(path):
+        return entries, acknowledged
+
+    with open(path, 'r') as f:
+        for line in f:
+            if not line.endswith('\n'):
+                break
+            fields = line[:-1].split(' ', 4)
+            try:
+                if fields[0] == 'E':
+                    entries[int(fields[1])] = JournalEntry(int(fields[1]), float(fields[2]), fields[3], fields[4])
+                elif fields[0] == 'A':
+                    acknowledged.add(int(fields[1]))
+            except (IndexError, ValueError):
+                logging.warning(f'Invalid journal line: {line!r}')
+    return entries, acknowledged
+
+
+def entry_line(entry: JournalEntry) -> str:
+    """Return the journal line of an entry."""
+    return f'E {entry.seq} {entry.time:.6f} {entry.units} {entry.text}\n'
+
+
+def compact_journal(path: str):
+    """Rewrite the journal with its unacknowledged entries only (or its latest entry, acknowledged)."""
+    if not os.path.exists(path):
+        return
+    entries, acknowledged = read_journal(path)
+    lines = [entry_line(entries[seq]) for seq in sorted(entries) if seq not in acknowledged]
+    if not lines and entries:  # The latest entry is kept for the sequence numbers to continue.
+        last = max(entries)
+        lines = [entry_line(entries[last]), f'A {last}\n']
+    with open(path + '.tmp', 'w') as f:
+        f.write(''.join(lines))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+
+
+class PrintJournal:
+    """
+    Append-only journal of the print events with group commit.
+
+    Attributes
+    ----------
+    path :
+        Path of the journal. It is compacted when opened and the sequence numbers continue.
+    sync :
+        Sync policy. One of `SYNC_POLICIES`.
+    commit_interval :
+        Additional time (seconds) the committer waits for more lines before a group commit.
+        Default: 0, the group is the lines added during the previous fsync.
+    last_seq :
+        Sequence number of the latest event.
+    durable_seq :
+        Latest sequence number written (and fsynced unless `sync` is 'none').
+    commits :
+        Number of writes (group commits) to the file.
+    """
+    def __init__(self, path: str, sync: str = 'group', commit_interval: float = 0.0):
+        if sync not in SYNC_POLICIES:
+            raise ValueError(f'Invalid sync policy. Available policies: {SYNC_POLICIES}.')
+        self.path = path
+        self.sync = sync
+        self.commit_interval = commit_interval
+
+        compact_journal(path)
+        entries, _ = read_journal(path)
+        self.last_seq = max(entries, default=0)
+        self.durable_seq = self.last_seq
+        self.commits = 0
+
+        self._file = open(path, 'a')
+        self._pending: List[str] = []
+        self._pending_seq = self.last_seq
+        self._condition = threading.Condition()
+        self._running = True
+        self._thread: threading.Thread = None
+        if sync == 'group':
+            self._thread = threading.Thread(target=self._commit_loop, daemon=True)
+            self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @staticmethod
+    def recover(path: str) -> List[JournalEntry]:
+        """Return the events journaled but never acknowledged, in sequence order."""
+        entries, acknowledged = read_journal(path)
+        return [entries[seq] for seq in sorted(entries) if seq not in acknowledged]
+
+    def append(self, text: str, units: str, timestamp: float = None) -> int:
+        """Journal a print event. `text` is the keyboard entry (single line).
+
+        Returns
+        -------
+        The sequence number of the event. See `self.wait`.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        with self._condition:
+            self.last_seq += 1
+            seq = self.last_seq
+            self._add(entry_line(JournalEntry(seq, timestamp, units, text)), seq)
+        return seq
+
+    def acknowledge(self, seq: int):
+        """Mark the event `seq` as emitted. Acknowledgements are not waited for."""
+        with self._condition:
+            self._add(f'A {seq}\n', None)
+
+    def wait(self, seq: int, timeout: float = None) -> bool:
+        """Wait until the event `seq` is durable.
+
+        Returns
+        -------
+        False on timeout.
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self.durable_seq >= seq, timeout)
+
+    def close(self):
+        """Commit the pending lines and close the journal."""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        with self._condition:
+            if not self._file.closed:
+                self._commit()
+                self._file.close()
+
+    def _add(self, line: str, seq: Optional[int]):
+        """Add a line. Must be called with `self._condition` acquired."""
+        self._pending.append(line)
+        if seq is not None:
+            self._pending_seq = seq
+        if self.sync == 'group':
+            self._condition.notify_all()
+        else:
+            self._commit()
+
+    def _commit(self):
+        """Write (and fsync) the pending lines. Must be called with `self._condition` acquired."""
+        if self._pending:
+            self._file.write(''.join(self._pending))
+            self._file.flush()
+            if self.sync != 'none':
+                os.fsync(self._file.fileno())
+            self._pending.clear()
+            self.commits += 1
+        self.durable_seq = self._pending_seq
+        self._condition.notify_all()
+
+    def _commit_loop(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or not self._running)
+                if not self._running:
+                    return
+            if self.commit_interval:
+                time.sleep(self.commit_interval)
+            with self._condition:
+                lines, self._pending = self._pending, []
+                seq = self._pending_seq
+            # The lock is not held while writing: lines appended during the fsync form the next group.
+            self._file.write(''.join(lines))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            with self._condition:
+                self.durable_seq = max(self.durable_seq, seq)
+                self.commits += 1
+                self._condition.notify_all()
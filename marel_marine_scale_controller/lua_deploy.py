@@ -0,0 +1,204 @@
+"""
+This module contains the helpers used to verify the Lua App deployments and to skip redundant ones.
+
+`verify_lua_script` streams the script sent by the scale on its upload port and compares it to the
+expected script while receiving: it stops as soon as the expected bytes are received, the scale
+closes the connection or a byte differs.
+
+The scale sends its current Lua script when a client connects to its upload port (then closes the
+connection). If `verify_lua_script` matches before a download (to the scale), the download can be
+skipped. `fetch_lua_script` reads the whole script (e.g. to save it) and `script_digest` hashes
+scripts (sha256) for the cache.
+
+The `LuaDigestCache` keeps, per host, the digest of the script last verified on the scale and the
+duration of the last full update (used to report the time saved by a skip). It is stored as JSON.
+A cached digest which differs from the local script means the scale must be updated: the check
+can be skipped. A matching one is only a hint, the scale may have been updated by another device.
+
+Examples
+--------
+>>> verify_lua_script('192.168.0.202', 52203, local_script)
+VerificationResult(matched=True, bytes_transferred=4242, duration=0.01, mismatch_offset=None)
+>>> cache = LuaDigestCache('config/lua_cache.json')
+>>> current = fetch_lua_script('192.168.0.202', 52203)
+>>> current is not None and script_digest(current) == script_digest(local_script)
+"""
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from typing import *
+
+from marel_marine_scale_controller.client import MAREL_MSG_ENCODING
+
+DEFAULT_UPDATE_DURATION = 2.0  # Seconds. Used to estimate the time saved before any full update is measured.
+
+
+def script_digest(script: str) -> str:
+    """Return the sha256 (hex) digest of a Lua script."""
+    return hashlib.sha256(script.encode()).hexdigest()
+
+
+def fetch_lua_script(host: str, port: int, timeout: float = 2.0, encoding: str = MAREL_MSG_ENCODING) -> Optional[str]:
+    """Return the Lua script sent by the scale on its upload `port`.
+
+    Reads until the scale closes the connection. If the scale stays silent for `timeout` seconds,
+    the script received so far is returned.
+
+    Returns
+    -------
+    None if the scale cannot be reached or nothing was received.
+    """
+    try:
+        sock = socket.create_connection((host, port), timeout=timeout)
+    except OSError as err:
+        logging.debug(f'Lua fetch: {host}:{port} unreachable: {err}')
+        return None
+
+    chunks = []
+    with sock:
+        try:
+            while chunk := sock.recv(65536):
+                chunks.append(chunk)
+        except socket.timeout:
+            logging.debug(f'Lua fetch: timeout after {sum(map(len, chunks))} bytes.')
+        except OSError as err:
+            logging.debug(f'Lua fetch: {err}')
+            return None
+    return b''.join(chunks).decode(encoding, errors='replace') if chunks else None
+
+
+@dataclass
+class VerificationResult:
+    """Outcome of `verify_lua_script`.
+
+    bytes_transferred: bytes received. duration: seconds. mismatch_offset: offset of the first
+    differing byte (or of the end of the shorter script), None if matched.
+    """
+    matched: bool
+    bytes_transferred: int
+    duration: float
+    mismatch_offset: Optional[int] = None
+
+
+def verify_lua_script(host: str, port: int, expected: Union[str, bytes], timeout: float = 2.0,
+                      encoding: str = MAREL_MSG_ENCODING) -> VerificationResult:
+    """Compare the Lua script sent by the scale on its upload `port` to `expected` while streaming.
+
+    Stops once `len(expected)` bytes are received, on connection close, on the first differing
+    byte (early abort) or after `timeout` seconds of silence. Connection failures are a mismatch at offset 0.
+    Bytes already received after the expected script are a mismatch (they are not waited for).
+    """
+    if isinstance(expected, str):
+        expected = expected.encode(encoding)
+    expected = memoryview(expected)
+    size = len(expected)
+    start = time.monotonic()
+
+    def result(offset):
+        return VerificationResult(offset is None, received, time.monotonic() - start, offset)
+
+    received = 0
+    try:
+        sock = socket.create_connection((host, port), timeout=timeout)
+    except OSError as err:
+        logging.debug(f'Lua verification: {host}:{port} unreachable: {err}')
+        return result(0)
+
+    buffer = bytearray(65536)
+    view = memoryview(buffer)
+    with sock:
+        while received < size:
+            try:
+                n = sock.recv_into(view, min(len(buffer), size - received))
+            except OSError as err:  # Including timeout.
+                logging.debug(f'Lua verification: {err} after {received} bytes.')
+                return result(received)
+            if n == 0:  # Connection closed by the scale before the end of the expected script.
+                return result(received)
+            if view[:n] != expected[received:received + n]:
+                offset = next(i for i in range(n) if buffer[i] != expected[received + i])
+                received += n
+                return result(received - n + offset)
+            received += n
+
+        sock.setblocking(False)
+        try:
+            if sock.recv(1):  # Data after the expected script (no wait: only what already arrived).
+                return result(size)
+        except (BlockingIOError, OSError):
+            pass
+    return result(None)
+
+
+@dataclass
+class LuaUpdateReport:
+    """Outcome of a `MarelController.update_lua_code` call.
+
+    result: -1, 0 or 1 (see `update_lua_code`). skipped: True if the download was skipped (already
+    deployed). duration: seconds. time_saved: estimated seconds saved by the skip. verification: result
+    of the check after the download.
+    """
+    result: int
+    skipped: bool
+    duration: float
+    time_saved: float = 0.0
+    verification: VerificationResult = None
+
+
+class LuaDigestCache:
+    """
+    Per host digest of the Lua script verified on the scale.
+
+    Attributes
+    ----------
+    path :
+        JSON file of the cache. If None, the cache is kept in memory.
+    entries :
+        {host: {'digest': str, 'verified': time.time(), 'update_duration': float}}
+    """
+    def __init__(self, path: str = None):
+        self.path = path
+        self.entries: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as err:
+                logging.warning(f'Invalid Lua cache {path}: {err}')
+
+    def digest(self, host: str) -> Optional[str]:
+        """Return the digest of the script last verified on `host`."""
+        entry = self.entries.get(host)
+        return entry['digest'] if entry else None
+
+    def update_duration(self, host: str) -> float:
+        """Return the duration (seconds) of the last full update of `host` (or an estimate)."""
+        entry = self.entries.get(host)
+        return entry.get('update_duration', DEFAULT_UPDATE_DURATION) if entry else DEFAULT_UPDATE_DURATION
+
+    def set(self, host: str, digest: str, update_duration: float = None):
+        """Store the `digest` verified on `host` (and the duration of the update, if it was made)."""
+        with self._lock:
+            entry = self.entries.setdefault(host, {})
+            entry['digest'] = digest
+            entry['verified'] = time.time()
+            if update_duration is not None:
+                entry['update_duration'] = update_duration
+            self.save()
+
+    def save(self):
+        """Write the cache to `self.path`. Errors are logged: the cache is only an optimization."""
+        if self.path is None:
+            return
+        try:
+            with open(self.path + '.tmp', 'w') as f:
+                json.dump(self.entries, f, indent=1)
+            os.replace(self.path + '.tmp', self.path)
+        except OSError as err:
+            logging.warning(f'Lua cache not saved to {self.path}: {err}')
@@ -34,9 +34,12 @@ DOWNLOAD_PORT :
 UPLOAD_PORT :
     Default Port to receive Lua code from the scale.
 RECEIVE_SLEEP :
-    Delay in seconds between message reception.
+    Delay in seconds between message reception. (Not used when the controller is `event_driven`.)
 UNITS_CONVERSION :
     Dictionnary containing the ratio between 1 kg different units of weight (g, lb, oz). Use to convert units.
+    (Defined in the `protocol` module.)
+STOPPED, CONNECTING, LISTENING :
+    Values of `MarelController.status`.
 
 
 Examples
@@ -47,15 +50,22 @@ Examples
 
 
 import logging
-import re
 import threading
 import time
 from dataclasses import dataclass
 from typing import *
 
-import pyautogui as pag
-
 from marel_marine_scale_controller.client import MarelClient
+from marel_marine_scale_controller.health import LinkHealth
+from marel_marine_scale_controller.history import WeightHistory
+from marel_marine_scale_controller.journal import JournalEntry, PrintJournal
+from marel_marine_scale_controller.lua_deploy import (
+    LuaDigestCache, LuaUpdateReport, VerificationResult, script_digest, verify_lua_script
+)
+from marel_marine_scale_controller.output import OutputBackend, OutputWorker, PyAutoGuiBackend
+from marel_marine_scale_controller.protocol import UNITS_CONVERSION, ProtocolError, parse_message
+from marel_marine_scale_controller.recorder import INVALID_PREFIX, KEEPALIVE_PREFIX, SessionRecorder
+from marel_marine_scale_controller.stability import StabilityDetector
 
 COMM_PORT = 52212
 DOWNLOAD_PORT = 52202
@@ -64,15 +74,12 @@ UPLOAD_PORT = 52203
 
 RECEIVE_SLEEP = 0.05
 
-UNITS_CONVERSION = {
-    'kg': 1,
-    'g': 1e-3,
-    'lb': 0.453592,
-    'oz': 0.0283495
-}
+STOPPED = 'stopped'
+CONNECTING = 'connecting'
+LISTENING = 'listening'
 
 
-@dataclass
+@dataclass(slots=True)
 class Weight:
     """Store weight value and units."""
     value: float
@@ -99,6 +106,11 @@ class MarelController:
         Desired units for weight.
     weight :
         Latest weight stored in a Weight(value, units) dataclass.
+    protocol_errors :
+        Number of invalid messages received. (They do not change `self.weight`.)
+    link :
+        LinkHealth updated by every message received: keep alive messages are heartbeats.
+        `self.link.is_healthy()` is False once the scale is silent for `self.link.stale_after` seconds.
     is_listening :
         Is set to True when the CONTROLLER is listening for messages from the Scale.
     listening_thread :
@@ -107,17 +119,71 @@ class MarelController:
         When `True`, the `enter` is pressed after printing the weight value.
     is_muted :
         When True, the keyboard emulation is disabled.
+    event_driven :
+        When True, messages are processed as soon as they are received instead of sleeping
+        `RECEIVE_SLEEP` between each reception. The listening thread is blocked in `socket.recv`
+        until bytes arrive, thus it does not busy-loop.
+    output_backend :
+        OutputBackend used to emit the keyboard entries. Default: PyAutoGuiBackend() (pyautogui default pauses).
+    output_worker :
+        OutputWorker emitting the keyboard entries from its own thread (see `self.to_keyboard`).
+        Its `maxsize` and `overflow` policy can be tuned.
+    auto_capture :
+        When True, a print is emitted (as for `p` messages) once the `w` readings are stable.
+        See `self.stability`.
+    stability :
+        StabilityDetector used by the auto-capture mode. Its `tolerance`, `hold_time` and
+        `min_weight` (kg) can be tuned.
+    recorder :
+        Optional SessionRecorder keeping every received message. See `self.start_recording`.
+    history :
+        Optional WeightHistory of the `w` readings. See `self.enable_history`.
+    journal :
+        Optional PrintJournal of the keyboard entries. See `self.enable_journal`.
+    lua_cache :
+        LuaDigestCache of the Lua script verified on the scale (in memory by default). See `self.update_lua_code`.
+    last_lua_update :
+        LuaUpdateReport of the last `self.update_lua_code` call.
+    stats :
+        Metrics shared with `self.client` (recv, decode, parse and keyboard stages, counters).
+        Disabled by default, set `self.stats.enabled` to True to collect the metrics. See `self.metrics`.
+    weight_callbacks :
+        Functions called as `callback(controller, weight)` for every weight received.
+    print_callbacks :
+        Functions called as `callback(controller, weight)` for every print (`p`) message received.
+        Print callbacks are called even if the controller is muted.
+    state_callbacks :
+        Functions called as `callback(controller, status)` when `self.status` changes. See `self.notify_state`.
+        They are called from the thread which noticed the change (e.g. the listening thread).
     """
     def __init__(self, host, port=COMM_PORT):
         self.host = host
         self.comm_port = port
         self.client = MarelClient()
+        self.stats = self.client.stats
         self.units = "kg"
         self.weight: Weight = None
+        self.protocol_errors = 0
+        self.link = LinkHealth()
         self.is_listening = False
         self.auto_enter = True
         self.listening_thread = None
         self.is_muted = False
+        self.event_driven = False
+        self.output_backend: OutputBackend = PyAutoGuiBackend()
+        self.output_worker = OutputWorker(self.write_keyboard)
+        self.auto_capture = False
+        self.stability = StabilityDetector()
+        self.recorder: SessionRecorder = None
+        self.history: WeightHistory = None
+        self.journal: PrintJournal = None
+        self.lua_cache = LuaDigestCache()
+        self.last_lua_update: LuaUpdateReport = None
+        self.weight_callbacks: List[Callable[['MarelController', Weight], None]] = []
+        self.print_callbacks: List[Callable[['MarelController', Weight], None]] = []
+        self.state_callbacks: List[Callable[['MarelController', str], None]] = []
+        self._notified_status = STOPPED
+        self._state_lock = threading.Lock()
 
     def start_listening(self):
         """Connect client to the Scale and start listening.
@@ -126,7 +192,9 @@ class MarelController:
 
         Disconnect the client (and close the client socket) on any exception.
 
+        `self.state_callbacks` are notified when connecting and once connected (or not).
         """
+        self.notify_state(CONNECTING)
         self.client.connect(self.host, self.comm_port, timeout=1, single_try=True,  test_connection=True)
 
         if self.client.is_connected:
@@ -137,15 +205,48 @@ class MarelController:
             except Exception as err:
                 logging.error(f'Error on listening {err}')
                 self.stop_listening()
+        self.notify_state()
 
     def stop_listening(self):
         """Stop listening and disconnect the client.
 
-        Sets `self.is_listening` to False.
+        Sets `self.is_listening` to False. The buffered records of `self.recorder` are written.
         """
         logging.info('Listening Stopped')
         self.is_listening = False
         self.client.disconnect()
+        if self.recorder is not None:
+            self.recorder.flush()
+        self.notify_state()
+
+    @property
+    def status(self) -> str:
+        """CONNECTING while the client connects or reconnects, LISTENING while listening to a connected
+        scale and STOPPED otherwise."""
+        client = self.client
+        if client.is_connecting or client.supervisor.is_recovering:
+            return CONNECTING
+        if self.is_listening and client.is_connected:
+            return LISTENING
+        return STOPPED
+
+    def notify_state(self, status: str = None):
+        """Call the `self.state_callbacks` if the status changed since the last notification.
+
+        Parameters
+        ----------
+        status :
+            New status. Defaults to `self.status`.
+        """
+        if (status or self.status) == self._notified_status:
+            return
+        with self._state_lock:  # Callbacks are called in the order of the changes: they must not block.
+            status = status or self.status
+            if status == self._notified_status:
+                return
+            self._notified_status = status
+            for callback in self.state_callbacks:
+                callback(self, status)
 
     def mute(self):
         """Sets `self.is_muted` to True"""
@@ -155,6 +256,60 @@ class MarelController:
         """Sets `self.is_muted` to False"""
         self.is_muted = False
 
+    def start_recording(self, path: str):
+        """Record every received message in the session file `path`. See `recorder.SessionRecorder`."""
+        self.stop_recording()
+        self.recorder = SessionRecorder(path)
+
+    def stop_recording(self):
+        """Close the session file (if any) and set `self.recorder` to None."""
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    def metrics(self) -> dict:
+        """Return a snapshot of `self.stats` (See `metrics.Metrics.snapshot`)."""
+        return self.stats.snapshot()
+
+    def metrics_prometheus(self) -> str:
+        """Return `self.stats` in the Prometheus text format, labeled with the host."""
+        return self.stats.to_prometheus(labels={'host': self.host})
+
+    def enable_history(self, capacity: int = 72_000):
+        """Keep the `capacity` most recent `w` readings in `self.history`.
+
+        The default capacity holds 1 hour of readings at 20 Hz (1.22 MB). See `history.WeightHistory`.
+        """
+        self.history = WeightHistory(capacity)
+
+    def disable_history(self):
+        """Stop keeping the `w` readings. Sets `self.history` to None."""
+        self.history = None
+
+    def enable_journal(self, path: str, sync: str = 'group', commit_interval: float = 0.0) -> List[JournalEntry]:
+        """Journal every keyboard entry in `path` before it is emitted. See `journal.PrintJournal`.
+
+        Returns
+        -------
+        The entries of a previous session journaled but never emitted (e.g. after a crash).
+        They are logged and acknowledged: they are handed to the caller and not reported again.
+        """
+        self.disable_journal()
+        lost = PrintJournal.recover(path)
+        for entry in lost:
+            logging.warning(f'Print journaled but not emitted: {entry}')
+        self.journal = PrintJournal(path, sync=sync, commit_interval=commit_interval)
+        for entry in lost:
+            self.journal.acknowledge(entry.seq)
+        return lost
+
+    def disable_journal(self):
+        """Wait for the pending keyboard entries, close the journal (if any) and set `self.journal` to None."""
+        if self.journal is not None:
+            self.output_worker.flush()
+            self.journal.close()
+            self.journal = None
+
     def get_weight(self, units='kg'):
         """Return the latest weight value in units of `units`"""
         if self.weight is not None:
@@ -169,30 +324,44 @@ class MarelController:
 
         While listening, calls `self.client.receive(allow_timeout=False, split=True).
         If any messages are received, `self.process_message` is called for each message.
+
+        Unless `self.event_driven` is True, sleeps `RECEIVE_SLEEP` after each batch of messages.
+
+        Status changes (connection lost, reconnected) are notified to the `self.state_callbacks`.
         """
         logging.info('Start MarelController ')
         while self.is_listening:
             data = self.client.receive(allow_timeout=False, split=True)
+            if self.state_callbacks:
+                self.notify_state()
             if not data:
                 continue
 
             for message in data:
-                logging.debug(f'Received Messages: {message}')
+                logging.debug('Received Messages: %s', message)
                 self.process_message(message)
-            time.sleep(RECEIVE_SLEEP)
+
+            if not self.event_driven:
+                time.sleep(RECEIVE_SLEEP)
 
     def process_message(self, message):
-        """Parse message with regex.
+        """Parse message with `protocol.parse_message`.
 
         Message expected: `%<prefix>,<weight><units>#`
 
-        Convert the received weight value to the  required units (`self.units`).
+        Updates `self.weight` with the received weight. Keep alive messages are heartbeats: they only
+        update `self.link`, as does any message. Invalid messages are logged and counted in
+        `self.protocol_errors`. Only weight messages change `self.weight`.
 
-        Updates values in `self.received_values` and `self.weight`.
-            `self.received_values[prefix] = weight`
-            `self.weight = weight`
+        Every message is recorded by `self.recorder` (if recording) and
+        `w` readings are added to `self.history` (if enabled).
 
-        If the prefix is `p`, `self.to_keyboard(weight) is called.
+        Functions in `self.weight_callbacks` are called with the new weight.
+
+        If the prefix is `p`, `self.print_weight` is called. If `self.auto_capture` is True,
+        `w` readings are passed to `self.stability` and `self.print_weight` is called once stable.
+        A `p` message following an auto-capture of the same weighing is not printed (it would be a
+        duplicate entry), a `p` message before the auto-capture prevents it.
 
         Parameters
         ----------
@@ -203,31 +372,108 @@ class MarelController:
         -------
 
         """
-        pattern = "%(\S),(-?\d+.?\d*)(\S+)#"
-        match = re.match(pattern, message)
-        if match:
-            prefix = match.group(1)
-            value = match.group(2)
-            units = match.group(3)
-
-            self.weight = Weight(float(value), units)
-
-            if prefix == 'p' and not self.is_muted:
-                self.to_keyboard(self.weight.get_weight(self.units))
-        else:
-            self.weight = None
+        recorder, stats = self.recorder, self.stats
+        now = time.monotonic()
+        try:
+            if stats.enabled:
+                start = time.perf_counter()
+                try:
+                    reading = parse_message(message)
+                finally:
+                    stats.observe('parse', time.perf_counter() - start)
+            else:
+                reading = parse_message(message)
+        except ProtocolError as err:
+            logging.warning('MAREL: %s', err)
+            self.link.seen(now)
+            self.protocol_errors += 1
+            if stats.enabled:
+                stats.parse_failures += 1
+            if recorder is not None:
+                recorder.record(INVALID_PREFIX, None, None, timestamp=now)
+            return
+
+        if reading is None:
+            self.link.seen(now, heartbeat=True)
+            if recorder is not None:
+                recorder.record(KEEPALIVE_PREFIX, None, None, timestamp=now)
+            return
+
+        self.link.seen(now)
+
+        if recorder is not None:
+            recorder.record(reading.prefix, reading.value, reading.units, timestamp=now)
+
+        weight = self.weight = Weight(reading.value, reading.units)
+        if self.history is not None and reading.prefix == 'w':
+            self.history.append(reading.value, reading.units)
+
+        for callback in self.weight_callbacks:
+            callback(self, weight)
+
+        if reading.prefix == 'p':
+            if self.auto_capture and self.stability.has_captured:
+                logging.info(f'Print ignored, already auto-captured: {weight}')
+                return
+            self.stability.is_armed = False  # Already printed, no auto-capture until the scale is emptied.
+            self.print_weight(weight)
+        elif reading.prefix == 'w' and self.auto_capture:
+            if self.stability.update(weight.get_weight('kg'), now):
+                logging.info(f'Auto-capture: {weight}')
+                self.print_weight(weight)
+
+    def print_weight(self, weight: Weight):
+        """Emit a print of `weight`.
+
+        Functions in `self.print_callbacks` are called and `self.to_keyboard(weight)`
+        is called (unless muted) with the weight in `self.units`.
+
+        Called for `p` messages and for auto-captures.
+        """
+        for callback in self.print_callbacks:
+            callback(self, weight)
+        if not self.is_muted:
+            self.to_keyboard(weight.get_weight(self.units))
 
     def to_keyboard(self, value: Union[float, int, str, bool]):
         """Print the `value` (as a string) where the cursor is (emulates a keyboard entry).
 
+        The entry is queued to `self.output_worker`, thus the keyboard emulation never blocks
+        the listening thread (unless the queue is full and the overflow policy is 'block').
+        Entries are typed in order. `enter` is pressed if `self.auto_enter` is True when queued.
+
+        If `self.journal` is set, the entry is journaled first (in `self.units`).
+
         Parameters
         ----------
         value :
             Value to print.
         """
-        pag.write(str(value))
-        if self.auto_enter is True:
-            pag.press('enter')
+        text = str(value)
+        if self.journal is None:
+            self.output_worker.submit(text, self.auto_enter)
+        else:
+            self.output_worker.submit(text, self.auto_enter, self.journal.append(text, self.units))
+
+    def write_keyboard(self, text: str, enter: bool, seq: int = None):
+        """Emit `text` (and `enter` if `enter` is True) with `self.output_backend`.
+
+        Called from the `self.output_worker` thread. A journaled entry (`seq` not None) is emitted
+        once durable in `self.journal` and acknowledged after.
+        """
+        journal = self.journal if seq is not None else None
+        if journal is not None:
+            journal.wait(seq)
+
+        enabled = self.stats.enabled
+        if enabled:
+            start = time.perf_counter()
+        self.output_backend.write(text, enter)
+        if enabled:
+            self.stats.observe('keyboard', time.perf_counter() - start)
+
+        if journal is not None:
+            journal.acknowledge(seq)
 
     def set_units(self, units: str):
         """Change the weight units.
@@ -247,13 +493,20 @@ class MarelController:
         else:
             raise ValueError(f'Invalid units. Available units: {list(UNITS_CONVERSION.keys())}.')
 
-    def update_lua_code(self, filename: str):
+    def update_lua_code(self, filename: str, skip_if_current: bool = False):
         """Update the scale Lua code.
 
         New clients are made to download and upload the Lua Code.
 
         First the Lua file is downloaded (to the scale). Then the Scale Lua code is
-        uploaded (from the scale) and compared to the file sent for confirmation.
+        uploaded (from the scale) and compared to the file sent for confirmation, while streaming
+        (see `lua_deploy.verify_lua_script`).
+
+        If `skip_if_current` is True, the scale Lua code is first uploaded (from the scale) and compared
+        to the file while streaming (it stops at the first difference): if it matches, the download is skipped. The estimated time saved (duration of the
+        last full update of this host, see `self.lua_cache`) is logged and kept in `self.last_lua_update`.
+        If `self.lua_cache` holds another digest for this host (the scale was last verified with another
+        script), the check is not made and the file is downloaded directly.
 
         The download and upload ports are hardcoded in the scale software.
             Download port: 52202
@@ -264,53 +517,63 @@ class MarelController:
         ----------
         filename :
             Lua code file.
+        skip_if_current :
+            Skip the download if the scale already runs the same Lua code.
 
         Returns
         -------
         -1 : (Failed) Scale not reach or file failed to download (to the scale).
         0 : (Failed) File downloaded (to the scale) but could not upload (from the scale) the Lua code
             or the uploaded and downloaded Lua code were no identical.
-        1 : (Succeeded) The file download (to the scale) was the same as the one uploaded (from the scale).
+        1 : (Succeeded) The file download (to the scale) was the same as the one uploaded (from the scale),
+            or the download was skipped.
 
         """
-        download_client = MarelClient()
-        download_client.connect(self.host, DOWNLOAD_PORT, single_try=True)
-
+        start = time.monotonic()
         with open(filename, 'r') as lua_app:
             lua_script = lua_app.read()
+        digest = script_digest(lua_script)
+
+        cached = self.lua_cache.digest(self.host)
+        if skip_if_current and cached not in (None, digest):
+            logging.info(f'Lua cache: {self.host} was verified with another script, no check before the download.')
+        elif skip_if_current:
+            check = verify_lua_script(self.host, UPLOAD_PORT, lua_script, timeout=self.client.timeout)
+            if check.matched:
+                duration = time.monotonic() - start
+                time_saved = max(0.0, self.lua_cache.update_duration(self.host) - duration)
+                self.lua_cache.set(self.host, digest)
+                self.last_lua_update = LuaUpdateReport(1, True, duration, time_saved, verification=check)
+                logging.info(f'Lua script already deployed on {self.host}. Download skipped ({time_saved:.1f} s saved).')
+                return 1
+
+        result, verification = self._download_lua_code(lua_script)
+        duration = time.monotonic() - start
+        if result == 1:
+            self.lua_cache.set(self.host, digest, update_duration=duration)
+        self.last_lua_update = LuaUpdateReport(result, False, duration, verification=verification)
+        return result
+
+    def _download_lua_code(self, lua_script: str) -> Tuple[int, Optional[VerificationResult]]:
+        """Download `lua_script` to the scale and verify it. See `self.update_lua_code`."""
+        download_client = MarelClient()
+        download_client.connect(self.host, DOWNLOAD_PORT, single_try=True)
 
         if download_client.is_connected:
             download_client.send(lua_script)
             download_client.close()
             logging.info('Lua Script downloaded to scale.')
         else:
-            return -1  # Marel not reach
+            return -1, None  # Marel not reach
 
         time.sleep(1)  # Some delay (>0.1) seems to be necessary between download and upload check.
 
-        upload_client = MarelClient()
-        upload_client.connect(self.host, UPLOAD_PORT, single_try=True)
-
-        received = []
-        count = 0
-
-        if upload_client.is_connected:
-            while True:
-                received += upload_client.receive(allow_timeout=True, split=False)
-
-                if count > 10:
-                    break
-                count += 1
-
-            upload_client.close()
-
-            received_lua_script = ''.join(received)
-
-            logging.info('Lua Script uploaded from scale.')
+        verification = verify_lua_script(self.host, UPLOAD_PORT, lua_script, timeout=self.client.timeout)
+        logging.info(f'Lua Script uploaded from scale: {verification}')
 
-            if received_lua_script == lua_script:
-                logging.info('Lua script successfully uploaded.')
-                return 1  # Sucess
+        if verification.matched:
+            logging.info('Lua script successfully uploaded.')
+            return 1, verification  # Sucess
 
         logging.info('Failed to upload Lua Script.')
-        return 0  # File downloaded but did not match the uploaded one.
+        return 0, verification  # File downloaded but did not match the uploaded one.
@@ -0,0 +1,138 @@
+"""
+This module contains the Metrics class used to instrument the MarelClient and MarelController hot path.
+
+Stages timed (histograms, seconds):
+    recv: `socket.recv_into` calls of `MarelClient.receive`.
+    decode: framing and decoding of the received bytes.
+    parse: `protocol.parse_message` calls of `MarelController.process_message`.
+    keyboard: `MarelController.write_keyboard` calls (output worker thread).
+    recover: time to recover from a connection loss (`reconnect.ReconnectSupervisor`).
+
+Counters:
+    reconnects, timeouts, bytes_in, frames_in, parse_failures.
+
+Metrics are disabled by default. When disabled, the instrumented code only checks `metrics.enabled`.
+
+Examples
+--------
+>>> controller.stats.enabled = True
+>>> controller.metrics()['stages']['parse']['mean']
+>>> print(controller.stats.to_prometheus(labels={'host': controller.host}))
+"""
+import time
+from bisect import bisect_left
+from typing import *
+
+STAGES = ('recv', 'decode', 'parse', 'keyboard', 'recover')
+COUNTERS = ('reconnects', 'timeouts', 'bytes_in', 'frames_in', 'parse_failures')
+
+BUCKETS = tuple(1e-6 * 2 ** i for i in range(25))  # 1 us to ~16.8 s
+
+
+class Histogram:
+    """
+    Histogram of durations with fixed exponential buckets.
+
+    Attributes
+    ----------
+    bounds :
+        Upper bounds (seconds) of the buckets. An overflow bucket (+Inf) is added.
+    buckets :
+        Number of observations per bucket (not cumulative).
+    count :
+        Number of observations.
+    sum :
+        Sum of the observations (seconds).
+    """
+    def __init__(self, bounds: Tuple[float, ...] = BUCKETS):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        self.buckets[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket containing the `q` quantile."""
+        if not self.count:
+            return None
+        rank, total = q * self.count, 0
+        for bound, count in zip(self.bounds + (float('inf'),), self.buckets):
+            total += count
+            if total >= rank:
+                return bound
+        return float('inf')
+
+    def snapshot(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else None,
+            'p50': self.quantile(.5),
+            'p99': self.quantile(.99),
+        }
+
+
+class Metrics:
+    """
+    Stage timings and connection counters.
+
+    Counters are attributes (e.g. `metrics.bytes_in`) and stage histograms are in `self.stages`.
+
+    Attributes
+    ----------
+    enabled :
+        When False (default), nothing is measured.
+    stages :
+        Histogram by stage name.
+    """
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.reconnects = 0
+        self.timeouts = 0
+        self.bytes_in = 0
+        self.frames_in = 0
+        self.parse_failures = 0
+        self.stages: Dict[str, Histogram] = {stage: Histogram() for stage in STAGES}
+        self._start = time.monotonic()
+
+    def observe(self, stage: str, seconds: float):
+        """Add a duration to the histogram of `stage`."""
+        self.stages[stage].observe(seconds)
+
+    def reset(self):
+        """Reset every counters and histograms."""
+        self.__init__(enabled=self.enabled)
+
+    def snapshot(self) -> dict:
+        """Return the counters and stage statistics as a dictionary."""
+        return {
+            'enabled': self.enabled,
+            'uptime': time.monotonic() - self._start,
+            'counters': {name: getattr(self, name) for name in COUNTERS},
+            'stages': {name: histogram.snapshot() for name, histogram in self.stages.items()},
+        }
+
+    def to_prometheus(self, prefix: str = 'marel', labels: Dict[str, str] = None) -> str:
+        """Return the metrics in the Prometheus text exposition format."""
+        label = ','.join(f'{key}="{value}"' for key, value in (labels or {}).items())
+        lines = []
+        for name in COUNTERS:
+            lines.append(f'# TYPE {prefix}_{name}_total counter')
+            lines.append(f'{prefix}_{name}_total{{{label}}} {getattr(self, name)}')
+
+        metric = f'{prefix}_stage_duration_seconds'
+        lines.append(f'# TYPE {metric} histogram')
+        sep = ',' if label else ''
+        for stage, histogram in self.stages.items():
+            cumulative = 0
+            for bound, count in zip(histogram.bounds + (float('inf'),), histogram.buckets):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else f'{bound:.6g}'
+                lines.append(f'{metric}_bucket{{{label}{sep}stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{{label}{sep}stage="{stage}"}} {histogram.sum}')
+            lines.append(f'{metric}_count{{{label}{sep}stage="{stage}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,226 @@
+"""
+This module contains the output backends and the OutputWorker used by the MarelController to emit
+keyboard entries.
+
+Backends:
+    PyAutoGuiBackend: types the entry with pyautogui (tunable pause and interval).
+    ClipboardBackend: copies the entry to the clipboard and pastes it with a single shortcut.
+    MemoryBackend: keeps the entries in memory (tests, headless use).
+
+Keyboard emulation is slow (pyautogui pauses after each call). The listening thread only puts
+the entries in a bounded queue; a dedicated thread emits them, one at a time, in order.
+
+Overflow policies (when `maxsize` entries are pending):
+    'block': `submit` waits for a free slot (backpressure on the listening thread). No entry is lost.
+    'drop_oldest': the oldest pending entry is discarded.
+    'drop_newest': the submitted entry is discarded.
+
+Examples
+--------
+>>> worker = OutputWorker(PyAutoGuiBackend(pause=0.02).write, maxsize=64, overflow='block')
+>>> worker.submit('1.234', True)
+>>> worker.flush()
+"""
+import abc
+import collections
+import logging
+import platform
+import threading
+import time
+from typing import *
+
+OVERFLOW_POLICIES = ('block', 'drop_oldest', 'drop_newest')
+
+
+def import_pyautogui():
+    """Import pyautogui when first needed (it requires a display when imported)."""
+    import pyautogui
+    return pyautogui
+
+
+class OutputBackend(abc.ABC):
+    """Interface of the output backends."""
+    @abc.abstractmethod
+    def write(self, text: str, enter: bool):
+        """Emit `text` and press `enter` if `enter` is True."""
+
+
+class PyAutoGuiBackend(OutputBackend):
+    """
+    Keyboard emulation with pyautogui.
+
+    Attributes
+    ----------
+    pause :
+        Pause (seconds) after the entry. If None, pyautogui default pause (`pyautogui.PAUSE`, 0.1 s)
+        is made after each call (text and enter).
+    interval :
+        Pause (seconds) between each typed character.
+    """
+    def __init__(self, pause: float = None, interval: float = 0.0):
+        self.pause = pause
+        self.interval = interval
+
+    def write(self, text: str, enter: bool):
+        pag = import_pyautogui()
+        per_call_pause = self.pause is None
+        pag.write(text, interval=self.interval, _pause=per_call_pause)
+        if enter is True:
+            pag.press('enter', _pause=per_call_pause)
+        if self.pause:
+            time.sleep(self.pause)
+
+
+class ClipboardBackend(OutputBackend):
+    """
+    Single-shot entry: the text is copied to the clipboard and pasted with the paste shortcut.
+
+    Attributes
+    ----------
+    pause :
+        Pause (seconds) after the entry.
+    restore :
+        If True, the previous clipboard content is restored after pasting.
+    """
+    def __init__(self, pause: float = 0.0, restore: bool = False):
+        self.pause = pause
+        self.restore = restore
+        self.paste_keys = ('command', 'v') if platform.system() == 'Darwin' else ('ctrl', 'v')
+
+    def write(self, text: str, enter: bool):
+        pag = import_pyautogui()
+        import pyperclip  # Dependency of pyautogui, pinned in requirements.txt.
+
+        previous = pyperclip.paste() if self.restore else None
+        pyperclip.copy(text)
+        pag.hotkey(*self.paste_keys, _pause=False)
+        if enter is True:
+            pag.press('enter', _pause=False)
+        if self.restore:
+            pyperclip.copy(previous)
+        if self.pause:
+            time.sleep(self.pause)
+
+
+class MemoryBackend(OutputBackend):
+    """
+    Keeps the entries in memory.
+
+    Attributes
+    ----------
+    entries :
+        List of (time.monotonic(), text, enter).
+    """
+    def __init__(self):
+        self.entries: List[Tuple[float, str, bool]] = []
+
+    def write(self, text: str, enter: bool):
+        self.entries.append((time.monotonic(), text, enter))
+
+
+class OutputWorker:
+    """
+    Emits entries from a dedicated thread through a bounded FIFO queue.
+
+    Attributes
+    ----------
+    emit :
+        Function called as `emit(*entry)` for each entry, from the worker thread.
+    maxsize :
+        Maximum number of pending entries.
+    overflow :
+        Overflow policy. One of `OVERFLOW_POLICIES`.
+    emitted :
+        Number of entries emitted.
+    dropped :
+        Number of entries discarded by the overflow policy.
+    """
+    def __init__(self, emit: Callable[..., None], maxsize: int = 64, overflow: str = 'block'):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f'Invalid overflow policy. Available policies: {OVERFLOW_POLICIES}.')
+        self.emit = emit
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.emitted = 0
+        self.dropped = 0
+
+        self._queue = collections.deque()
+        self._busy = False
+        self._running = False
+        self._condition = threading.Condition()
+        self._thread: threading.Thread = None
+
+    def __len__(self):
+        return len(self._queue)
+
+    def start(self):
+        """Start the worker thread. (Called by the first `submit`.)"""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = None):
+        """Emit the pending entries and stop the worker thread."""
+        self.flush(timeout)
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, *entry) -> bool:
+        """Queue an entry.
+
+        Returns
+        -------
+        False if the entry was dropped (`drop_newest` policy), else True.
+        """
+        if not self._running:
+            self.start()
+        with self._condition:
+            if len(self._queue) >= self.maxsize:
+                if self.overflow == 'block':
+                    self._condition.wait_for(lambda: len(self._queue) < self.maxsize or not self._running)
+                elif self.overflow == 'drop_oldest':
+                    logging.warning(f'Output queue full, dropping entry {self._queue.popleft()}.')
+                    self.dropped += 1
+                else:
+                    logging.warning(f'Output queue full, dropping entry {entry}.')
+                    self.dropped += 1
+                    return False
+            self._queue.append(entry)
+            self._condition.notify_all()
+        return True
+
+    def flush(self, timeout: float = None) -> bool:
+        """Wait until every pending entry was emitted.
+
+        Returns
+        -------
+        False on timeout.
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._queue and not self._busy, timeout)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._queue or not self._running)
+                if not self._queue:
+                    return
+                entry = self._queue.popleft()
+                self._busy = True
+                self._condition.notify_all()  # A slot is free for a blocked `submit`.
+            try:
+                self.emit(*entry)
+                self.emitted += 1
+            except Exception as err:
+                logging.error(f'Error on output of {entry}: {err}')
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
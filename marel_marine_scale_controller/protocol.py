@@ -0,0 +1,124 @@
+"""
+This module contains the parser of the messages sent by the Lua App of the Marel Scale.
+
+Messages are of the form:
+    `%<prefix>,<weight><units>#`,
+where:
+    prefix: a single character, `p` or `w`.
+    weight: number of variable precision. (e.g. `1.234`, `-0.50`)
+    units: Unit of the weight. One of the `UNITS_CONVERSION` keys.
+The Lua App also sends keep alive messages: `%#`.
+
+Attributes
+----------
+UNITS_CONVERSION :
+    Dictionnary containing the ratio between 1 kg different units of weight (g, lb, oz). Use to convert units.
+UNITS :
+    Units of weight. Their index is used as compact units code (see `UNITS_CODES`).
+UNITS_CODES :
+    Units code by units.
+KEEPALIVE :
+    Keep alive message sent by the Lua App.
+PREFIXES :
+    Prefixes of the weight messages: `p` (print) and `w` (weight).
+MESSAGE_PATTERN :
+    Compiled regex of the weight messages.
+
+Examples
+--------
+>>> parse_message('%w,1.234kg#')
+Reading(prefix='w', value=1.234, units='kg')
+>>> parse_messages(['%w,1.234kg#', '%#', '%w,1.2.3kg#'])
+ParsedBatch(readings=[Reading(prefix='w', value=1.234, units='kg')], keepalives=1, errors=['%w,1.2.3kg#'])
+"""
+import re
+from typing import *
+
+UNITS_CONVERSION = {
+    'kg': 1,
+    'g': 1e-3,
+    'lb': 0.453592,
+    'oz': 0.0283495
+}
+
+UNITS = tuple(UNITS_CONVERSION)
+UNITS_CODES = {units: code for code, units in enumerate(UNITS)}
+
+KEEPALIVE = '%#'
+
+PREFIXES = ('p', 'w')
+
+# Strict: ASCII digits only (`\d` also matches other Unicode digits, which `float` accepts).
+MESSAGE_PATTERN = re.compile(r"%([" + "".join(PREFIXES) + r"]),(-?[0-9]+(?:\.[0-9]*)?)(" + "|".join(UNITS_CONVERSION) + ")#")
+
+
+class ProtocolError(ValueError):
+    """Raised when a message does not follow the Lua App protocol."""
+
+
+class Reading(NamedTuple):
+    """Weight value and units received with the message prefix."""
+    prefix: str
+    value: float
+    units: str
+
+
+class ParsedBatch(NamedTuple):
+    """Result of `parse_messages`."""
+    readings: List[Reading]
+    keepalives: int
+    errors: List[str]
+
+
+def parse_message(message: str) -> Optional[Reading]:
+    """Parse a message.
+
+    Parameters
+    ----------
+    message :
+        Message to parse, without the trailing newline.
+
+    Returns
+    -------
+    The Reading or None if the message is a keep alive.
+
+    Raises
+    ------
+    ProtocolError if the message is invalid.
+    """
+    match = MESSAGE_PATTERN.fullmatch(message)
+    if match is not None:
+        prefix, value, units = match.groups()
+        return Reading(prefix, float(value), units)
+    if message == KEEPALIVE:
+        return None
+    raise ProtocolError(f'Invalid message: {message!r}')
+
+
+def parse_messages(messages: Iterable[str]) -> ParsedBatch:
+    """Parse a batch of messages.
+
+    Invalid messages do not raise an error, they are returned in `ParsedBatch.errors`.
+
+    Parameters
+    ----------
+    messages :
+        Messages to parse, without the trailing newlines.
+
+    Returns
+    -------
+    ParsedBatch(readings, keepalives, errors)
+    """
+    readings, errors = [], []
+    keepalives = 0
+    fullmatch = MESSAGE_PATTERN.fullmatch
+    for message in messages:
+        match = fullmatch(message)
+        if match is not None:
+            prefix, value, units = match.groups()
+            readings.append(Reading(prefix, float(value), units))
+        elif message == KEEPALIVE:
+            keepalives += 1
+        else:
+            errors.append(message)
+    return ParsedBatch(readings, keepalives, errors)
@@ -0,0 +1,197 @@
+"""
+This module contains the reconnection helpers of the MarelClient.
+
+`Backoff` computes the delays between connection attempts: exponential, capped and randomized
+(jitter) so that many clients do not retry in lockstep after a network outage.
+
+`configure_socket` sets the socket options of the scale connections:
+    TCP_NODELAY: small messages are sent without delay (Nagle's algorithm disabled).
+    SO_KEEPALIVE (+ idle, interval and count when available): a dead link (scale powered off,
+        cable unplugged) is detected by the OS even when no data is expected.
+
+`ReconnectSupervisor` reconnects a client from its own thread. The listening thread only waits
+for the reconnection (see `MarelClient.receive`): it never sleeps nor connects itself. The time
+from the connection loss to the reconnection (time to recover) is measured and logged.
+
+Examples
+--------
+>>> backoff = Backoff(initial=0.1, cap=2.0, seed=1)
+>>> [round(backoff.next_delay(), 2) for _ in range(6)]
+[0.09, 0.12, 0.25, 0.7, 1.2, 1.55]
+>>> client.supervisor.recoveries
+deque([12.41])
+"""
+import collections
+import logging
+import random
+import socket
+import threading
+import time
+from typing import *
+
+KEEPALIVE_IDLE = 2  # seconds of silence before the first keepalive probe.
+KEEPALIVE_INTERVAL = 1  # seconds between probes.
+KEEPALIVE_COUNT = 3  # unanswered probes before the connection is dropped.
+
+
+class Backoff:
+    """
+    Exponential backoff with jitter.
+
+    The n-th delay (from 0) is `min(cap, initial * factor ** n)`, reduced by a random fraction
+    of at most `jitter`.
+
+    Attributes
+    ----------
+    initial :
+        First delay (seconds).
+    cap :
+        Maximum delay (seconds).
+    factor :
+        Growth factor of the delays.
+    jitter :
+        Maximum fraction (0 to 1) removed at random from each delay.
+    attempts :
+        Number of delays returned since the last `reset`.
+    """
+    def __init__(self, initial: float = 0.1, cap: float = 2.0, factor: float = 2.0, jitter: float = 0.5,
+                 seed: int = None):
+        self.initial = initial
+        self.cap = cap
+        self.factor = factor
+        self.jitter = jitter
+        self.attempts = 0
+        self._random = random.Random(seed)
+
+    def next_delay(self) -> float:
+        """Return the delay (seconds) before the next attempt."""
+        delay = min(self.cap, self.initial * self.factor ** min(self.attempts, 64))
+        self.attempts += 1
+        return delay * (1 - self.jitter * self._random.random())
+
+    def reset(self):
+        """Start again from `initial` (after a successful connection)."""
+        self.attempts = 0
+
+
+def configure_socket(sock: socket.socket, idle: int = KEEPALIVE_IDLE, interval: int = KEEPALIVE_INTERVAL,
+                     count: int = KEEPALIVE_COUNT):
+    """Enable TCP_NODELAY and TCP keepalive on `sock`. Options not supported by the OS are skipped."""
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    if hasattr(socket, 'TCP_KEEPIDLE'):  # Linux, Windows 10+
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, idle)
+    elif hasattr(socket, 'TCP_KEEPALIVE'):  # macOS
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPALIVE, idle)
+    if hasattr(socket, 'TCP_KEEPINTVL'):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, interval)
+    if hasattr(socket, 'TCP_KEEPCNT'):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, count)
+
+
+class ReconnectSupervisor:
+    """
+    Reconnects a MarelClient from a dedicated thread, waiting `client.backoff` delays between attempts.
+
+    The thread is started by `self.connection_lost` and ends once the client is reconnected, or
+    when `self.stop` is called (e.g. by `MarelClient.disconnect`).
+
+    Attributes
+    ----------
+    client :
+        MarelClient to reconnect (to `client.host:client.port`).
+    connect_timeout :
+        Timeout (seconds) of each connection attempt.
+    test_connection :
+        If True, a connection is only successful once data is received (see `MarelClient.test_new_connection`).
+    is_recovering :
+        True from the connection loss until the reconnection (or `self.stop`).
+    lost_at :
+        `time.monotonic()` time of the latest connection loss.
+    attempts :
+        Number of connection attempts of the current (or latest) recovery.
+    recoveries :
+        Time to recover (seconds, from the loss to the reconnection) of the latest recoveries.
+    """
+    def __init__(self, client, connect_timeout: float = 1.0, test_connection: bool = True, history: int = 100):
+        self.client = client
+        self.connect_timeout = connect_timeout
+        self.test_connection = test_connection
+        self.is_recovering = False
+        self.lost_at: float = None
+        self.attempts = 0
+        self.recoveries: Deque[float] = collections.deque(maxlen=history)
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._done = threading.Event()
+        self._done.set()
+        self._thread: threading.Thread = None
+
+    @property
+    def last_recovery(self) -> Optional[float]:
+        """Time to recover (seconds) of the latest recovery."""
+        return self.recoveries[-1] if self.recoveries else None
+
+    def connection_lost(self):
+        """Start reconnecting the client from the supervisor thread (if not already)."""
+        with self._lock:
+            if self.is_recovering:
+                return
+            self.is_recovering = True
+            self.lost_at = time.monotonic()
+            self.attempts = 0
+            self._stop.clear()
+            self._done.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def wait_connected(self, timeout: float = None) -> bool:
+        """Wait for the end of the recovery.
+
+        Returns
+        -------
+        True if the client is connected.
+        """
+        self._done.wait(timeout)
+        return self.client.is_connected
+
+    def stop(self, timeout: float = 0):
+        """Stop reconnecting. Waits at most `timeout` seconds (None: no limit) for the thread to end."""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def _run(self):
+        client = self.client
+        client.backoff.reset()
+        try:
+            while client.auto_reconnect and not self._stop.is_set():
+                self.attempts += 1
+                try:
+                    client.connect_once(self.connect_timeout, self.test_connection)
+                except OSError as err:
+                    delay = client.backoff.next_delay()
+                    logging.info(f'Reconnection to {client.host}:{client.port} failed ({err}). Retrying in {delay:.2f} s.')
+                    self._stop.wait(delay)
+                    continue
+
+                if not client.auto_reconnect or self._stop.is_set():  # Disconnected meanwhile.
+                    client.close()
+                    return
+                self._recovered(time.monotonic() - self.lost_at)
+                return
+        finally:
+            with self._lock:
+                self.is_recovering = False
+                self._done.set()
+
+    def _recovered(self, duration: float):
+        self.recoveries.append(duration)
+        client = self.client
+        client.backoff.reset()
+        if client.stats.enabled:
+            client.stats.reconnects += 1
+            client.stats.observe('recover', duration)
+        logging.info(f'Reconnected to {client.host}:{client.port} in {duration:.2f} s ({self.attempts} attempts).')
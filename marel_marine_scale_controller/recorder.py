@@ -0,0 +1,246 @@
+"""
+This module contains the SessionRecorder and SessionReader classes used to keep every message sent
+by the scale in a compact binary file.
+
+File format (little-endian)
+---------------------------
+Header (32 bytes):
+    magic: 8 bytes, `b'MARELREC'`
+    version: uint16
+    record size: uint16
+    padding: 4 bytes
+    wall clock time of the session start: float64 (`time.time()`)
+    monotonic time of the session start: float64 (`time.monotonic()`)
+Records (24 bytes):
+    timestamp: float64 (`time.monotonic()`)
+    value: float64 (NaN for keep alive and invalid messages)
+    prefix: uint8 (ASCII code: `w`, `p`, `#` for keep alive messages, `?` for invalid messages)
+    units code: uint8 (see `protocol.UNITS_CODES`, 255 if no units)
+    padding: 6 bytes
+
+Monotonic clocks of different sessions (processes, boots) are not comparable. When a recorder
+appends to an existing file, it starts a new segment with a record of prefix `>` holding the
+monotonic (timestamp) and wall clock (value) times of the segment start. The timestamps are
+monotonic within a segment only. See `SessionReader.segments`.
+
+Records are 8 bytes aligned, thus the SessionReader exposes each column as a strided memoryview
+of the memory-mapped file (no copy). With NumPy, the whole file can also be viewed with:
+    `numpy.frombuffer(mmap, dtype=[('timestamp', '<f8'), ('value', '<f8'), ('prefix', 'u1'), ('units', 'u1'), ('', 'V6')], offset=32)`
+
+Examples
+--------
+>>> with SessionRecorder('session.marel') as recorder:
+...     recorder.record('w', 1.234, 'kg')
+>>> with SessionReader('session.marel') as reader:
+...     print(len(reader), max(reader.values))
+"""
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import *
+
+from marel_marine_scale_controller.protocol import UNITS_CODES
+
+MAGIC = b'MARELREC'
+VERSION = 1
+HEADER = struct.Struct('<8sHH4xdd')
+RECORD = struct.Struct('<ddBB6x')
+NO_UNITS = 255
+KEEPALIVE_PREFIX = '#'
+INVALID_PREFIX = '?'
+SEGMENT_PREFIX = '>'
+PREFIX_CODES = {prefix: ord(prefix) for prefix in ('w', 'p', KEEPALIVE_PREFIX, INVALID_PREFIX)}
+
+
+class SessionRecorder:
+    """
+    Appends fixed-width records to a session file with batched writes.
+
+    Records are packed in a preallocated buffer which is written to the file when
+    `batch_size` records are buffered or when `flush_interval` seconds elapsed since the last write.
+
+    Attributes
+    ----------
+    path :
+        Path of the session file. If the file exists, records are appended to it in a new segment.
+    batch_size :
+        Number of records written at once.
+    flush_interval :
+        Maximum time (seconds) a record stays in the buffer (checked when recording).
+    count :
+        Number of records recorded.
+    """
+    def __init__(self, path: str, batch_size: int = 256, flush_interval: float = 1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.count = 0
+
+        self._buffer = bytearray(RECORD.size * batch_size)
+        self._buffered = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not new_file:
+            with open(path, 'rb') as f:
+                magic, _, record_size, _, _ = HEADER.unpack(f.read(HEADER.size).ljust(HEADER.size, b'\0'))
+            if magic != MAGIC or record_size != RECORD.size:
+                raise ValueError(f'{path} is not a session file (version {VERSION}).')
+
+        self._file = open(path, 'ab')
+        if new_file:
+            self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, time.time(), time.monotonic()))
+        else:
+            self._file.truncate(HEADER.size + (self._file.tell() - HEADER.size) // RECORD.size * RECORD.size)
+            self._file.write(RECORD.pack(time.monotonic(), time.time(), ord(SEGMENT_PREFIX), NO_UNITS))
+        self._file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def record(self, prefix: str, value: float, units: Optional[str], timestamp: float = None):
+        """Add a record.
+
+        Parameters
+        ----------
+        prefix :
+            Message prefix (`w`, `p`, `#` or `?`). Any other prefix is recorded as `?`.
+        value :
+            Weight value (NaN if None).
+        units :
+            Weight units or None.
+        timestamp :
+            `time.monotonic()` time of reception. Defaults to now.
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        with self._lock:
+            RECORD.pack_into(
+                self._buffer, self._buffered * RECORD.size, timestamp,
+                float('nan') if value is None else value,
+                PREFIX_CODES.get(prefix, PREFIX_CODES[INVALID_PREFIX]),
+                NO_UNITS if units is None else UNITS_CODES[units]
+            )
+            self._buffered += 1
+            self.count += 1
+            if self._buffered == self.batch_size or timestamp - self._last_flush >= self.flush_interval:
+                self._write()
+
+    def flush(self):
+        """Write the buffered records to the file."""
+        with self._lock:
+            self._write()
+
+    def close(self):
+        """Write the buffered records and close the file."""
+        with self._lock:
+            if not self._file.closed:
+                self._write()
+                self._file.close()
+
+    def _write(self):
+        if self._buffered:
+            self._file.write(memoryview(self._buffer)[:self._buffered * RECORD.size])
+            self._file.flush()
+            self._buffered = 0
+        self._last_flush = time.monotonic()
+
+
+class SessionReader:
+    """
+    Memory-mapped reader of a session file.
+
+    The columns are strided memoryviews of the file (no copy). They are valid until `self.close()`.
+
+    Attributes
+    ----------
+    path :
+        Path of the session file.
+    start_time :
+        Wall clock time (`time.time()`) of the session start.
+    start_monotonic :
+        Monotonic time of the session start.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, record_size, self.start_time, self.start_monotonic = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or record_size != RECORD.size:
+            self._mmap.close()
+            raise ValueError(f'{path} is not a session file (version {VERSION}).')
+
+        self._count = (len(self._mmap) - HEADER.size) // RECORD.size  # A partially written record is ignored.
+        self._view = memoryview(self._mmap)[HEADER.size:HEADER.size + self._count * RECORD.size]
+        self._columns: Dict[str, memoryview] = {}
+        self._segments: List[Tuple[int, float, float]] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def _column(self, name: str, fmt: str, start: int, step: int) -> memoryview:
+        if name not in self._columns:
+            self._columns[name] = self._view.cast(fmt)[start::step]
+        return self._columns[name]
+
+    @property
+    def timestamps(self) -> memoryview:
+        """Monotonic timestamps (float64)."""
+        return self._column('timestamps', 'd', 0, RECORD.size // 8)
+
+    @property
+    def values(self) -> memoryview:
+        """Weight values (float64)."""
+        return self._column('values', 'd', 1, RECORD.size // 8)
+
+    @property
+    def prefixes(self) -> memoryview:
+        """Prefixes ASCII code (uint8)."""
+        return self._column('prefixes', 'B', 16, RECORD.size)
+
+    @property
+    def units(self) -> memoryview:
+        """Units codes (uint8)."""
+        return self._column('units', 'B', 17, RECORD.size)
+
+    @property
+    def segments(self) -> List[Tuple[int, float, float]]:
+        """Segments of the file as (index of the first record, wall clock start time, monotonic start time).
+
+        The first segment starts with the header, the next ones with a segment record (`>`).
+        """
+        if self._segments is None:
+            self._segments = [(0, self.start_time, self.start_monotonic)]
+            prefixes, code = bytes(self.prefixes), ord(SEGMENT_PREFIX)
+            index = prefixes.find(code)
+            while index >= 0:
+                self._segments.append((index, self.values[index], self.timestamps[index]))
+                index = prefixes.find(code, index + 1)
+        return self._segments
+
+    def wall_time(self, index: int) -> float:
+        """Return the wall clock time of the record `index`, from the start of its segment."""
+        index = index % self._count if index < 0 else index
+        _, start_time, start_monotonic = next(segment for segment in reversed(self.segments) if segment[0] <= index)
+        return start_time + self.timestamps[index] - start_monotonic
+
+    def close(self):
+        """Release the columns and close the memory map."""
+        for column in self._columns.values():
+            column.release()
+        self._columns.clear()
+        self._view.release()
+        self._mmap.close()
@@ -0,0 +1,268 @@
+"""
+This module contains the replay engine used to feed recorded scale streams to a MarelController.
+
+A ReplayServer acts as a local stand-in for the scale on `COMM_PORT`: the real socket path
+(MarelClient -> MarelController.listen -> process_message) is exercised. Messages are sent with
+their recorded timing, scaled by `speed`, or as fast as possible.
+
+Streams are loaded from:
+    - session files of the `recorder` module;
+    - plain text captures of messages (`%w,1.234kg#` lines), sent every `interval` seconds.
+
+Usages
+------
+    $ python -m marel_marine_scale_controller.replay capture.txt --speed 10
+    $ python -m marel_marine_scale_controller.replay session.marel --speed 0  # as fast as possible
+"""
+import argparse
+import logging
+import math
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from typing import *
+
+from marel_marine_scale_controller.marel_controller import COMM_PORT, MarelController
+from marel_marine_scale_controller.protocol import KEEPALIVE, UNITS
+from marel_marine_scale_controller.recorder import (
+    INVALID_PREFIX, KEEPALIVE_PREFIX, MAGIC, NO_UNITS, SEGMENT_PREFIX, SessionReader
+)
+
+Stream = List[Tuple[float, str]]  # (time in seconds, message)
+
+BATCH_SIZE = 1000  # Maximum number of messages per send when replaying as fast as possible.
+
+
+def load_stream(path: str, interval: float = 0.05) -> Stream:
+    """Load a session file or a text capture as a list of (time, message).
+
+    Parameters
+    ----------
+    path :
+        Session file (`recorder.SessionRecorder`) or text file with one message per line.
+        The segments of a session file are replayed back to back (`interval` seconds apart).
+    interval :
+        Time (seconds) between the messages of a text capture.
+    """
+    with open(path, 'rb') as f:
+        is_session = f.read(len(MAGIC)) == MAGIC
+
+    if not is_session:
+        with open(path, 'r') as f:
+            messages = [line.strip() for line in f if line.strip()]
+        return [(i * interval, message) for i, message in enumerate(messages)]
+
+    stream = []
+    offset = 0.0  # Added to the timestamps of the current segment.
+    with SessionReader(path) as reader:
+        for timestamp, value, prefix, units in zip(reader.timestamps, reader.values, reader.prefixes, reader.units):
+            prefix = chr(prefix)
+            if prefix == SEGMENT_PREFIX:  # Monotonic clock of another session.
+                offset = (stream[-1][0] + interval if stream else 0.0) - timestamp
+                continue
+            timestamp += offset
+            if prefix == KEEPALIVE_PREFIX:
+                stream.append((timestamp, KEEPALIVE))
+            elif prefix != INVALID_PREFIX and units != NO_UNITS and not math.isnan(value):
+                stream.append((timestamp, f"%{prefix},{value:.6f}{UNITS[units]}#"))
+    return stream
+
+
+class ReplayServer:
+    """
+    Local TCP stand-in for the scale replaying a stream to the first client.
+
+    Attributes
+    ----------
+    stream :
+        List of (time, message) to send.
+    host :
+        Host address to bind.
+    port :
+        Port to bind. (Updated with the port picked by the OS if 0.)
+    speed :
+        Replay speed factor (1: real time, 10: 10 times faster). None or 0: as fast as possible.
+    sent :
+        Number of messages sent.
+    done :
+        Event set when all the messages were sent.
+    """
+    def __init__(self, stream: Stream, host: str = 'localhost', port: int = COMM_PORT, speed: float = 1.0):
+        self.stream = stream
+        self.host = host
+        self.port = port
+        self.speed = speed
+        self.sent = 0
+        self.done = threading.Event()
+        self.is_running = False
+
+        self._socket: socket.socket = None
+        self._conn: socket.socket = None
+        self._thread: threading.Thread = None
+
+    def start(self):
+        """Bind the server and serve the stream from another thread."""
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((self.host, self.port))
+        self.port = self._socket.getsockname()[1]
+        self._socket.listen(1)
+        self.is_running = True
+        self._thread = threading.Thread(target=self.serve, daemon=True)
+        self._thread.start()
+
+    def serve(self):
+        """Accept a client and send the stream."""
+        logging.info(f'Replay server waiting on {self.host}:{self.port}')
+        try:
+            self._conn, addr = self._socket.accept()
+        except OSError as err:  # Server stopped before any connection.
+            logging.info(f'Replay server closed: {err}')
+            self.done.set()
+            return
+        logging.info(f'Replay server accepted connection from {addr}')
+
+        t0 = self.stream[0][0] if self.stream else 0
+        start = time.perf_counter()
+        i = 0
+        try:
+            while self.is_running and i < len(self.stream):
+                if self.speed:
+                    now = (time.perf_counter() - start) * self.speed + t0
+                    j = i
+                    while j < len(self.stream) and self.stream[j][0] <= now:
+                        j += 1
+                    if j == i:  # Sleep until the next message is due.
+                        time.sleep(min((self.stream[i][0] - now) / self.speed, 0.1))
+                        continue
+                else:
+                    j = min(i + BATCH_SIZE, len(self.stream))
+
+                self._conn.sendall("".join(message + "\n" for _, message in self.stream[i:j]).encode())
+                self.sent = j
+                i = j
+        except OSError as err:
+            logging.info(f'Replay server connection lost: {err}')
+        self.done.set()
+
+    def stop(self):
+        """Close the connection and the server socket."""
+        self.is_running = False
+        for sock in (self._conn, self._socket):
+            if sock is not None:
+                sock.close()
+
+
+@dataclass
+class ReplayReport:
+    """Result of `replay`."""
+    messages: int
+    processed: int
+    duration: float  # seconds, from connection to last message processed
+    throughput: float  # messages processed per second
+    cost_per_message: float  # microseconds spent in `process_message` per message
+
+    def __str__(self):
+        return (f'{self.processed}/{self.messages} messages processed in {self.duration:.3f} s: '
+                f'{self.throughput:.0f} msg/s, {self.cost_per_message:.2f} us/msg in process_message')
+
+
+def replay(
+        stream: Stream,
+        speed: Optional[float] = 1.0,
+        port: int = COMM_PORT,
+        controller: MarelController = None,
+        timeout: float = None
+) -> ReplayReport:
+    """Replay `stream` through a ReplayServer to a MarelController.
+
+    Parameters
+    ----------
+    stream :
+        List of (time, message). See `load_stream`.
+    speed :
+        Replay speed factor. None or 0: as fast as possible.
+    port :
+        Port of the ReplayServer.
+    controller :
+        MarelController to use. Default: a new muted and `event_driven` controller.
+    timeout :
+        Maximum time (seconds) to wait, beyond the stream duration, for the messages to be sent and
+        then to be processed. Default: 5 seconds plus 0.1 ms per message.
+
+    Returns
+    -------
+    ReplayReport. The replay stops early (`processed < messages`) if the connection is lost.
+
+    Raises
+    ------
+    ConnectionError if the controller cannot connect to the ReplayServer.
+    """
+    if controller is None:
+        controller = MarelController('localhost', port=port)
+        controller.mute()
+        controller.event_driven = True
+
+    server = ReplayServer(stream, host=controller.host, port=port, speed=speed)
+    server.start()
+    controller.comm_port = server.port
+
+    processed = 0
+    cost = 0.0
+    process_message = controller.process_message
+
+    def timed_process_message(message):
+        nonlocal processed, cost
+        start = time.perf_counter()
+        process_message(message)
+        cost += time.perf_counter() - start
+        processed += 1
+
+    controller.process_message = timed_process_message
+    start = time.perf_counter()
+    try:
+        controller.start_listening()
+        if not controller.client.is_connected:
+            raise ConnectionError(f'Replay: cannot connect to {controller.host}:{server.port}')
+
+        wait = timeout if timeout is not None else 5 + len(stream) * 1e-4
+        stream_duration = (stream[-1][0] - stream[0][0]) / speed if speed and stream else 0
+        deadline = time.perf_counter() + stream_duration + wait
+        while not server.done.wait(0.05):
+            if not controller.client.is_connected or time.perf_counter() >= deadline:
+                logging.warning(f'Replay stopped after {server.sent}/{len(stream)} messages sent.')
+                break
+
+        deadline = time.perf_counter() + wait
+        while processed < server.sent and controller.client.is_connected and time.perf_counter() < deadline:
+            time.sleep(0.001)
+        duration = time.perf_counter() - start
+    finally:
+        controller.stop_listening()
+        server.stop()
+        del controller.process_message
+
+    return ReplayReport(
+        messages=len(stream),
+        processed=processed,
+        duration=duration,
+        throughput=processed / duration if duration else 0,
+        cost_per_message=1e6 * cost / processed if processed else 0
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a recorded scale stream to a MarelController.')
+    parser.add_argument('path', help='Session file or text capture (one message per line).')
+    parser.add_argument('--speed', type=float, default=1.0, help='Speed factor. 0: as fast as possible.')
+    parser.add_argument('--interval', type=float, default=0.05, help='Seconds between text capture messages.')
+    parser.add_argument('--port', type=int, default=COMM_PORT)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    print(replay(load_stream(args.path, interval=args.interval), speed=args.speed, port=args.port))
+
+
+if __name__ == '__main__':
+    main()
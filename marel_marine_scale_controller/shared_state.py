@@ -0,0 +1,251 @@
+"""
+This module contains a shared memory table of the latest weight of each scale, read by other processes.
+
+The writer (a MarelController or the controllers of a ScaleHub) publishes every weight in its
+slot of a `multiprocessing.shared_memory` block. Readers (any process of the same PC) read
+the slot directly in memory: no socket, no syscall, no copy of the other slots.
+
+Layout (little-endian):
+    header: magic `MAREL_SHM_MAGIC` (4 bytes), number of slots (uint32).
+    slots: `SLOT_SIZE` bytes each:
+        lock (uint64): seqlock counter (2 * seq), odd while the slot is being written.
+        value (float64), units code (uint32, see `protocol.UNITS_CODES`), padding (4 bytes),
+        timestamp (float64, `time.time()`), seq (uint64, number of weights published in the slot),
+        name (`NAME_SIZE` bytes, utf-8, zero padded; empty if the slot is free).
+
+Seqlock:
+    The writer increments `lock` (odd), writes the fields and increments `lock` again (even).
+    A reader reads `lock`, the fields and `lock` again: the read is consistent if both values
+    are equal and even, otherwise it is retried. Readers never block the writer.
+    There must be a single writer per slot. The names are written once, when the slot is registered.
+
+Attributes
+----------
+MAREL_SHM_MAGIC :
+    First bytes of the shared memory block.
+NAME_SIZE :
+    Maximum size (bytes) of the scale names.
+SLOT_SIZE :
+    Size (bytes) of a slot.
+SPINS :
+    Attempts of a read before yielding to the other threads (the writer) between attempts.
+
+Examples
+--------
+Writer:
+>>> table = SharedWeightTable('marel_weights', slots=8)
+>>> table.attach(controller, 'scale 1')
+Reader (other process):
+>>> reader = SharedWeightReader('marel_weights')
+>>> reader.read(reader.index('scale 1'))
+SharedReading(name='scale 1', value=1.234, units='kg', timestamp=1700000000.123, seq=42)
+"""
+import struct
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import *
+
+from marel_marine_scale_controller.marel_controller import MarelController, Weight
+from marel_marine_scale_controller.protocol import UNITS, UNITS_CODES
+
+MAREL_SHM_MAGIC = b'MRL1'
+NAME_SIZE = 32
+
+HEADER = struct.Struct('<4sI')
+LOCK = struct.Struct('<Q')
+FIELDS = struct.Struct('<dI4xdQ')  # value, units code, timestamp, seq
+NAME = struct.Struct(f'<{NAME_SIZE}s')
+SLOT_SIZE = LOCK.size + FIELDS.size + NAME.size
+
+SPINS = 100
+
+
+class SharedReading(NamedTuple):
+    """Latest weight of a scale."""
+    name: str
+    value: float
+    units: str
+    timestamp: float
+    seq: int
+
+    def get_weight(self, target_units='kg') -> float:
+        return Weight(self.value, self.units).get_weight(target_units)
+
+
+def _slot_offset(index: int) -> int:
+    return HEADER.size + index * SLOT_SIZE
+
+
+_CREATED: Set[str] = set()  # Blocks created by this process (registered to its resource tracker).
+
+
+def _open_untracked(name: str) -> shared_memory.SharedMemory:
+    """Open an existing block. The reader must not unlink it on exit (resource tracker, Python < 3.13)."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+    shm = shared_memory.SharedMemory(name)
+    if sys.platform != 'win32' and shm.name not in _CREATED:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+class SharedWeightTable:
+    """
+    Writer of the shared memory table.
+
+    Attributes
+    ----------
+    shm :
+        SharedMemory block (created).
+    slots :
+        Number of slots.
+    names :
+        Slot index by scale name.
+    """
+    def __init__(self, name: str = None, slots: int = 64):
+        self.slots = slots
+        self.names: Dict[str, int] = {}
+        self._seqs = [0] * slots
+        self.shm = shared_memory.SharedMemory(name, create=True, size=HEADER.size + slots * SLOT_SIZE)
+        self.shm.buf[:len(self.shm.buf)] = bytes(len(self.shm.buf))
+        HEADER.pack_into(self.shm.buf, 0, MAREL_SHM_MAGIC, slots)
+        _CREATED.add(self.shm.name)
+
+    @property
+    def name(self) -> str:
+        """Name of the shared memory block, used by the readers."""
+        return self.shm.name
+
+    def register(self, name: str) -> int:
+        """Assign a slot to the scale `name` (once) and return its index.
+
+        Raises
+        ------
+        ValueError if the name is too long or if every slot is used.
+        """
+        if name in self.names:
+            return self.names[name]
+        encoded = name.encode()
+        if len(encoded) > NAME_SIZE:
+            raise ValueError(f'Scale name longer than {NAME_SIZE} bytes: {name}')
+        if len(self.names) >= self.slots:
+            raise ValueError(f'No free slot in the shared weight table ({self.slots} slots).')
+        index = len(self.names)
+        NAME.pack_into(self.shm.buf, _slot_offset(index) + LOCK.size + FIELDS.size, encoded)
+        self.names[name] = index
+        return index
+
+    def publish(self, index: int, value: float, units: str, timestamp: float = None):
+        """Write a weight in the slot `index` (seqlock protected)."""
+        buf, offset = self.shm.buf, _slot_offset(index)
+        seq = self._seqs[index] = self._seqs[index] + 1  # Single writer: the counters are kept here.
+        LOCK.pack_into(buf, offset, 2 * seq - 1)
+        FIELDS.pack_into(buf, offset + LOCK.size, value, UNITS_CODES[units],
+                         time.time() if timestamp is None else timestamp, seq)
+        LOCK.pack_into(buf, offset, 2 * seq)
+
+    def attach(self, controller: MarelController, name: str = None) -> int:
+        """Publish every weight of `controller` (named `host:port` by default). Returns the slot index."""
+        index = self.register(name or f'{controller.host}:{controller.comm_port}')
+        controller.weight_callbacks.append(lambda _, weight: self.publish(index, weight.value, weight.units))
+        return index
+
+    def attach_hub(self, hub) -> Dict[str, int]:
+        """Publish the weights of every scale of a ScaleHub. Returns the slot index by scale name."""
+        return {name: self.attach(controller, name) for name, controller in hub.scales.items()}
+
+    def close(self, unlink: bool = True):
+        """Close the block and (by default) destroy it."""
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+            _CREATED.discard(self.shm.name)
+
+
+class SharedWeightReader:
+    """
+    Reader of a shared memory table, from any process.
+
+    Attributes
+    ----------
+    shm :
+        SharedMemory block (attached).
+    slots :
+        Number of slots.
+    timeout :
+        Maximum time (seconds) spent retrying a read while the slot is being written.
+    """
+    def __init__(self, name: str, timeout: float = 1.0):
+        self.shm = _open_untracked(name)
+        self.timeout = timeout
+        self._names: Dict[int, str] = {}  # Names of the registered slots (written once).
+        magic, self.slots = HEADER.unpack_from(self.shm.buf, 0)
+        if magic != MAREL_SHM_MAGIC:
+            self.shm.close()
+            raise ValueError(f'{name} is not a shared weight table.')
+
+    def names(self) -> Dict[str, int]:
+        """Return the slot index by scale name of the registered scales."""
+        names = {}
+        for index in range(self.slots):
+            name = self._name(index)
+            if not name:
+                break
+            names[name] = index
+        return names
+
+    def index(self, name: str) -> int:
+        """Return the slot index of the scale `name`.
+
+        Raises
+        ------
+        KeyError if the scale is not registered.
+        """
+        return self.names()[name]
+
+    def read(self, index: int) -> Optional[SharedReading]:
+        """Return the latest weight of the slot `index`, or None if nothing was published yet.
+
+        A read is retried while the slot is being written. After `SPINS` attempts, the other threads
+        (e.g. a preempted writer) are let run between attempts.
+
+        Raises
+        ------
+        TimeoutError if no consistent read was made within `self.timeout` seconds (writer stopped while writing).
+        """
+        buf, offset = self.shm.buf, _slot_offset(index)
+        fields_offset = offset + LOCK.size
+        attempts, deadline = 0, None
+        while True:
+            before, = LOCK.unpack_from(buf, offset)
+            if not before & 1:
+                value, units, timestamp, seq = FIELDS.unpack_from(buf, fields_offset)
+                if LOCK.unpack_from(buf, offset)[0] == before:
+                    if seq == 0:
+                        return None
+                    return SharedReading(self._name(index), value, UNITS[units], timestamp, seq)
+
+            attempts += 1
+            if attempts >= SPINS:
+                if deadline is None:
+                    deadline = time.monotonic() + self.timeout
+                elif time.monotonic() > deadline:
+                    raise TimeoutError(f'Slot {index} of {self.shm.name} is being written.')
+                time.sleep(0)
+
+    def read_all(self) -> Dict[str, Optional[SharedReading]]:
+        """Return the latest weight of every registered scale."""
+        return {name: self.read(index) for name, index in self.names().items()}
+
+    def close(self):
+        self.shm.close()
+
+    def _name(self, index: int) -> str:
+        if index in self._names:
+            return self._names[index]
+        name, = NAME.unpack_from(self.shm.buf, _slot_offset(index) + LOCK.size + FIELDS.size)
+        name = name.rstrip(b'\0').decode()
+        if name:
+            self._names[index] = name
+        return name
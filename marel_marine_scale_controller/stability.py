@@ -0,0 +1,135 @@
+"""
+This module contains the StabilityDetector used by the MarelController auto-capture mode.
+
+The `w` messages are continuously sent by the scale. The detector keeps running statistics
+(Welford's algorithm, O(1) per reading) of the current run of readings. A reading further than
+`tolerance` from the mean of the run starts a new run. Once a run lasts `hold_time` seconds and
+the standard deviation of its readings is at most `max_std`, the weight is stable and a capture
+is emitted. (A run can stay within `tolerance` of its mean while being too noisy to be captured.)
+
+Only one capture is emitted per weighing: the detector is re-armed when the weight goes back
+under `min_weight` (the scale is emptied).
+
+Examples
+--------
+>>> detector = StabilityDetector(tolerance=0.005, hold_time=0.5)
+>>> for timestamp, value in readings:
+...     if detector.update(value, timestamp):
+...         print('Stable weight', detector.value)
+"""
+import math
+
+
+class RunningStats:
+    """Welford's online mean and variance.
+
+    Attributes
+    ----------
+    count :
+        Number of values added.
+    mean :
+        Mean of the values.
+    """
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value: float):
+        """Add a value. O(1)"""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    def reset(self):
+        """Discard all the values."""
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    @property
+    def variance(self) -> float:
+        """Population variance of the values."""
+        return self._m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self) -> float:
+        """Population standard deviation of the values."""
+        return math.sqrt(self.variance)
+
+
+class StabilityDetector:
+    """
+    Incremental weight stability detector.
+
+    Attributes
+    ----------
+    tolerance :
+        Maximum distance (kg) between a reading and the mean of the current run.
+    hold_time :
+        Time (seconds) the readings must stay within `tolerance` to be stable.
+    max_std :
+        Maximum standard deviation (kg) of the readings of a stable run. Default: `tolerance / 2`.
+    min_weight :
+        Weight (kg) under which the scale is considered empty. Readings under `min_weight` re-arm the detector.
+    stats :
+        RunningStats of the current run of readings.
+    run_start :
+        Timestamp of the first reading of the current run.
+    is_armed :
+        True if a capture can be emitted. Set to False by a capture.
+    has_captured :
+        True if a capture was emitted since the detector was last re-armed (scale emptied).
+    value :
+        Mean of the run of the latest capture.
+    """
+    def __init__(self, tolerance: float = 0.005, hold_time: float = 0.5, min_weight: float = 0.01,
+                 max_std: float = None):
+        self.tolerance = tolerance
+        self.hold_time = hold_time
+        self.max_std = tolerance / 2 if max_std is None else max_std
+        self.min_weight = min_weight
+        self.stats = RunningStats()
+        self.run_start: float = None
+        self.is_armed = True
+        self.has_captured = False
+        self.value: float = None
+
+    def reset(self):
+        """Discard the current run and re-arm the detector."""
+        self.stats.reset()
+        self.run_start = None
+        self.is_armed = True
+        self.has_captured = False
+
+    def update(self, value: float, timestamp: float) -> bool:
+        """Add a reading.
+
+        Parameters
+        ----------
+        value :
+            Weight in kg.
+        timestamp :
+            Time of the reading in seconds (e.g. `time.monotonic()`).
+
+        Returns
+        -------
+        True if the weight just became stable (capture).
+        """
+        if value < self.min_weight:
+            self.reset()
+            return False
+
+        if self.stats.count == 0 or abs(value - self.stats.mean) > self.tolerance:
+            self.stats.reset()
+            self.run_start = timestamp
+
+        self.stats.add(value)
+
+        if self.is_armed and timestamp - self.run_start >= self.hold_time and self.stats.std <= self.max_std:
+            self.is_armed = False
+            self.has_captured = True
+            self.value = self.stats.mean
+            return True
+        return False
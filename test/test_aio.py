@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+
+from marel_marine_scale_controller.aio import AsyncMarelController, Subscription
+from marel_marine_scale_controller.protocol import Reading
+from test.testing_server import HOST, Server
+
+
+def start_scale(interval=.02):
+    server = Server(HOST, 0, interval=interval)
+    server.start_comm_port()
+    return server
+
+
+async def wait_for(condition, timeout=5):
+    async def wait():
+        while not condition():
+            await asyncio.sleep(.01)
+    await asyncio.wait_for(wait(), timeout)
+
+
+def test_subscription_drops_oldest():
+    async def main():
+        subscription = Subscription(maxsize=2)
+        for item in range(5):
+            subscription.put(item)
+        assert subscription.dropped == 3
+        assert [await subscription.get(), await subscription.get()] == [3, 4]
+        subscription.close()
+        assert [item async for item in subscription] == []
+    asyncio.run(main())
+
+
+def test_readings():
+    server = start_scale()
+
+    async def main():
+        async with AsyncMarelController(HOST, port=server.port) as controller:
+            readings = []
+            async for reading in controller.readings():
+                readings.append(reading)
+                if len(readings) == 3:
+                    break
+            assert readings == [Reading('w', 1.0, 'kg')] * 3
+            assert controller.get_weight('g') == 1000
+    try:
+        asyncio.run(main())
+    finally:
+        server.close_all()
+
+
+def test_next_print():
+    server = start_scale()
+
+    async def main():
+        async with AsyncMarelController(HOST, port=server.port) as controller:
+            await wait_for(lambda: server.conns)
+            name = next(iter(server.conns))
+            print_task = asyncio.create_task(controller.next_print(timeout=5))
+            await asyncio.sleep(.1)
+            server.send_to(name, "%p,2.500kg#\n")
+            weight = await print_task
+            assert weight.value == 2.5
+
+            with pytest.raises(asyncio.TimeoutError):
+                await controller.next_print(timeout=.1)
+    try:
+        asyncio.run(main())
+    finally:
+        server.close_all()
+
+
+def test_slow_subscriber_does_not_block_others():
+    server = start_scale(interval=.005)
+
+    async def main():
+        async with AsyncMarelController(HOST, port=server.port) as controller:
+            slow = controller.subscribe(maxsize=4)
+            fast = []
+            async for reading in controller.readings():
+                fast.append(reading)
+                if len(fast) == 50:
+                    break
+            assert len(slow) == 4
+            assert slow.dropped >= 40
+            slow.close()
+    try:
+        asyncio.run(main())
+    finally:
+        server.close_all()
+
+
+def test_readings_end_on_close():
+    server = start_scale()
+
+    async def main():
+        controller = AsyncMarelController(HOST, port=server.port)
+        await controller.connect()
+        subscription = controller.subscribe()
+        await controller.close()
+        assert subscription.is_closed
+        async for _ in subscription:  # The iteration ends.
+            pass
+        with pytest.raises(ConnectionError):
+            await controller.next_print()
+    try:
+        asyncio.run(main())
+    finally:
+        server.close_all()
+
+
+def test_reconnects():
+    server = start_scale()
+    port = server.port
+
+    async def main():
+        async with AsyncMarelController(HOST, port=port, timeout=.5) as controller:
+            controller.backoff.cap = .1
+            await wait_for(lambda: controller.weight is not None and server.conns)
+            for conn in list(server.conns.values()):
+                conn.close()
+            await wait_for(lambda: not controller.is_connected)
+            await wait_for(lambda: controller.is_connected)
+            controller.weight = None
+            await wait_for(lambda: controller.weight is not None)
+    try:
+        asyncio.run(main())
+    finally:
+        server.close_all()
@@ -0,0 +1,107 @@
+import json
+import socket
+import threading
+import time
+
+from marel_marine_scale_controller.broker import Subscriber, WeightBroker, parse_listen_address
+from marel_marine_scale_controller.marel_controller import MarelController
+from test.testing_server import HOST, Server
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(.01)
+    return True
+
+
+def read_events(sock, count, timeout=5, until=None):
+    """Read `count` events, or until the event of value `until`."""
+    sock.settimeout(timeout)
+    data = b''
+    while data.count(b'\n') < count:
+        data += sock.recv(65536)
+        if until is not None and data.endswith(b'"value": %d}\n' % until):
+            break
+    return [json.loads(line) for line in data.splitlines()[:count]]
+
+
+def test_parse_listen_address():
+    assert parse_listen_address('/tmp/marel.sock') == '/tmp/marel.sock'
+    assert parse_listen_address('0.0.0.0:1234') == ('0.0.0.0', 1234)
+    assert parse_listen_address(':1234') == ('127.0.0.1', 1234)
+
+
+def test_subscriber_drops_oldest():
+    subscriber = Subscriber(None)
+    for n in range(10):
+        subscriber.queue(b'%d\n' % n, max_buffer=6)
+    assert list(subscriber.pending) == [b'7\n', b'8\n', b'9\n']
+    assert subscriber.dropped == 7
+
+
+def test_broker_publishes_scale_events():
+    server = Server(HOST, 0, interval=.02)
+    server.start_comm_port()
+    broker = WeightBroker((HOST, 0))
+    controller = MarelController(HOST, port=server.port)
+    controller.mute()
+    broker.attach(controller, name='scale')
+    broker.start()
+    subscribers = [socket.create_connection(broker.address) for _ in range(3)]
+    try:
+        assert wait_for(lambda: len(broker.subscribers) == 3)
+        controller.start_listening()
+        for sock in subscribers:
+            events = read_events(sock, 3)
+            assert events[0] == {'scale': 'scale', 'event': 'status', 'status': 'connecting'}
+            weight = next(event for event in events if event['event'] == 'weight')
+            assert (weight['value'], weight['units']) == (1.0, 'kg')
+
+        name = next(iter(server.conns))
+        server.send_to(name, "%p,2.500kg#\n")
+        sock = subscribers[0]
+        data = b''
+        while b'"print"' not in data:
+            data += sock.recv(65536)
+        printed = next(json.loads(line) for line in data.splitlines() if b'"print"' in line)
+        assert printed['value'] == 2.5
+    finally:
+        controller.stop_listening()
+        for sock in subscribers:
+            sock.close()
+        broker.stop()
+        server.close_all()
+
+
+def test_slow_subscriber_does_not_block(tmp_path):
+    path = str(tmp_path.joinpath('broker.sock'))
+    broker = WeightBroker(path, max_buffer=1 << 16)
+    broker.start()
+    slow = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    slow.connect(path)
+    assert wait_for(lambda: len(broker.subscribers) == 1)
+    fast = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    fast.connect(path)
+    count = 20000
+    received = []
+    reader = threading.Thread(target=lambda: received.extend(read_events(fast, count, until=count - 1)))
+    try:
+        assert wait_for(lambda: len(broker.subscribers) == 2)
+        reader.start()
+        start = time.monotonic()
+        for n in range(count):
+            broker.publish({'event': 'weight', 'value': n})
+        assert time.monotonic() - start < 5
+
+        reader.join(timeout=10)
+        values = [event['value'] for event in received]
+        assert values[-1] == count - 1
+        assert values == sorted(values)
+        assert broker.subscribers[0].dropped > broker.subscribers[1].dropped  # The slow one.
+    finally:
+        slow.close()
+        fast.close()
+        broker.stop()
@@ -0,0 +1,86 @@
+import random
+import socket
+
+from marel_marine_scale_controller.client import FrameDecoder, MarelClient
+
+
+def fragment(data, max_size, seed=0):
+    rng = random.Random(seed)
+    chunks, i = [], 0
+    while i < len(data):
+        size = rng.randint(1, max_size)
+        chunks.append(data[i:i + size])
+        i += size
+    return chunks
+
+
+def test_decoder_random_fragmentation():
+    messages = [f"%w,{i / 1000:.3f}kg#" for i in range(2000)]
+    stream = "".join(m + "\n" for m in messages).encode()
+
+    decoder = FrameDecoder(size=64)
+    frames = []
+    for chunk in fragment(stream, 100):
+        decoder.feed(chunk)
+        frames += decoder.frames()
+
+    assert frames == messages
+    assert len(decoder) == 0
+
+
+def test_decoder_keeps_incomplete_frame():
+    decoder = FrameDecoder(size=16)
+    decoder.feed(b"%w,1.0kg#\n%p,2.")
+    assert decoder.frames() == ["%w,1.0kg#"]
+    assert decoder.pending == b"%p,2."
+    decoder.feed(b"0kg#\n%#")
+    assert decoder.frames() == ["%p,2.0kg#"]
+    assert decoder.drain() == "%#"
+
+
+def test_decoder_multi_byte_delimiter():
+    decoder = FrameDecoder(delimiter=b"\r\n")
+    for chunk in (b"ab\r", b"\ncd", b"\r", b"\n"):
+        decoder.feed(chunk)
+    assert decoder.frames() == ["ab", "cd"]
+
+
+def test_client_receive_with_recv_into():
+    client = MarelClient()
+    client.socket, remote = socket.socketpair()
+    client.is_connected = True
+    remote.sendall(b"%w,1.000kg#\n%w,2.0")
+    assert client.receive() == ["%w,1.000kg#"]
+    remote.sendall(b"00kg#\n")
+    assert client.receive() == ["%w,2.000kg#"]
+    assert client.data_buffer == b""
+    remote.close()
+    client.close()
+
+
+def test_decoder_skips_invalid_bytes():
+    decoder = FrameDecoder()
+    decoder.feed(b"%w,1.0k\xff#\n%w,2.0kg#\n%w,3.")
+    assert decoder.frames() == ["%w,1.0k�#", "%w,2.0kg#"]
+    decoder.feed(b"0kg#\n")
+    assert decoder.frames() == ["%w,3.0kg#"]
+
+
+def test_decoder_frame_aligned_chunks():
+    decoder = FrameDecoder(size=16)
+    for i in range(100):
+        decoder.feed(f"%w,{i}.0kg#\n".encode())
+        assert decoder.frames() == [f"%w,{i}.0kg#"]
+    assert len(decoder.buffer) == 16
+
+
+def test_client_receive_returns_buffered_messages_first():
+    client = MarelClient()
+    client.socket, remote = socket.socketpair()
+    client.socket.settimeout(0.2)
+    client.is_connected = True
+    client.decoder.feed(b"%w,1.000kg#\n")  # e.g. received by `test_new_connection`.
+    assert client.receive(allow_timeout=True) == ["%w,1.000kg#"]
+    assert client.receive(allow_timeout=True) == []
+    remote.close()
+    client.close()
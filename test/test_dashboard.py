@@ -0,0 +1,70 @@
+import time
+
+from marel_marine_scale_controller.dashboard import STALE, DashboardState, ScaleRow, parse_address
+from marel_marine_scale_controller.hub import ScaleHub
+from marel_marine_scale_controller.marel_controller import LISTENING, Weight
+from test.testing_server import HOST, Server
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(.01)
+    return True
+
+
+def test_state_coalesces_changes():
+    state = DashboardState()
+    state.add('a')
+    state.add('b')
+    assert [row.name for row in state.collect()] == ['a', 'b']
+    for value in (1, 2, 3):
+        state.update('a', weight=Weight(value, 'kg'))
+    state.update('b', status='stopped')  # Unchanged.
+    rows = state.collect()
+    assert len(rows) == 1 and rows[0].weight == Weight(3, 'kg')
+    assert state.collect() == []
+
+
+def test_row_link():
+    assert ScaleRow('a', status=LISTENING, healthy=True).link == LISTENING
+    assert ScaleRow('a', status=LISTENING, healthy=False).link == STALE
+
+
+def test_parse_address():
+    assert parse_address('10.0.0.1:1234') == ('10.0.0.1', 1234)
+    assert parse_address('10.0.0.1') == ('10.0.0.1', 52212)
+
+
+def test_state_with_50_scales():
+    servers = [Server(HOST, 0, interval=.05) for _ in range(50)]
+    for server in servers:
+        server.start_comm_port()
+    hub = ScaleHub()
+    state = DashboardState()
+    for n, server in enumerate(servers):
+        name = f'scale {n}'
+        state.add(name)
+        state.watch(name, hub.add_scale(HOST, server.port, name=name))
+    hub.start()
+    try:
+        assert wait_for(lambda: all(row.status == LISTENING and row.weight is not None for row in state.rows.values()))
+        state.check_health(hub.scales)
+        rows = state.collect()
+        assert len(rows) <= 50
+        assert all(row.link == LISTENING for row in state.rows.values())
+
+        time.sleep(.2)  # Steady weights: nothing to redraw.
+        state.check_health(hub.scales)
+        assert state.collect() == []
+
+        name = next(iter(servers[7].conns))
+        servers[7].send_to(name, "%p,2.500kg#\n")
+        assert wait_for(lambda: state.rows['scale 7'].last_print is not None)
+        assert [row.name for row in state.collect()] == ['scale 7']
+    finally:
+        hub.stop()
+        for server in servers:
+            server.close_all()
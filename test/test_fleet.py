@@ -0,0 +1,44 @@
+import pytest
+
+from marel_marine_scale_controller.fleet import deploy_fleet, main
+from test.testing_server import ABS_LUA_SCRIPT_PATH, Server
+
+HOSTS = ['127.0.0.5', '127.0.0.6']  # The ports of the scale are fixed: one loopback address per scale.
+UNREACHABLE = '127.0.0.7'
+
+
+@pytest.fixture(scope='module')
+def servers():
+    servers = [Server(host, 0) for host in HOSTS]
+    for server in servers:
+        server.start_download()
+        server.start_upload()
+    yield servers
+    for server in servers:
+        server.close_all()
+
+
+def test_deploy_fleet(servers):
+    report = deploy_fleet(HOSTS + [UNREACHABLE], ABS_LUA_SCRIPT_PATH, max_workers=4, socket_timeout=.5)
+    assert list(report.results) == HOSTS + [UNREACHABLE]
+    assert report.hosts(1) == HOSTS
+    assert report.hosts(-1) == [UNREACHABLE]
+    assert not report.succeeded
+    assert report.duration < 2  # Concurrent: each full update waits 1 s.
+    assert 'unreachable' in report.summary()
+
+
+def test_deploy_fleet_skip_if_current(servers):
+    report = deploy_fleet(HOSTS, ABS_LUA_SCRIPT_PATH, skip_if_current=True)
+    assert report.succeeded
+    assert all(result.skipped for result in report.results.values())
+
+
+def test_cli(servers, tmp_path, capsys):
+    assert main(HOSTS + ['--skip-if-current', '--cache', str(tmp_path / 'cache.json')]) == 0
+    assert '2 ok' in capsys.readouterr().out
+
+
+def test_missing_script_is_not_reported_as_unreachable(servers, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        deploy_fleet(HOSTS, str(tmp_path / 'missing.lua'))
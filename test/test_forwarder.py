@@ -0,0 +1,133 @@
+import json
+import time
+
+from marel_marine_scale_controller.forwarder import PrintForwarder
+from test.testing_http_server import HttpSink
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(.01)
+    return True
+
+
+def test_batches_on_one_connection():
+    sink = HttpSink().start()
+    forwarder = PrintForwarder(sink.url, batch_size=10, batch_interval=10)
+    for i in range(30):
+        forwarder.submit({'value': i})
+    assert wait_for(lambda: len(sink.events) == 30)
+    assert sink.requests == 3
+    assert sink.connections == 1
+    assert [event['value'] for event in sink.events] == list(range(30))
+    forwarder.stop()
+    sink.close()
+
+
+def test_batch_interval():
+    sink = HttpSink().start()
+    forwarder = PrintForwarder(sink.url, batch_size=100, batch_interval=.05)
+    forwarder.submit({'value': 1})
+    assert wait_for(lambda: sink.events, timeout=1)
+    forwarder.stop()
+    sink.close()
+
+
+def test_spool_while_remote_down(tmp_path):
+    sink = HttpSink().start()
+    sink.available = False
+    spool_path = str(tmp_path / 'prints.spool')
+    forwarder = PrintForwarder(sink.url, batch_size=5, batch_interval=.01, spool_path=spool_path, retry_delay=.05)
+    for i in range(12):
+        forwarder.submit({'value': i})
+        time.sleep(.005)
+    assert wait_for(lambda: forwarder.spooled == 12)
+    with open(spool_path) as f:
+        assert [json.loads(line)['value'] for line in f] == list(range(12))
+    assert forwarder.failures >= 1
+
+    sink.available = True
+    forwarder.submit({'value': 12})
+    assert wait_for(lambda: len(sink.events) == 13)
+    assert [event['value'] for event in sink.events] == list(range(13))
+    assert wait_for(lambda: forwarder.spooled == 0)
+    forwarder.stop()
+    sink.close()
+
+
+def test_spool_file_sent_by_next_session(tmp_path):
+    spool_path = str(tmp_path / 'prints.spool')
+    with open(spool_path, 'w') as f:
+        f.write('{"value": 0}\n{"value": 1}\n')
+    sink = HttpSink().start()
+    forwarder = PrintForwarder(sink.url, batch_interval=.01, spool_path=spool_path)
+    assert forwarder.spooled == 2
+    forwarder.submit({'value': 2})
+    assert wait_for(lambda: len(sink.events) == 3)
+    assert [event['value'] for event in sink.events] == [0, 1, 2]
+    forwarder.stop()
+    sink.close()
+
+
+def test_controller_print_callback():
+    from marel_marine_scale_controller.marel_controller import MarelController
+
+    sink = HttpSink().start()
+    forwarder = PrintForwarder(sink.url, batch_interval=10)
+    controller = MarelController('scale-1')
+    controller.mute()
+    controller.print_callbacks.append(forwarder)
+    controller.process_message('%w,1.000kg#')
+    controller.process_message('%p,1.500kg#')
+    assert forwarder.flush(timeout=5)
+    assert [(e['host'], e['value'], e['units']) for e in sink.events] == [('scale-1', 1.5, 'kg')]
+    forwarder.stop()
+    sink.close()
+
+
+def test_rejected_batch_goes_to_dead_letter(tmp_path):
+    sink = HttpSink().start()
+    sink.reject = lambda event: event['value'] == 'bad'
+    dead_letter_path = str(tmp_path / 'prints.rejected')
+    forwarder = PrintForwarder(sink.url, batch_size=2, batch_interval=10, dead_letter_path=dead_letter_path)
+    for value in (0, 'bad', 2, 3):
+        forwarder.submit({'value': value})
+    assert wait_for(lambda: len(sink.events) == 2)
+    assert [event['value'] for event in sink.events] == [2, 3]
+    assert forwarder.rejected == 2 and forwarder.spooled == 0
+    with open(dead_letter_path) as f:
+        assert [json.loads(line)['value'] for line in f] == [0, 'bad']
+    forwarder.stop()
+    sink.close()
+
+
+def test_spool_appends_and_ignores_partial_line(tmp_path):
+    spool_path = str(tmp_path / 'prints.spool')
+    with open(spool_path, 'w') as f:
+        f.write('{"value": 0}\n{"val')  # Crash while spooling.
+    sink = HttpSink().start()
+    sink.available = False
+    forwarder = PrintForwarder(sink.url, batch_interval=.01, spool_path=spool_path, retry_delay=10)
+    assert forwarder.spooled == 1
+    forwarder.submit({'value': 1})
+    assert wait_for(lambda: forwarder.spooled == 2)
+    with open(spool_path) as f:
+        assert f.read() == '{"value": 0}\n{"value": 1}\n'
+    forwarder.stop(timeout=5)
+    sink.close()
+
+
+def test_memory_spool_is_bounded():
+    sink = HttpSink().start()
+    sink.available = False
+    forwarder = PrintForwarder(sink.url, batch_size=1, batch_interval=.01, maxsize=3, retry_delay=10)
+    for i in range(5):
+        forwarder.submit({'value': i})
+        assert wait_for(lambda: forwarder.spooled + forwarder.dropped == i + 1)
+    assert forwarder.spooled == 3 and forwarder.dropped == 2
+    assert [json.loads(line)['value'] for line in forwarder._read_spool()] == [2, 3, 4]
+    forwarder.stop(timeout=5)
+    sink.close()
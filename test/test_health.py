@@ -0,0 +1,41 @@
+from marel_marine_scale_controller.health import LinkHealth
+from marel_marine_scale_controller.marel_controller import MarelController
+from test.testing_server import HOST
+
+
+def test_link_health_intervals_and_staleness():
+    health = LinkHealth(stale_after=1.0)
+    assert not health.is_healthy(now=0)
+    assert health.silence(now=0) is None
+    for timestamp in [0, .1, .2, .3]:
+        health.seen(timestamp, heartbeat=True)
+    health.seen(.5)
+    assert health.messages == 5
+    assert health.heartbeats == 4
+    assert health.intervals.count == 4
+    assert health.max_interval == .2
+    assert health.is_healthy(now=1.5)
+    assert not health.is_healthy(now=1.6)
+
+
+def test_link_health_outage_excluded_from_intervals():
+    health = LinkHealth(stale_after=1.0)
+    health.seen(0)
+    health.seen(.1)
+    health.seen(5.0)
+    assert health.outages == 1
+    assert health.intervals.count == 1
+    snapshot = health.snapshot(now=5.0)
+    assert snapshot['healthy'] is True
+    assert snapshot['interval_max'] == .1
+
+
+def test_keepalive_is_a_heartbeat():
+    controller = MarelController(host=HOST)
+    controller.mute()
+    controller.process_message('%w,2.500kg#')
+    controller.process_message('%#')
+    assert controller.weight.value == 2.5
+    assert controller.link.heartbeats == 1
+    assert controller.link.messages == 2
+    assert controller.link.is_healthy()
@@ -0,0 +1,46 @@
+import statistics
+
+import pytest
+
+from marel_marine_scale_controller.history import WeightHistory
+
+
+def test_history_ring_buffer():
+    history = WeightHistory(capacity=4)
+    for i in range(6):
+        history.append(float(i), 'kg', timestamp=float(i))
+
+    assert len(history) == 4
+    timestamps, values, _ = history.window()
+    assert list(timestamps) == [2, 3, 4, 5]
+    assert list(history.get_values(count=2)) == [4, 5]
+    assert history.nbytes == 4 * 17
+
+
+def test_history_statistics():
+    history = WeightHistory(capacity=100)
+    data = [1.0, 1.5, 0.5, 2.0, 1.25, 1.75]
+    for value in data:
+        history.append(value, 'kg')
+
+    assert history.mean() == pytest.approx(statistics.fmean(data))
+    assert history.std() == pytest.approx(statistics.pstdev(data))
+    assert history.min(count=3) == 1.25
+    assert history.max(units='g') == 2000
+    assert list(history.rolling_mean(2)) == pytest.approx([1.25, 1.0, 1.25, 1.625, 1.5])
+    assert list(history.rolling_std(3)) == pytest.approx([statistics.pstdev(data[i:i + 3]) for i in range(4)])
+
+
+def test_history_units_conversion():
+    history = WeightHistory(capacity=10)
+    history.append(1000, 'g')
+    history.append(1, 'kg')
+    assert list(history.get_values('kg')) == [1, 1]
+    assert history.mean('g') == pytest.approx(1000)
+
+
+def test_history_count_since():
+    history = WeightHistory(capacity=10)
+    for t in range(10):
+        history.append(1, 'kg', timestamp=float(t))
+    assert history.count_since(3, now=9.0) == 4
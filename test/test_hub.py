@@ -0,0 +1,89 @@
+import time
+
+from marel_marine_scale_controller.hub import ScaleHub
+from test.testing_server import HOST, Server
+
+
+def start_scales(count, interval=.05):
+    servers = []
+    for _ in range(count):
+        server = Server(HOST, 0, interval=interval)
+        server.start_comm_port()
+        servers.append(server)
+    return servers
+
+
+def wait_for(condition, timeout=5):
+    start = time.monotonic()
+    while not condition():
+        if time.monotonic() - start > timeout:
+            return False
+        time.sleep(.01)
+    return True
+
+
+def test_hub_multiple_scales():
+    servers = start_scales(3)
+    printed = []
+    hub = ScaleHub()
+    for server in servers:
+        hub.add_scale(HOST, server.port, on_print=lambda controller, weight: printed.append(weight))
+    hub.start()
+    try:
+        assert wait_for(lambda: all(c.weight is not None for c in hub.scales.values()))
+        for controller in hub.scales.values():
+            assert controller.get_weight('g') == 1000
+
+        name = next(iter(servers[0].conns))
+        servers[0].send_to(name, "%p,2.500kg#\n")
+        assert wait_for(lambda: len(printed) == 1)
+        assert printed[0].value == 2.5
+        assert hub.thread.is_alive()
+    finally:
+        hub.stop()
+        for server in servers:
+            server.close_all()
+
+
+def test_hub_reconnects():
+    server = start_scales(1)[0]
+    hub = ScaleHub()
+    controller = hub.add_scale(HOST, server.port)
+    controller.client.reconnect_delay = .1
+    hub.start()
+    try:
+        assert wait_for(lambda: controller.is_listening and server.conns)
+        for conn in list(server.conns.values()):
+            conn.close()
+        assert wait_for(lambda: not controller.is_listening)
+        assert wait_for(lambda: controller.is_listening)
+    finally:
+        hub.stop()
+        server.close_all()
+
+
+def test_hub_survives_failing_scale():
+    server = start_scales(1)[0]
+    hub = ScaleHub()
+    good = hub.add_scale(HOST, server.port)
+    unresolved = hub.add_scale('no.such.host.invalid', 1)
+    unresolved.client.reconnect_delay = .05
+    failing = hub.add_scale(HOST, server.port, name='failing')
+    failing.client.reconnect_delay = .05
+    calls = []
+
+    def receive_available():
+        calls.append(1)
+        raise UnicodeDecodeError('utf-8', b'\xff', 0, 1, 'invalid start byte')
+
+    failing.client.receive_available = receive_available
+    hub.start()
+    try:
+        assert wait_for(lambda: len(calls) >= 2)  # Failed, then reconnected and failed again.
+        assert wait_for(lambda: good.weight is not None)
+        assert not unresolved.is_listening
+        assert hub.thread.is_alive()
+    finally:
+        hub.stop()
+        server.close_all()
+    assert hub._selector.get_map() is None  # Closed with the event loop.
@@ -0,0 +1,108 @@
+import threading
+
+import pytest
+
+from marel_marine_scale_controller.journal import PrintJournal
+
+
+@pytest.mark.parametrize('sync', ['group', 'always', 'none'])
+def test_recover_lists_unacknowledged_entries(tmp_path, sync):
+    path = str(tmp_path / 'prints.journal')
+    with PrintJournal(path, sync=sync) as journal:
+        seqs = [journal.append(f'{i}.5', 'kg', timestamp=float(i)) for i in range(5)]
+        assert seqs == [1, 2, 3, 4, 5]
+        assert journal.wait(seqs[-1], timeout=5)
+        for seq in seqs[:3]:
+            journal.acknowledge(seq)
+
+    lost = PrintJournal.recover(path)
+    assert [(entry.seq, entry.time, entry.units, entry.text) for entry in lost] == [(4, 3.0, 'kg', '3.5'), (5, 4.0, 'kg', '4.5')]
+
+
+def test_sequence_continues_and_partial_line_ignored(tmp_path):
+    path = str(tmp_path / 'prints.journal')
+    with PrintJournal(path) as journal:
+        journal.append('1.0', 'kg')
+    with open(path, 'a') as f:
+        f.write('E 2 0.0 kg 2.')  # Crash while writing.
+
+    assert [entry.seq for entry in PrintJournal.recover(path)] == [1]
+    with PrintJournal(path) as journal:  # The partial line is removed when opened.
+        assert journal.append('3.0', 'kg') == 2
+    assert [(entry.seq, entry.text) for entry in PrintJournal.recover(path)] == [(1, '1.0'), (2, '3.0')]
+
+
+def test_journal_compacted_when_opened(tmp_path):
+    path = str(tmp_path / 'prints.journal')
+    with PrintJournal(path) as journal:
+        for i in range(1, 4):
+            journal.append(f'{i}.0', 'kg', timestamp=0.0)
+        journal.acknowledge(1)
+        journal.acknowledge(3)
+    PrintJournal(path).close()
+    with open(path) as f:
+        assert f.read() == 'E 2 0.000000 kg 2.0\n'
+
+    with PrintJournal(path) as journal:
+        journal.acknowledge(2)
+    PrintJournal(path).close()
+    with open(path) as f:
+        assert f.read() == 'E 2 0.000000 kg 2.0\nA 2\n'  # Kept for the sequence numbers.
+    with PrintJournal(path) as journal:
+        assert journal.append('4.0', 'kg') == 3
+
+
+def test_group_commit_batches_concurrent_appends(tmp_path):
+    path = str(tmp_path / 'prints.journal')
+    journal = PrintJournal(path, commit_interval=0.05)
+    seqs = []
+
+    def produce():
+        seq = journal.append('1.0', 'kg')
+        seqs.append(seq)
+        journal.wait(seq)
+
+    threads = [threading.Thread(target=produce) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert sorted(seqs) == list(range(1, 21))
+    assert journal.durable_seq == 20
+    assert journal.commits < 20
+    journal.close()
+
+
+def test_controller_journals_before_emitting(tmp_path):
+    from marel_marine_scale_controller.marel_controller import MarelController
+    from marel_marine_scale_controller.output import MemoryBackend
+
+    path = str(tmp_path / 'prints.journal')
+    controller = MarelController('localhost')
+    controller.output_backend = MemoryBackend()
+    durable = []
+    backend_write = controller.output_backend.write
+    controller.output_backend.write = lambda text, enter: (durable.append(controller.journal.durable_seq), backend_write(text, enter))
+
+    assert controller.enable_journal(path) == []
+    for i in range(3):
+        controller.process_message(f'%p,{i}.000kg#')
+    assert controller.output_worker.flush(timeout=5)
+    controller.disable_journal()
+
+    assert durable[0] >= 1 and durable[1] >= 2 and durable[2] >= 3
+    assert [entry[1] for entry in controller.output_backend.entries] == ['0.0', '1.0', '2.0']
+    assert PrintJournal.recover(path) == []
+
+
+def test_controller_reports_lost_entries_once(tmp_path):
+    from marel_marine_scale_controller.marel_controller import MarelController
+
+    path = str(tmp_path / 'prints.journal')
+    with PrintJournal(path) as journal:
+        journal.append('1.0', 'kg')  # Never acknowledged: crash before emitting.
+
+    controller = MarelController('localhost')
+    assert [entry.text for entry in controller.enable_journal(path)] == ['1.0']
+    assert controller.enable_journal(path) == []
+    controller.disable_journal()
@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from marel_marine_scale_controller.lua_deploy import LuaDigestCache, fetch_lua_script, script_digest, verify_lua_script
+from marel_marine_scale_controller.marel_controller import UPLOAD_PORT, MarelController
+from test.testing_server import ABS_LUA_SCRIPT_PATH, Server
+
+HOST = '127.0.0.2'  # The ports of the scale are fixed: another loopback address than the other tests.
+
+
+@pytest.fixture(scope='module')
+def server():
+    server = Server(HOST, 0)
+    server.start_download()
+    server.start_upload()
+    yield server
+    server.close_all()
+
+
+def test_fetch_lua_script(server):
+    with open(ABS_LUA_SCRIPT_PATH) as f:
+        script = f.read()
+    assert fetch_lua_script(HOST, UPLOAD_PORT) == script
+    assert fetch_lua_script('127.0.0.9', UPLOAD_PORT, timeout=.5) is None
+
+
+def test_skip_if_current(server, tmp_path):
+    controller = MarelController(HOST)
+    controller.lua_cache = LuaDigestCache(str(tmp_path / 'lua_cache.json'))
+
+    assert controller.update_lua_code(ABS_LUA_SCRIPT_PATH, skip_if_current=True) == 1
+    assert controller.last_lua_update.skipped
+    assert controller.last_lua_update.duration < 1  # The full update waits 1 s between the download and the check.
+    assert controller.last_lua_update.verification.matched  # Streamed check (verify_lua_script).
+
+    assert controller.update_lua_code(ABS_LUA_SCRIPT_PATH) == 1
+    full_duration = controller.last_lua_update.duration
+    assert not controller.last_lua_update.skipped and full_duration > 1
+
+    assert controller.update_lua_code(ABS_LUA_SCRIPT_PATH, skip_if_current=True) == 1
+    assert controller.last_lua_update.time_saved == pytest.approx(full_duration - controller.last_lua_update.duration)
+
+    with open(tmp_path / 'lua_cache.json') as f:
+        entry = json.load(f)[HOST]
+    with open(ABS_LUA_SCRIPT_PATH) as f:
+        assert entry['digest'] == script_digest(f.read())
+    assert LuaDigestCache(str(tmp_path / 'lua_cache.json')).update_duration(HOST) == full_duration
+
+
+def test_different_script_is_downloaded(server, tmp_path):
+    path = tmp_path / 'other.lua'
+    path.write_text('print("other")\n')
+    controller = MarelController(HOST)
+    assert controller.update_lua_code(str(path), skip_if_current=True) == 0  # The stand-in always sends the app.
+    assert not controller.last_lua_update.skipped
+    assert controller.lua_cache.digest(HOST) is None
+
+
+def test_cached_other_digest_downloads_without_check(server):
+    controller = MarelController(HOST)
+    controller.lua_cache.set(HOST, script_digest('print("previous")\n'))
+    assert controller.update_lua_code(ABS_LUA_SCRIPT_PATH, skip_if_current=True) == 1
+    assert not controller.last_lua_update.skipped
+    assert controller.last_lua_update.verification.matched
+
+
+def test_cache_save_error_is_logged(tmp_path, caplog):
+    cache = LuaDigestCache(str(tmp_path / 'missing' / 'lua_cache.json'))
+    cache.set(HOST, 'digest')
+    assert cache.digest(HOST) == 'digest'
+    assert 'Lua cache not saved' in caplog.text
+
+
+def test_verify_lua_script(server):
+    with open(ABS_LUA_SCRIPT_PATH, 'rb') as f:
+        script = f.read()
+
+    result = verify_lua_script(HOST, UPLOAD_PORT, script)
+    assert result.matched and result.mismatch_offset is None
+    assert result.bytes_transferred == len(script)
+    assert result.duration < 1  # Stops at the end of the script, not on timeouts.
+
+    altered = script[:100] + b'X' + script[101:]
+    assert verify_lua_script(HOST, UPLOAD_PORT, altered).mismatch_offset == 100
+    assert verify_lua_script(HOST, UPLOAD_PORT, script + b'-- end\n').mismatch_offset == len(script)
+    assert verify_lua_script('127.0.0.9', UPLOAD_PORT, script, timeout=.5).mismatch_offset == 0
+    assert verify_lua_script(HOST, UPLOAD_PORT, script[:-10]).mismatch_offset == len(script) - 10
+
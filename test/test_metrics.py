@@ -0,0 +1,49 @@
+import socket
+
+from marel_marine_scale_controller.metrics import Histogram, Metrics
+
+
+def test_histogram():
+    histogram = Histogram(bounds=(1, 2, 4))
+    for value in (0.5, 1.5, 1.5, 3, 10):
+        histogram.observe(value)
+    assert histogram.buckets == [1, 2, 1, 1]
+    assert histogram.quantile(.5) == 2
+    assert histogram.snapshot()['count'] == 5
+
+
+def test_prometheus_format():
+    metrics = Metrics(enabled=True)
+    metrics.frames_in = 3
+    metrics.observe('parse', 2e-6)
+    text = metrics.to_prometheus(labels={'host': 'scale'})
+    assert 'marel_frames_in_total{host="scale"} 3' in text
+    assert 'marel_stage_duration_seconds_bucket{host="scale",stage="parse",le="+Inf"} 1' in text
+    assert 'marel_stage_duration_seconds_count{host="scale",stage="parse"} 1' in text
+
+
+def test_controller_metrics():
+    from marel_marine_scale_controller.marel_controller import MarelController
+
+    controller = MarelController('localhost')
+    controller.mute()
+    controller.client.socket, remote = socket.socketpair()
+    controller.client.is_connected = True
+
+    remote.sendall(b"%w,1.000kg#\n%w,bad#\n")
+    for message in controller.client.receive():
+        controller.process_message(message)
+    assert controller.metrics()['counters']['frames_in'] == 0  # Disabled
+
+    controller.stats.enabled = True
+    remote.sendall(b"%w,1.000kg#\n%w,bad#\n")
+    for message in controller.client.receive():
+        controller.process_message(message)
+    snapshot = controller.metrics()
+    assert snapshot['counters']['bytes_in'] == 20
+    assert snapshot['counters']['frames_in'] == 2
+    assert snapshot['counters']['parse_failures'] == 1
+    assert snapshot['stages']['parse']['count'] == 2
+    assert snapshot['stages']['recv']['count'] == 1
+    remote.close()
+    controller.client.close()
@@ -0,0 +1,90 @@
+import time
+
+import pytest
+
+from marel_marine_scale_controller.output import OutputBackend, OutputWorker
+
+
+class SlowKeyboard:
+    def __init__(self, delay):
+        self.delay = delay
+        self.entries = []
+
+    def write(self, text, enter):
+        time.sleep(self.delay)
+        self.entries.append((text, enter))
+
+
+def test_worker_order_and_flush():
+    keyboard = SlowKeyboard(0.001)
+    worker = OutputWorker(keyboard.write)
+    for i in range(20):
+        worker.submit(str(i), True)
+    assert worker.flush(timeout=5)
+    assert keyboard.entries == [(str(i), True) for i in range(20)]
+    worker.stop()
+
+
+def test_worker_overflow_policies():
+    for overflow, expected in (('drop_newest', ['0', '1', '2']), ('drop_oldest', ['0', '4', '5'])):
+        keyboard = SlowKeyboard(0.05)
+        worker = OutputWorker(keyboard.write, maxsize=2, overflow=overflow)
+        worker.submit('0', False)
+        time.sleep(.01)  # '0' is being emitted.
+        for i in range(1, 6):
+            worker.submit(str(i), False)
+        worker.flush(timeout=5)
+        assert [text for text, _ in keyboard.entries] == expected
+        assert worker.dropped == 3
+        worker.stop()
+
+
+def test_worker_block_policy_loses_nothing():
+    keyboard = SlowKeyboard(0.005)
+    worker = OutputWorker(keyboard.write, maxsize=2, overflow='block')
+    for i in range(10):
+        assert worker.submit(str(i), False)
+    worker.flush(timeout=5)
+    assert [text for text, _ in keyboard.entries] == [str(i) for i in range(10)]
+    worker.stop()
+
+
+def test_slow_keyboard_does_not_delay_reception():
+    from marel_marine_scale_controller.marel_controller import MarelController
+
+    keyboard = SlowKeyboard(0.1)  # pyautogui default pause.
+    controller = MarelController('localhost')
+    controller.output_worker.emit = keyboard.write
+
+    start = time.perf_counter()
+    for i in range(20):
+        controller.process_message(f'%p,{i}.000kg#')
+        controller.process_message(f'%w,{i}.000kg#')
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.1  # Typing the 20 entries takes 2 seconds.
+    assert controller.weight.value == 19
+    assert controller.output_worker.flush(timeout=10)
+    assert keyboard.entries == [(str(float(i)), True) for i in range(20)]
+
+
+def test_controller_output_backend():
+    from marel_marine_scale_controller.marel_controller import MarelController
+    from marel_marine_scale_controller.output import MemoryBackend
+
+    controller = MarelController('localhost')
+    controller.output_backend = MemoryBackend()
+    controller.set_units('g')
+    controller.process_message('%p,1.500kg#')
+    controller.auto_enter = False
+    controller.process_message('%p,2.000kg#')
+    controller.output_worker.flush(timeout=5)
+    assert [entry[1:] for entry in controller.output_backend.entries] == [('1500.0', True), ('2000.0', False)]
+
+
+def test_backend_must_implement_write():
+    class NoWrite(OutputBackend):
+        pass
+
+    with pytest.raises(TypeError):
+        NoWrite()
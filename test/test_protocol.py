@@ -0,0 +1,26 @@
+import pytest
+
+from marel_marine_scale_controller.protocol import ProtocolError, Reading, parse_message, parse_messages
+
+
+def test_parse_message():
+    assert parse_message('%w,1.234kg#') == Reading('w', 1.234, 'kg')
+    assert parse_message('%p,-12lb#') == Reading('p', -12.0, 'lb')
+    assert parse_message('%w,0.5oz#') == Reading('w', 0.5, 'oz')
+
+
+def test_parse_keepalive():
+    assert parse_message('%#') is None
+
+
+@pytest.mark.parametrize('message', ['%w,1x2kg#', '%x,1.0kg#', '%w,\u0661.0kg#', '%\u00e9,1.0kg#', '%w,1.2.3kg#', '%w,1.0t#', '%w,1.0kg', 'w,1.0kg#', '%w,1.0kg#x'])
+def test_parse_invalid_message(message):
+    with pytest.raises(ProtocolError):
+        parse_message(message)
+
+
+def test_parse_messages():
+    batch = parse_messages(['%w,1.000kg#', '%#', '%w,1x2kg#', '%p,2.000g#'])
+    assert batch.readings == [Reading('w', 1.0, 'kg'), Reading('p', 2.0, 'g')]
+    assert batch.keepalives == 1
+    assert batch.errors == ['%w,1x2kg#']
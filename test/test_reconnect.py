@@ -0,0 +1,78 @@
+import socket
+import time
+
+from marel_marine_scale_controller.marel_controller import MarelController
+from marel_marine_scale_controller.reconnect import Backoff, configure_socket
+from test.testing_server import HOST, Server
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(.01)
+    return True
+
+
+def test_backoff_grows_to_cap_with_jitter():
+    backoff = Backoff(initial=.1, cap=1.0, factor=2, jitter=.5, seed=0)
+    delays = [backoff.next_delay() for _ in range(10)]
+    for n, delay in enumerate(delays):
+        nominal = min(1.0, .1 * 2 ** n)
+        assert nominal / 2 <= delay <= nominal
+    backoff.reset()
+    assert backoff.next_delay() <= .1
+
+
+def test_configure_socket():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    configure_socket(sock)
+    assert sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+    assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE)
+    sock.close()
+
+
+def test_recovery_after_scale_reboot():
+    server = Server(HOST, 0, interval=.05)
+    server.start_comm_port()
+    port = server.port
+    controller = MarelController(HOST, port=port)
+    controller.mute()
+    controller.client.backoff = Backoff(initial=.05, cap=.2)
+    supervisor = controller.client.supervisor
+    controller.start_listening()
+    try:
+        assert wait_for(lambda: controller.weight is not None)
+
+        conns = list(server.conns.values())  # The scale reboots.
+        server.conns.clear()  # Closed below instead of detached by `close_all`.
+        server.close_all()
+        for conn in conns:
+            conn.shutdown(socket.SHUT_RDWR)
+        assert wait_for(lambda: supervisor.is_recovering)
+        time.sleep(.5)
+        server = Server(HOST, port, interval=.05)
+        server.start_comm_port()
+
+        assert wait_for(lambda: supervisor.last_recovery is not None)
+        assert .5 <= supervisor.last_recovery < .5 + .2 + 1  # Bounded by the backoff cap and the connection test.
+        assert supervisor.attempts > 1
+        controller.weight = None
+        assert wait_for(lambda: controller.weight is not None)  # Listening resumed.
+    finally:
+        controller.stop_listening()
+        server.close_all()
+
+
+def test_disconnect_stops_recovery():
+    controller = MarelController(HOST, port=1)  # Nothing listens on port 1.
+    client = controller.client
+    client.host, client.port = HOST, 1
+    client.supervisor.connection_lost()
+    assert client.supervisor.is_recovering
+    start = time.monotonic()
+    client.disconnect()
+    assert client.supervisor.wait_connected(timeout=5) is False
+    assert time.monotonic() - start < client.reconnect_delay + 1
+    assert not client.supervisor.is_recovering
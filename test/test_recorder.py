@@ -0,0 +1,79 @@
+import math
+import time
+
+import pytest
+
+from marel_marine_scale_controller.protocol import UNITS_CODES
+from marel_marine_scale_controller.recorder import NO_UNITS, SessionReader, SessionRecorder
+from marel_marine_scale_controller.replay import load_stream
+
+
+def test_record_and_read(tmp_path):
+    path = str(tmp_path / 'session.marel')
+    with SessionRecorder(path, batch_size=4) as recorder:
+        for i in range(10):
+            recorder.record('w', i / 10, 'kg', timestamp=float(i))
+        recorder.record('#', None, None, timestamp=10.0)
+        recorder.record('p', 2.5, 'lb', timestamp=11.0)
+
+    with SessionReader(path) as reader:
+        assert len(reader) == 12
+        assert list(reader.timestamps) == [float(i) for i in range(12)]
+        assert list(reader.values[:10]) == pytest.approx([i / 10 for i in range(10)])
+        assert math.isnan(reader.values[10])
+        assert bytes(reader.prefixes) == b'w' * 10 + b'#p'
+        assert list(reader.units[-2:]) == [NO_UNITS, UNITS_CODES['lb']]
+
+
+def test_recorder_appends_to_existing_file(tmp_path):
+    path = str(tmp_path / 'session.marel')
+    for value in (1.0, 2.0):
+        with SessionRecorder(path) as recorder:
+            recorder.record('w', value, 'kg')
+
+    with SessionReader(path) as reader:
+        assert bytes(reader.prefixes) == b'w>w'
+        assert reader.values[0] == 1.0 and reader.values[2] == 2.0
+        assert [index for index, _, _ in reader.segments] == [0, 1]
+        assert reader.wall_time(2) == pytest.approx(time.time(), abs=1)
+
+    stream = load_stream(path)
+    assert [message for _, message in stream] == ['%w,1.000000kg#', '%w,2.000000kg#']
+    assert stream[1][0] - stream[0][0] == pytest.approx(0.05, abs=0.01)
+
+
+def test_recorder_guards_prefix_and_torn_record(tmp_path):
+    path = str(tmp_path / 'session.marel')
+    with SessionRecorder(path) as recorder:
+        recorder.record('\u00e9', 1.0, 'kg')
+        recorder.record('x', 1.0, 'kg')
+    with open(path, 'ab') as f:
+        f.write(b'\0' * 5)  # Partially written record.
+    with SessionRecorder(path) as recorder:
+        recorder.record('w', 3.0, 'kg')
+
+    with SessionReader(path) as reader:
+        assert bytes(reader.prefixes) == b'??>w'
+        assert reader.values[3] == 3.0
+
+
+def test_recorder_rejects_other_files(tmp_path):
+    path = tmp_path / 'session.txt'
+    path.write_text('%w,1.000kg#\n')
+    with pytest.raises(ValueError):
+        SessionRecorder(str(path))
+
+
+def test_controller_recording(tmp_path):
+    from marel_marine_scale_controller.marel_controller import MarelController
+
+    path = str(tmp_path / 'session.marel')
+    controller = MarelController('localhost')
+    controller.mute()
+    controller.start_recording(path)
+    for message in ['%w,1.000kg#', '%#', '%w,bad#', '%p,1.000kg#']:
+        controller.process_message(message)
+    controller.stop_recording()
+
+    with SessionReader(path) as reader:
+        assert bytes(reader.prefixes) == b'w#?p'
@@ -0,0 +1,54 @@
+import threading
+import time
+
+import pytest
+
+from marel_marine_scale_controller.marel_controller import MarelController
+from marel_marine_scale_controller.recorder import SessionRecorder
+from marel_marine_scale_controller.replay import load_stream, replay
+
+
+def test_load_text_capture(tmp_path):
+    path = tmp_path / 'capture.txt'
+    path.write_text("%w,1.234kg#\n%#\n\n%p,1.234kg#\n")
+    assert load_stream(str(path), interval=0.1) == [(0, '%w,1.234kg#'), (0.1, '%#'), (0.2, '%p,1.234kg#')]
+
+
+def test_load_session(tmp_path):
+    path = str(tmp_path / 'session.marel')
+    with SessionRecorder(path) as recorder:
+        recorder.record('w', 1.5, 'kg', timestamp=10.0)
+        recorder.record('#', None, None, timestamp=10.5)
+        recorder.record('?', None, None, timestamp=10.6)
+    assert load_stream(path) == [(10.0, '%w,1.500000kg#'), (10.5, '%#')]
+
+
+def test_replay_as_fast_as_possible():
+    stream = [(i * 0.05, f'%w,{i / 1000:.3f}kg#') for i in range(5000)]
+    report = replay(stream, speed=0, port=0)
+    assert report.processed == report.messages == 5000
+
+
+def test_replay_speed():
+    stream = [(i * 0.05, '%w,1.000kg#') for i in range(21)]  # 1 second of messages.
+    report = replay(stream, speed=4, port=0)
+    assert report.processed == 21
+    assert 0.2 <= report.duration < 1
+
+
+def test_replay_without_connection():
+    with pytest.raises(ConnectionError):
+        replay([], port=0)  # Nothing is sent: the connection test of the controller fails.
+
+
+def test_replay_stops_when_connection_lost():
+    controller = MarelController('localhost', port=0)
+    controller.mute()
+    controller.event_driven = True
+    threading.Timer(0.5, controller.client.disconnect).start()
+
+    stream = [(i * 0.05, '%w,1.000kg#') for i in range(1200)]  # 60 seconds of messages.
+    start = time.perf_counter()
+    report = replay(stream, speed=1, port=0, controller=controller)
+    assert time.perf_counter() - start < 2
+    assert 0 < report.processed < report.messages
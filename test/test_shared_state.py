@@ -0,0 +1,98 @@
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+import pytest
+
+from marel_marine_scale_controller.marel_controller import MarelController
+from marel_marine_scale_controller.shared_state import SharedWeightReader, SharedWeightTable
+from test.testing_server import HOST, Server
+
+
+@pytest.fixture
+def table():
+    table = SharedWeightTable(slots=4)
+    yield table
+    table.close()
+
+
+def test_publish_and_read(table):
+    index = table.register('scale 1')
+    assert table.register('scale 1') == index
+    reader = SharedWeightReader(table.name)
+    try:
+        assert reader.names() == {'scale 1': 0}
+        assert reader.read(index) is None
+        table.publish(index, 1.25, 'lb', timestamp=10.0)
+        table.publish(index, 1.5, 'kg', timestamp=11.0)
+        reading = reader.read(reader.index('scale 1'))
+        assert (reading.name, reading.value, reading.units, reading.timestamp, reading.seq) == ('scale 1', 1.5, 'kg', 11.0, 2)
+        assert reading.get_weight('g') == 1500
+    finally:
+        reader.close()
+
+
+def test_register_errors(table):
+    with pytest.raises(ValueError):
+        table.register('x' * 33)
+    for n in range(4):
+        table.register(f'scale {n}')
+    with pytest.raises(ValueError):
+        table.register('scale 4')
+
+
+def test_reader_rejects_other_blocks():
+    shm = shared_memory.SharedMemory(create=True, size=64)
+    try:
+        with pytest.raises(ValueError):
+            SharedWeightReader(shm.name)
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def write_loop(name, count):
+    writer = object.__new__(SharedWeightTable)  # Writes in the block created by the test process.
+    writer.shm, writer.slots, writer.names, writer._seqs = shared_memory.SharedMemory(name), 1, {'scale': 0}, [0]
+    for n in range(1, count + 1):
+        writer.publish(0, float(n), 'kg', timestamp=float(n))
+    writer.shm.close()
+
+
+def test_reads_are_consistent_across_processes(table):
+    table.register('scale')
+    reader = SharedWeightReader(table.name)
+    writer = multiprocessing.get_context('spawn').Process(target=write_loop, args=(table.name, 200_000))
+    writer.start()
+    try:
+        reads = 0
+        while writer.is_alive() or reads == 0:
+            reading = reader.read(0)
+            if reading is not None:
+                assert reading.value == reading.timestamp == reading.seq  # Never a torn read.
+                reads += 1
+        writer.join()
+        assert reader.read(0).seq == 200_000
+    finally:
+        reader.close()
+
+
+def test_attach_controller(table):
+    server = Server(HOST, 0, interval=.02)
+    server.start_comm_port()
+    controller = MarelController(HOST, port=server.port)
+    controller.mute()
+    index = table.attach(controller, 'scale')
+    reader = SharedWeightReader(table.name)
+    controller.start_listening()
+    try:
+        deadline = time.monotonic() + 5
+        while reader.read(index) is None and time.monotonic() < deadline:
+            time.sleep(.01)
+        reading = reader.read(index)
+        assert (reading.value, reading.units) == (1.0, 'kg')
+        assert abs(reading.timestamp - time.time()) < 5
+    finally:
+        controller.stop_listening()
+        reader.close()
+        server.close_all()
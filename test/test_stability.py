@@ -0,0 +1,97 @@
+import math
+import random
+
+from marel_marine_scale_controller.stability import RunningStats, StabilityDetector
+
+RATE = 20  # Hz
+TOLERANCE = 0.005  # kg
+HOLD_TIME = 0.5  # s
+
+
+def simulate_weighings(count, seed=0):
+    """Replay of `count` weighings at 20 Hz: empty scale, damped oscillation when the fish
+    is dropped, stable weight with noise, then the fish is removed.
+
+    Returns the readings [(timestamp, value)] and the weighings [(settled time, removed time, weight)],
+    the settled time being when the oscillation amplitude is smaller than the tolerance.
+    """
+    rng = random.Random(seed)
+    readings, weighings = [], []
+    t = 0.0
+    noise = TOLERANCE / 5
+    for _ in range(count):
+        for _ in range(rng.randint(10, 30)):  # Empty scale
+            readings.append((t, rng.gauss(0, noise)))
+            t += 1 / RATE
+
+        weight = rng.uniform(0.1, 5)
+        amplitude, decay = rng.uniform(0.05, 0.5), rng.uniform(0.2, 1)
+        drop = t
+        settled = drop + decay * math.log(amplitude / (TOLERANCE / 2))
+        removed = settled + rng.uniform(1, 3)
+        while t < removed:
+            oscillation = amplitude * math.exp(-(t - drop) / decay) * math.cos(2 * math.pi * 3 * (t - drop))
+            readings.append((t, weight + oscillation + rng.gauss(0, noise)))
+            t += 1 / RATE
+        weighings.append((settled, removed, weight))
+    return readings, weighings
+
+
+def test_running_stats():
+    stats = RunningStats()
+    for value in [2, 4, 4, 4, 5, 5, 7, 9]:
+        stats.add(value)
+    assert stats.mean == 5
+    assert stats.std == 2
+
+
+def test_stability_detection_latency_and_false_triggers():
+    readings, weighings = simulate_weighings(100)
+    detector = StabilityDetector(tolerance=TOLERANCE, hold_time=HOLD_TIME)
+
+    captures = []
+    for timestamp, value in readings:
+        if detector.update(value, timestamp):
+            captures.append((timestamp, detector.value))
+
+    latencies = []
+    for settled, removed, weight in weighings:
+        found = [(t, v) for t, v in captures if settled - HOLD_TIME <= t <= removed]
+        if len(found) == 1 and abs(found[0][1] - weight) <= TOLERANCE:
+            latencies.append(found[0][0] - settled)
+
+    false_triggers = len(captures) - len(latencies)
+    missed = len(weighings) - len(latencies)
+    assert false_triggers == 0
+    assert missed == 0
+    assert max(latencies) <= HOLD_TIME + 3 / RATE
+
+
+def test_controller_auto_capture():
+    from marel_marine_scale_controller.marel_controller import MarelController
+
+    controller = MarelController('localhost')
+    controller.mute()
+    controller.auto_capture = True
+    controller.stability.hold_time = 0
+    printed = []
+    controller.print_callbacks.append(lambda c, weight: printed.append(weight.value))
+
+    for message in ['%w,0.000kg#', '%w,1.500kg#', '%w,1.501kg#', '%w,1.500kg#', '%p,1.500kg#', '%w,0.000kg#']:
+        controller.process_message(message)
+    assert printed == [1.5]  # auto-capture only: the `p` message of the same weighing is a duplicate.
+
+    for message in ['%p,2.000kg#', '%w,2.000kg#', '%p,2.000kg#', '%w,0.000kg#']:
+        controller.process_message(message)
+    assert printed == [1.5, 2.0, 2.0]  # A `p` message first: no auto-capture, every `p` is printed.
+
+
+def test_noisy_run_is_not_stable():
+    detector = StabilityDetector(tolerance=0.010, hold_time=0.5)
+    # Readings alternate within the tolerance of their mean, but the std (0.008) exceeds max_std (0.005).
+    captures = [detector.update(1.0 + (0.008 if i % 2 else -0.008), i / RATE) for i in range(40)]
+    assert not any(captures)
+
+    detector = StabilityDetector(tolerance=0.010, hold_time=0.5)
+    captures = [detector.update(1.0 + (0.002 if i % 2 else -0.002), i / RATE) for i in range(40)]
+    assert captures.index(True) == int(0.5 * RATE)
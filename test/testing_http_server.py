@@ -0,0 +1,64 @@
+"""
+Local stand-in for the remote data service receiving the print events (see `forwarder.PrintForwarder`).
+
+The `HttpSink` accepts POST requests with a JSON array body and keeps the events in memory.
+HTTP/1.1 keep-alive is supported. Set `available` to False to answer 503 (remote down). Batches
+with an event for which `reject(event)` is True are answered 400.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HOST = "localhost"
+
+
+class HttpSink:
+    def __init__(self, host=HOST, port=0):
+        self.events = []
+        self.requests = 0
+        self.connections = 0
+        self.available = True
+        self.reject = lambda event: False
+        self._lock = threading.Lock()
+
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                with sink._lock:
+                    sink.connections += 1
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                events = json.loads(body)
+                if not sink.available:
+                    self.send_response(503)
+                elif any(map(sink.reject, events)):
+                    self.send_response(400)
+                else:
+                    with sink._lock:
+                        sink.requests += 1
+                        sink.events.extend(events)
+                    self.send_response(204)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self.url = f'http://{host}:{self.port}/prints'
+        self.thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -1,3 +1,212 @@
+"""
+Local stand-in for the Marel Scale used by the tests and the benchmarks.
 
+The `Server` emulates the scale Lua App (COMM_PORT) and the Lua code download/upload ports.
+"""
+import socket
+import threading
+import time
+import logging
+from pathlib import Path
 
+from marel_marine_scale_controller import LUA_SCRIPT_PATH
+from marel_marine_scale_controller.marel_controller import COMM_PORT, DOWNLOAD_PORT, UPLOAD_PORT
 
+HOST = "localhost"
+
+ABS_LUA_SCRIPT_PATH = str(Path(__file__).parent.parent.joinpath("marel_marine_scale_controller", LUA_SCRIPT_PATH))
+
+
+class Server:
+    def __init__(self, host, port, interval=.2, batch=1):
+        self.host = host
+        self.port = port
+        self.interval = interval  # Seconds between each batch of messages. Can be changed while running.
+        self.batch = batch  # Messages sent per batch. Can be changed while running.
+        self.sent = 0
+        self._send_lock = threading.Lock()  # `send_to` must not interleave with the messages of `handle_connection`.
+
+        self.running = False
+        self.upload_running = False
+        self.download_running = False
+
+        self._socket = None
+        self._upload_socket = None
+        self._download_socket = None
+
+        self.conns = {}
+
+        self.thread = None
+        self.upload_thread = None
+        self.download_thread = None
+
+        logging.info(f'Test server host: {host}')
+
+    def start_comm_port(self, number_of_connections=5):
+        logging.info('Starting Test')
+
+        self.running = True
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        while self.running:
+            try:
+                self._socket.bind((self.host, self.port))
+                self.port = self._socket.getsockname()[1]  # Resolves port 0 to the port picked by the OS.
+                break
+            except OSError:
+                logging.debug(f'Error, download port {COMM_PORT} unavailable. (Retrying in 2 seconds)')
+                time.sleep(2)
+                #self.port += 1
+
+        self._socket.listen(number_of_connections)
+        self.thread = threading.Thread(target=self.run_comm_port, daemon=True)
+        self.thread.start()
+
+    def start_download(self, number_of_connections=5):
+        logging.info('Starting Download')
+
+        self.download_running = True
+        self._download_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._download_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+        while self.download_running:
+            try:
+                self._download_socket.bind((self.host, DOWNLOAD_PORT))
+                break
+            except OSError:
+                logging.debug(f'Error, download port {DOWNLOAD_PORT} unavailable. (Retrying in 2 seconds)')
+                time.sleep(2)
+
+        self._download_socket.listen(number_of_connections)
+        self.download_thread = threading.Thread(target=self.run_download, daemon=True)
+        self.download_thread.start()
+
+    def start_upload(self, number_of_connections=5):
+        logging.info('Starting Upload')
+
+        self.upload_running = True
+        self._upload_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._upload_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+        while self.upload_running:
+            try:
+                self._upload_socket.bind((self.host, UPLOAD_PORT))
+                break
+            except OSError:
+                logging.debug(f'Error, upload port {UPLOAD_PORT} unavailable. (Retrying in 2 seconds)')
+                time.sleep(2)
+
+        self._upload_socket.listen(number_of_connections)
+        self.upload_thread = threading.Thread(target=self.run_upload, daemon=True)
+        self.upload_thread.start()
+
+    def run_comm_port(self):
+        logging.info(f"Test server listening on port {self.port}")
+        while self.running:
+            try:
+                conn, addr = self._socket.accept()
+                logging.info(f"Test server accepted connection from {addr}")
+                threading.Thread(target=self.handle_connection, args=(conn, addr[1])).start()
+            except Exception as e:
+                if not self.running:
+                    return  # Listening socket closed by `close_all`.
+                logging.debug(f"Error accepting connection: {e}")
+                time.sleep(1)
+
+    def run_upload(self):
+        logging.info(f"Test upload server on port {UPLOAD_PORT}")
+        with open(ABS_LUA_SCRIPT_PATH, 'r') as lua_app:
+            lua_script = lua_app.read()
+
+        while self.upload_running:
+            try:
+                conn, addr = self._upload_socket.accept()
+                logging.info(f"Test upload Server accepted connection from {addr}")
+                # time.sleep(2)
+                conn.sendall(lua_script.encode())
+                logging.info("send all done")
+                # time.sleep(1)
+                conn.close()
+
+            except Exception as e:
+                if not self.upload_running:
+                    return  # Listening socket closed by `close_all`.
+                logging.debug(f"upload Test Error accepting connection: {e}")
+                time.sleep(1)
+
+    def run_download(self):
+        logging.info(f"Test download server on port {DOWNLOAD_PORT}")
+        with open(ABS_LUA_SCRIPT_PATH, 'r') as lua_app:
+            lua_script = lua_app.read()
+
+        while self.download_running:
+            try:
+                conn, addr = self._download_socket.accept()
+                conn.close()
+                logging.info(f"Test Download Server accepted connection from {addr}")
+            except Exception as e:
+                if not self.download_running:
+                    return  # Listening socket closed by `close_all`.
+                logging.debug(f"Download Test Error accepting connection: {e}")
+                time.sleep(1)
+
+    def handle_connection(self, conn, name):
+        self.conns[name] = conn
+        try:
+            while True:
+                batch = self.batch
+                message = self.generate_message()
+                with self._send_lock:
+                    conn.sendall((message * batch).encode())
+                self.sent += batch
+                logging.debug(f"sent: {message}")
+                time.sleep(self.interval)
+        except Exception as e:
+            logging.debug(f"Error handling connection: {e}")
+        finally:
+            conn.close()
+            self.conns.pop(name, None)
+
+    def close_all(self):
+        """Stop the accept loops and release the ports (the threads blocked in `accept` are woken up)."""
+        self.running = False
+        self.download_running = False
+        self.upload_running = False
+        for k, v in self.conns.items():
+            v.detach()
+
+        for name in ('_socket', '_download_socket', '_upload_socket'):
+            sock = getattr(self, name)
+            if sock:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)  # Wakes up `accept`, thus the port is released on close.
+                except OSError:
+                    pass
+                sock.close()
+                setattr(self, name, None)
+
+        for thread in (self.thread, self.download_thread, self.upload_thread):
+            if thread is not None and thread is not threading.current_thread():
+                thread.join(timeout=2)
+
+    @staticmethod
+    def generate_message():
+        #sensor_id = random.choice(['w'])
+        #value = random.uniform(0, 10000)/1e3
+        #unit = 'kg'
+        #message = f"%{sensor_id},{value:.2f}{unit}#\n"
+        #return message
+        return "%w,1.000kg#\n"
+
+
+    def send_to(self, name, msg):
+        with self._send_lock:
+            self.conns[name].sendall(msg.encode())
+
+
+def start_server():
+    server = Server(HOST, COMM_PORT)
+    server.start_comm_port()
+    server.start_download()
+    server.start_upload()
+    return server